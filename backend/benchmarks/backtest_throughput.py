@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Time the vectorized backtest over synthetic 1m bars with the real PAP model
+Run from the backend directory: python -m benchmarks.backtest_throughput
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.backtest import run_backtest
+
+TRADING_DAYS = 63       # about three months of regular sessions
+BARS_PER_DAY = 390
+
+
+def make_session_bars(days, seed=0):
+    rng = np.random.default_rng(seed)
+    sessions = pd.bdate_range("2025-04-01", periods=days, tz="UTC") + pd.Timedelta(hours=13, minutes=30)
+    index = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(session, periods=BARS_PER_DAY, freq="1min") for session in sessions
+    ]))
+    n = len(index)
+    close = 100 + np.cumsum(rng.normal(scale=0.05, size=n))
+    open_ = close + rng.normal(scale=0.03, size=n)
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + np.abs(rng.normal(scale=0.03, size=n)),
+        "Low": np.minimum(open_, close) - np.abs(rng.normal(scale=0.03, size=n)),
+        "Close": close,
+        "Volume": rng.integers(100, 10_000, size=n).astype(float),
+    }, index=index)
+
+
+def run():
+    df = make_session_bars(TRADING_DAYS)
+    results = []
+    for interval_minutes, lookback_bars in [(1, 30), (5, 15)]:
+        result = run_backtest(df, interval_minutes, lookback_bars)
+        summary = {key: value for key, value in result.items() if key not in ("equity", "trade_log")}
+        summary["windows_per_second"] = round(result["windows"] / result["elapsed_seconds"], 1)
+        results.append(summary)
+        print(f"{interval_minutes}m x {lookback_bars}: {result['windows']} windows, {result['trades']} trades "
+              f"in {result['elapsed_seconds']:.1f}s ({summary['windows_per_second']} windows/s)")
+    return results
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Compare the old iterrows() candlestick payload with the vectorized row and columnar serializers
+Run from the backend directory: python -m benchmarks.candlestick_serialization
+"""
+
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+from utils.serialization import candlestick_columns, candlestick_rows, dumps
+
+BAR_COUNTS = [15, 45, 390, 5000]
+REPEATS = 50
+
+
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(scale=0.1, size=n))
+    index = pd.date_range("2025-07-08 13:30", periods=n, freq="1min", tz="UTC")
+    return pd.DataFrame({
+        "Open": close + rng.normal(scale=0.02, size=n),
+        "High": close + 0.05,
+        "Low": close - 0.05,
+        "Close": close,
+        "Volume": rng.integers(100, 10_000, size=n).astype(float),
+        "ATR_14": 0.1,
+    }, index=index)
+
+
+def iterrows_payload(df):
+    # The serializer get_trade_signal used before
+    candlestick_data = []
+    for timestamp, row in df.iterrows():
+        candlestick_data.append({
+            "timestamp": timestamp.isoformat(),
+            "open": float(row["Open"]),
+            "high": float(row["High"]),
+            "low": float(row["Low"]),
+            "close": float(row["Close"]),
+            "volume": float(row["Volume"])
+        })
+    return candlestick_data
+
+
+def time_it(fn, df):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        body = fn(df)
+    return (time.perf_counter() - start) / REPEATS * 1000, len(body)
+
+
+def run():
+    candidates = {
+        "iterrows + jsonable_encoder": lambda df: json.dumps(jsonable_encoder(iterrows_payload(df))).encode(),
+        "vectorized rows + dumps": lambda df: dumps(candlestick_rows(df)),
+        "columnar + dumps": lambda df: dumps(candlestick_columns(df)),
+    }
+    results = []
+    for n in BAR_COUNTS:
+        df = make_bars(n)
+        if candlestick_rows(df) != iterrows_payload(df):
+            raise AssertionError("vectorized rows differ from the iterrows payload")
+        for name, fn in candidates.items():
+            ms, size = time_it(fn, df)
+            results.append({"bars": n, "serializer": name, "ms": round(ms, 4), "bytes": size})
+            print(f"{n:>6} bars  {name:<30} {ms:9.3f} ms  {size:>9} bytes")
+    return results
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency of get_trade_signal and the /api/analysis route against local fakes of every
+upstream service (see benchmarks/fakes.py), emitted as JSON for tracking regressions.
+
+Scenarios cover cold (empty caches and bar store) vs. warm, a single request vs. concurrent
+requests, and the best case (pattern found on the first setting) vs. the worst case (no pattern,
+every setting evaluated).
+
+Run from the backend directory:
+    python -m benchmarks.end_to_end --concurrency 8 --output bench.json
+    python -m benchmarks.end_to_end --latency gemini=0.2 --latency yf_download=0.05
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Everything stateful lives in a scratch directory
+SCRATCH_DIR = tempfile.mkdtemp(prefix="bench_")
+os.environ["BAR_STORE_DIR"] = os.path.join(SCRATCH_DIR, "bars")
+os.environ["SYMBOLS_FILE"] = os.path.join(SCRATCH_DIR, "symbols.txt")
+os.environ["SENTIMENT_CACHE_DB"] = ""
+os.environ["SHARED_CACHE_DB"] = ""
+
+import httpx
+import numpy as np
+
+import utils.bar_store as bar_store
+import utils.pap as pap
+import utils.sentiment as sentiment
+import utils.sentiment_cache as sentiment_cache
+import utils.symbols as symbols
+from benchmarks.fakes import DEFAULT_LATENCY, FakeUpstreams
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOG", "META", "TSLA", "AMD", "NFLX", "INTC",
+           "ORCL", "CRM", "ADBE", "QCOM", "AVGO", "TXN"]
+
+# Pipeline functions timed as stages: (module, attribute, stage name)
+STAGES = [
+    (pap, "lookup_ticker_upstream", "ticker_check"),
+    (pap, "get_pap_windows", "bars"),
+    (pap, "render_close_images", "render"),
+    (pap, "score_pap_windows", "pap"),
+    (pap, "get_news_data_today", "news"),
+    (sentiment, "get_polygon_news_data", "news_polygon"),
+    (sentiment, "get_newsapi_news_data", "news_newsapi"),
+]
+
+
+def summarize(seconds: list[float]) -> dict:
+    if not seconds:
+        return {"count": 0}
+    ms = np.array(seconds) * 1000
+    return {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def instrument_stages(upstreams: FakeUpstreams):
+    # Wrap each stage function so its calls are recorded next to the upstream calls
+    for module, name, stage in STAGES:
+        fn = getattr(module, name)
+
+        def timed(*args, _fn=fn, _stage=stage, **kwargs):
+            with upstreams.timed(f"stage:{_stage}"):
+                return _fn(*args, **kwargs)
+
+        setattr(module, name, timed)
+
+
+def reset_state(upstreams: FakeUpstreams):
+    # Cold start: empty result caches, sentiment cache, bar store and symbol index
+    run_dir = tempfile.mkdtemp(dir=SCRATCH_DIR)
+    bar_store._bar_store = bar_store.BarStore(os.path.join(run_dir, "bars"))
+    sentiment_cache._sentiment_cache = sentiment_cache.SentimentCache(db_path="")
+    symbols._symbol_index = symbols.SymbolIndex(path=os.path.join(run_dir, "symbols.txt"))
+    pap.pap_result_cache.clear()
+    pap.news_result_cache.clear()
+    upstreams.reset_calls()
+
+
+def collect(upstreams: FakeUpstreams) -> tuple[dict, dict]:
+    stages, calls = {}, {}
+    for name, seconds in upstreams.calls.items():
+        if name.startswith("stage:"):
+            stages[name[len("stage:"):]] = summarize(seconds)
+        else:
+            calls[name] = summarize(seconds)
+    return stages, calls
+
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def run_sync(tickers: list[str]) -> list[float]:
+    # get_trade_signal for each ticker, all at once from separate threads
+    if len(tickers) == 1:
+        return [time_call(pap.get_trade_signal, tickers[0])]
+    with ThreadPoolExecutor(max_workers=len(tickers)) as executor:
+        return list(executor.map(lambda t: time_call(pap.get_trade_signal, t), tickers))
+
+
+async def run_route(client: httpx.AsyncClient, tickers: list[str]) -> list[float]:
+    # GET /api/analysis/{ticker} for each ticker concurrently
+    async def request(ticker):
+        start = time.perf_counter()
+        response = await client.get(f"/api/analysis/{ticker}")
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    return list(await asyncio.gather(*(request(t) for t in tickers)))
+
+
+def scenarios(concurrency: int):
+    single = TICKERS[:1]
+    distinct = (TICKERS * (concurrency // len(TICKERS) + 1))[:concurrency]
+    yield "single", single
+    yield f"concurrent_distinct_x{concurrency}", distinct
+    yield f"concurrent_same_x{concurrency}", single * concurrency
+
+
+def run(latency: dict | None = None, concurrency: int = 8) -> dict:
+    upstreams = FakeUpstreams(latency)
+    upstreams.install()
+    instrument_stages(upstreams)
+
+    from main import app
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark")
+    loop = asyncio.new_event_loop()
+
+    results = []
+    for case, pap_mode in [("best", "pattern"), ("worst", "noise")]:
+        upstreams.pap_mode = pap_mode
+        for path in ["get_trade_signal", "route"]:
+            for name, tickers in scenarios(concurrency):
+                reset_state(upstreams)
+                for temperature in ["cold", "warm"]:
+                    upstreams.reset_calls()
+                    start = time.perf_counter()
+                    if path == "route":
+                        latencies = loop.run_until_complete(run_route(client, tickers))
+                    else:
+                        latencies = run_sync(tickers)
+                    wall = time.perf_counter() - start
+                    stages, calls = collect(upstreams)
+                    results.append({
+                        "path": path,
+                        "case": case,
+                        "scenario": name,
+                        "temperature": temperature,
+                        "requests": len(tickers),
+                        "wall_ms": round(wall * 1000, 3),
+                        "end_to_end": summarize(latencies),
+                        "stages": stages,
+                        "upstream_calls": calls,
+                    })
+                    print(f"{path:<16} {case:<5} {name:<26} {temperature:<4} "
+                          f"p50 {results[-1]['end_to_end']['p50_ms']:>9.1f} ms  wall {wall * 1000:>9.1f} ms",
+                          file=sys.stderr)
+
+    loop.run_until_complete(client.aclose())
+    loop.close()
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "latency_seconds": upstreams.latency,
+        "concurrency": concurrency,
+        "results": results,
+    }
+
+
+def parse_latency(values: list[str]) -> dict:
+    latency = {}
+    for value in values:
+        name, _, seconds = value.partition("=")
+        if name not in DEFAULT_LATENCY:
+            raise SystemExit(f"Unknown upstream {name!r}; choose from {', '.join(DEFAULT_LATENCY)}")
+        latency[name] = float(seconds)
+    return latency
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--latency", action="append", default=[], metavar="UPSTREAM=SECONDS",
+                        help="override a fake's latency (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # the pipeline's progress prints would corrupt the JSON on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = run(parse_latency(args.latency), args.concurrency)
+
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
@@ -0,0 +1,209 @@
+"""
+Deterministic local stand-ins for every upstream service the analysis pipeline calls:
+yfinance (download and Ticker.info), Polygon news, NewsAPI, Gemini and the TFLite PAP model.
+Each fake sleeps for a configurable latency and records how often and how long it was called.
+
+    upstreams = FakeUpstreams(latency={"gemini": 0.5})
+    upstreams.install()
+"""
+
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+# Seconds per call; invoke costs invoke_base plus invoke_per_image for every image in the batch
+DEFAULT_LATENCY = {
+    "yf_download": 0.30,
+    "yf_info": 0.30,
+    "polygon": 0.25,
+    "newsapi": 0.30,
+    "gemini": 0.80,
+    "invoke_base": 0.010,
+    "invoke_per_image": 0.002,
+}
+
+POLYGON_ARTICLES = 10
+NEWSAPI_ARTICLES = 5
+PATTERN_CLASS = 1   # Bullish Flag
+NOISE_CLASS = 6
+
+
+def _seed(*parts) -> int:
+    return zlib.crc32("|".join(str(p) for p in parts).encode())
+
+
+def _utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tz is None else ts.tz_convert("UTC")
+
+
+def fake_bars(ticker: str, start, end, interval: str = "1m") -> pd.DataFrame:
+    # Regular-session bars whose prices are a pure function of (ticker, timestamp), so
+    # overlapping requests always agree, like a real provider
+    step = pd.Timedelta(interval)
+    index = pd.date_range(_utc(start).ceil(step), _utc(end), freq=step, inclusive="left", name="Datetime")
+    minutes_of_day = index.hour * 60 + index.minute
+    index = index[(index.dayofweek < 5) & (minutes_of_day >= 13 * 60 + 30) & (minutes_of_day < 20 * 60)]
+
+    seed = _seed(ticker) % 1000
+    t = index.asi8 // 60_000_000_000
+    base = 50 + seed / 5
+    close = base * (1 + 0.010 * np.sin(t / 37 + seed) + 0.004 * np.sin(t / 7.3 + seed / 3) + 0.002 * np.sin(t * 1.7))
+    wiggle = base * 0.0008 * (1 + np.abs(np.sin(t * 2.3 + seed)))
+    open_ = close - base * 0.0005 * np.sin(t * 3.1)
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + wiggle,
+        "Low": np.minimum(open_, close) - wiggle,
+        "Close": close,
+        "Volume": 1000 + (t * 7919 + seed) % 5000,
+    }, index=index)
+
+
+class FakeInterpreter:
+    # Same calls as tflite.Interpreter; every image gets a confident pattern or Noise
+    def __init__(self, upstreams):
+        self.upstreams = upstreams
+        self._shape = [1, 128, 128, 3]
+        self._input = None
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array(self._shape), "dtype": np.float32}]
+
+    def get_output_details(self):
+        return [{"index": 1, "shape": np.array([self._shape[0], 7]), "dtype": np.float32}]
+
+    def resize_tensor_input(self, index, shape):
+        self._shape = list(shape)
+
+    def allocate_tensors(self):
+        pass
+
+    def set_tensor(self, index, value):
+        self._input = value
+
+    def invoke(self):
+        latency = self.upstreams.latency
+        with self.upstreams.timed("invoke"):
+            time.sleep(latency["invoke_base"] + latency["invoke_per_image"] * len(self._input))
+
+    def get_tensor(self, index):
+        preds = np.full((len(self._input), 7), 0.1 / 6, dtype=np.float32)
+        preds[:, PATTERN_CLASS if self.upstreams.pap_mode == "pattern" else NOISE_CLASS] = 0.9
+        return preds
+
+
+class FakeUpstreams:
+    def __init__(self, latency: dict | None = None, pap_mode: str = "noise"):
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.pap_mode = pap_mode    # "pattern": found on the first setting, "noise": none found
+        self._lock = threading.Lock()
+        self.calls = defaultdict(list)
+
+    def timed(self, name: str):
+        upstreams = self
+
+        class _Timer:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                with upstreams._lock:
+                    upstreams.calls[name].append(time.perf_counter() - self.start)
+
+        return _Timer()
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls = defaultdict(list)
+
+    # yfinance
+
+    def download(self, tickers, start=None, end=None, interval="1d", group_by="column", progress=True, **kwargs):
+        with self.timed("yf_download"):
+            time.sleep(self.latency["yf_download"])
+            if isinstance(tickers, str):
+                df = fake_bars(tickers, start, end, interval)
+                df.columns = pd.MultiIndex.from_product([df.columns, [tickers]], names=["Price", "Ticker"])
+                return df
+            frames = {ticker: fake_bars(ticker, start, end, interval) for ticker in tickers}
+            return pd.concat(frames, axis=1, names=["Ticker", "Price"])
+
+    def ticker(self, symbol: str):
+        upstreams = self
+
+        class _Ticker:
+            @property
+            def info(self):
+                with upstreams.timed("yf_info"):
+                    time.sleep(upstreams.latency["yf_info"])
+                    return {"symbol": symbol.upper(), "quoteType": "EQUITY"}
+
+        return _Ticker()
+
+    # Polygon and NewsAPI
+
+    def list_ticker_news(self, ticker=None, limit=10, **kwargs):
+        with self.timed("polygon"):
+            time.sleep(self.latency["polygon"])
+            return [
+                SimpleNamespace(
+                    article_url=f"https://news.example/polygon/{ticker}/{i}",
+                    title=f"{ticker} headline {i}",
+                    description=f"{ticker} polygon story {i} about earnings, guidance and demand",
+                    author="Benchmark",
+                    image_url=None,
+                    published_utc=f"2025-07-08T{10 + i % 8:02d}:{i:02d}:00Z",
+                    publisher=SimpleNamespace(name="Polygon Fake"),
+                )
+                for i in range(min(limit, POLYGON_ARTICLES))
+            ]
+
+    def get_everything(self, q=None, page_size=5, **kwargs):
+        with self.timed("newsapi"):
+            time.sleep(self.latency["newsapi"])
+            return {"status": "ok", "articles": [
+                {
+                    "url": f"https://news.example/newsapi/{q}/{i}",
+                    "title": f"{q} feature {i}",
+                    "description": f"{q} newsapi feature {i} on the sector outlook",
+                    "author": "Benchmark",
+                    "urlToImage": None,
+                    "publishedAt": f"2025-07-07T{12 + i % 8:02d}:00:00Z",
+                    "source": {"name": "NewsAPI Fake"},
+                }
+                for i in range(min(page_size, NEWSAPI_ARTICLES))
+            ]}
+
+    # Gemini
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        with self.timed("gemini"):
+            time.sleep(self.latency["gemini"])
+            snippets = re.findall(r"^\d+\. (.*)$", prompt.split("News snippets:", 1)[-1], re.MULTILINE)
+            scores = [round((_seed(text) % 200 - 100) / 100, 2) for text in snippets]
+            return SimpleNamespace(text=str(scores))
+
+    def install(self):
+        # Point every upstream the backend uses at these fakes
+        import yfinance
+
+        import utils.pap as pap
+        import utils.sentiment as sentiment
+        from utils.interpreter_pool import InterpreterPool
+
+        yfinance.download = self.download
+        yfinance.Ticker = self.ticker
+        sentiment._polygon_client = SimpleNamespace(list_ticker_news=self.list_ticker_news)
+        sentiment._newsapi_client = SimpleNamespace(get_everything=self.get_everything)
+        sentiment._model = SimpleNamespace(generate_content=self.generate_content)
+        pap._pap_model = InterpreterPool(
+            "fake.tflite", size=pap.PAP_POOL_SIZE, num_threads=pap.PAP_NUM_THREADS,
+            make_interpreter=lambda path, threads: FakeInterpreter(self),
+        )
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Check the incremental indicator state against calculate_atr and rolling min/max, and time both
+Run from the backend directory: python -m benchmarks.indicator_parity
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.indicators import IndicatorState, wilder_atr
+from utils.pap import calculate_atr
+
+ATR_PERIOD = 14
+WINDOW = 30
+BARS = 2000
+NEW_BARS = 200
+
+
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(scale=0.1, size=n))
+    spread = np.abs(rng.normal(scale=0.05, size=(2, n)))
+    index = pd.date_range("2025-07-08 13:30", periods=n, freq="1min", tz="UTC")
+    return pd.DataFrame({
+        "Open": close + rng.normal(scale=0.02, size=n),
+        "High": close + spread[0],
+        "Low": close - spread[1],
+        "Close": close,
+        "Volume": rng.integers(100, 10_000, size=n).astype(float),
+    }, index=index)
+
+
+def calculate_atr_dataframe(data, period):
+    # The previous implementation: copies of three shifted columns and a row-wise max
+    data = data.copy()
+    true_range = pd.DataFrame({
+        'hl': data['High'] - data['Low'],
+        'hc': (data['High'] - data['Close'].shift(1)).abs(),
+        'lc': (data['Low'] - data['Close'].shift(1)).abs(),
+    }).max(axis=1, skipna=False)
+    return true_range.ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+
+
+def check_parity(df):
+    expected_atr = calculate_atr_dataframe(df, ATR_PERIOD)
+    pd.testing.assert_series_equal(calculate_atr(df, ATR_PERIOD), expected_atr.rename(f"ATR_{ATR_PERIOD}"))
+    np.testing.assert_array_equal(
+        wilder_atr(df["High"].to_numpy(), df["Low"].to_numpy(), df["Close"].to_numpy(), ATR_PERIOD),
+        expected_atr.to_numpy(),
+    )
+
+    expected_low = df["Low"].rolling(WINDOW, min_periods=1).min().to_numpy()
+    expected_high = df["High"].rolling(WINDOW, min_periods=1).max().to_numpy()
+    state = IndicatorState(ATR_PERIOD, WINDOW)
+    mismatches = 0
+    for i, (ts, row) in enumerate(df.iterrows()):
+        state.update(row["High"], row["Low"], row["Close"], ts)
+        atr = expected_atr.iloc[i]
+        if (state.atr is None) != np.isnan(atr) or (state.atr is not None and state.atr != atr):
+            mismatches += 1
+        if state.low != expected_low[i] or state.high != expected_high[i]:
+            mismatches += 1
+    if mismatches:
+        raise AssertionError(f"{mismatches} bars where the incremental state differs")
+    print(f"parity: {len(df)} bars, incremental ATR and rolling low/high match exactly")
+
+
+def run():
+    df = make_bars(BARS + NEW_BARS)
+    check_parity(df)
+    history, new_bars = df.iloc[:BARS], df.iloc[BARS:]
+
+    # Re-evaluating after each new bar: full recompute vs one O(1) update
+    start = time.perf_counter()
+    for i in range(1, NEW_BARS + 1):
+        window = df.iloc[:BARS + i]
+        calculate_atr_dataframe(window, ATR_PERIOD).iloc[-1]
+        window["Low"].iloc[-WINDOW:].min(), window["High"].iloc[-WINDOW:].max()
+    old_us = (time.perf_counter() - start) / NEW_BARS * 1e6
+
+    start = time.perf_counter()
+    for i in range(1, NEW_BARS + 1):
+        calculate_atr(df.iloc[:BARS + i], ATR_PERIOD).iloc[-1]
+    vectorized_us = (time.perf_counter() - start) / NEW_BARS * 1e6
+
+    state = IndicatorState.from_bars(history, ATR_PERIOD, WINDOW)
+    rows = list(zip(new_bars["High"].to_numpy(), new_bars["Low"].to_numpy(), new_bars["Close"].to_numpy(), new_bars.index))
+    start = time.perf_counter()
+    for high, low, close, ts in rows:
+        state.update(high, low, close, ts)
+        state.atr, state.low, state.high
+    incremental_us = (time.perf_counter() - start) / NEW_BARS * 1e6
+
+    results = {
+        "recompute_dataframe_us": round(old_us, 2),
+        "recompute_numpy_us": round(vectorized_us, 2),
+        "incremental_us": round(incremental_us, 2),
+    }
+    for name, value in results.items():
+        print(f"{name:<24} {value:>10.2f} us per new bar")
+    return results
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Peak memory per concurrent get_trade_signal request against the local fakes (benchmarks/fakes.py).
+
+Each concurrency level runs in a fresh interpreter: after a warm-up request (imports, model,
+first-use allocations) it records the baseline, runs N distinct tickers at once from separate
+threads with an empty bar store, and reports per request:
+    - peak traced allocations (tracemalloc, which also sees NumPy and pandas buffers)
+    - peak resident memory above the baseline, sampled every millisecond
+    - garbage collections triggered
+
+Run from the backend directory, and on an older checkout to compare:
+    python -m benchmarks.memory_per_request --concurrency 1 4 16 --output memory.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOG", "META", "TSLA", "AMD", "NFLX", "INTC",
+           "ORCL", "CRM", "ADBE", "QCOM", "AVGO", "TXN", "IBM", "CSCO", "PEP", "KO"]
+# Upstream latency is kept small: this measures memory, and requests should overlap in the CPU stages
+LATENCY = {"yf_download": 0.02, "yf_info": 0.0, "polygon": 0.01, "newsapi": 0.01, "gemini": 0.02,
+           "invoke_base": 0.0, "invoke_per_image": 0.0}
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class RssSampler:
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.peak = _rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_bytes())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+def measure(concurrency: int) -> dict:
+    # Runs in a fresh process
+    os.environ["BAR_STORE_DIR"] = tempfile.mkdtemp(prefix="bench_memory_")
+    os.environ["SYMBOLS_FILE"] = os.path.join(os.environ["BAR_STORE_DIR"], "symbols.txt")
+    os.environ["SENTIMENT_CACHE_DB"] = ""
+    os.environ["SHARED_CACHE_DB"] = ""
+    import tracemalloc
+
+    import utils.pap as pap
+    from benchmarks.fakes import FakeUpstreams
+
+    FakeUpstreams(LATENCY, pap_mode="noise").install()
+    pap.get_trade_signal("SPY")     # warm up everything that is allocated once per process
+    tickers = (TICKERS * (concurrency // len(TICKERS) + 1))[:concurrency]
+
+    gc.collect()
+    collections_before = sum(stat["collections"] for stat in gc.get_stats())
+    baseline = _rss_bytes()
+    tracemalloc.start()
+    started = time.perf_counter()
+    with RssSampler() as sampler, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(pap.get_trade_signal, tickers))
+    elapsed = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    collections = sum(stat["collections"] for stat in gc.get_stats()) - collections_before
+
+    mb = 2**20
+    return {
+        "concurrency": concurrency,
+        "wall_ms": round(elapsed * 1000, 1),
+        "traced_peak_mb": round(traced_peak / mb, 2),
+        "traced_peak_mb_per_request": round(traced_peak / mb / concurrency, 3),
+        "rss_peak_over_baseline_mb": round((sampler.peak - baseline) / mb, 2),
+        "rss_peak_mb_per_request": round((sampler.peak - baseline) / mb / concurrency, 3),
+        "gc_collections": collections,
+    }
+
+
+def check_window_parity():
+    # The compact windows match what the DataFrame pipeline built: resample_bars, calculate_atr,
+    # dropped warm-up rows and the last lookback bars
+    import pandas as pd
+
+    from benchmarks.fakes import fake_bars
+    from utils.bars import Bars
+    from utils.market_data import resample_bars
+    from utils.pap import ATR_PERIOD, build_pap_windows, calculate_atr, interval_settings, pap_window_span
+
+    now = pd.Timestamp("2025-07-08 18:00", tz="UTC")
+    df = fake_bars("AAPL", now - pd.Timedelta(days=3), now).astype("float64")
+    settings = list(dict.fromkeys(interval_settings))
+    windows = build_pap_windows(Bars.from_frame(df), settings, now)
+    for (interval_minutes, lookback_bars), window in zip(settings, windows):
+        bars = resample_bars(df, interval_minutes)
+        start = now - pd.Timedelta(minutes=interval_minutes * (lookback_bars + ATR_PERIOD + 10))
+        expected = bars[bars.index >= start].copy()
+        expected[f"ATR_{ATR_PERIOD}"] = calculate_atr(expected, ATR_PERIOD)
+        expected = expected.dropna().iloc[-lookback_bars:]
+        pd.testing.assert_frame_equal(window.to_frame(ATR_PERIOD), expected, check_names=False, check_freq=False)
+    print(f"parity: {len(settings)} windows match the DataFrame pipeline exactly "
+          f"({pap_window_span(settings)} minutes of 1m bars)")
+
+
+def run(levels: list[int]) -> dict:
+    check_window_parity()
+    results = []
+    for concurrency in levels:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            result = executor.submit(measure, concurrency).result()
+        results.append(result)
+        print(f"x{concurrency:<3} traced {result['traced_peak_mb_per_request']:>7.3f} MB/request  "
+              f"rss {result['rss_peak_mb_per_request']:>7.3f} MB/request  gc {result['gc_collections']}")
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.concurrency)
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
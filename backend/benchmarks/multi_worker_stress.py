@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Correctness and scaling of the cross-worker cache tier under concurrent writers, with local
+fakes of every upstream (benchmarks/fakes.py).
+
+Worker processes are forked from one parent that has already imported the pipeline, the way
+gunicorn.conf.py forks them, and share one bar store directory and one SHARED_CACHE_DB file.
+
+    stress:   every worker hammers the same few series and keys at once
+              - load_bars / load_bars_multi over overlapping ranges of the same tickers
+              - sentiment scores written and read through SentimentCache
+              - symbol verdicts through SymbolIndex
+              every value read back is checked against the fakes, and so is the final store:
+              no duplicate or out-of-order bars, exact prices, one well-formed symbol per line
+              and a clean SQLite integrity check
+    scaling:  get_trade_signal requests per second with 1, 2, 4... workers on distinct tickers
+
+Run from the backend directory:
+    python -m benchmarks.multi_worker_stress --workers 1 2 4 --output multi_worker.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import tempfile
+import time
+import zlib
+from multiprocessing import get_context
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="bench_workers_")
+SHARED_DB = os.path.join(SCRATCH_DIR, "shared_cache.db")
+os.environ["BAR_STORE_DIR"] = os.path.join(SCRATCH_DIR, "bars")
+os.environ["SYMBOLS_FILE"] = os.path.join(SCRATCH_DIR, "symbols.txt")
+os.environ["SHARED_CACHE_DB"] = SHARED_DB
+os.environ["SENTIMENT_CACHE_DB"] = SHARED_DB
+
+import numpy as np
+import pandas as pd
+
+import utils.pap as pap
+from benchmarks.fakes import FakeUpstreams, fake_bars
+from utils.bar_store import get_bar_store, to_ns
+from utils.bars import Bars
+from utils.market_data import load_bars, load_bars_multi
+from utils.sentiment_cache import SentimentCache
+from utils.symbols import SymbolIndex
+
+STRESS_TICKERS = ["AAPL", "MSFT", "NVDA"]
+SCALING_TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOG", "META", "TSLA", "AMD", "NFLX", "INTC",
+                   "ORCL", "CRM", "ADBE", "QCOM", "AVGO", "TXN", "IBM", "CSCO", "PEP", "KO"]
+# Every stress request starts here and ends within the following week
+SERIES_START = pd.Timestamp("2025-06-30 13:30", tz="UTC")
+STRESS_LATENCY = {"yf_download": 0.002, "yf_info": 0.0, "polygon": 0.0, "newsapi": 0.0, "gemini": 0.0,
+                  "invoke_base": 0.0, "invoke_per_image": 0.0}
+SCALING_LATENCY = {"yf_download": 0.0, "yf_info": 0.0, "polygon": 0.0, "newsapi": 0.0, "gemini": 0.0,
+                   "invoke_base": 0.002, "invoke_per_image": 0.0005}
+
+
+def expected_score(key: str) -> float:
+    return (zlib.crc32(key.encode()) % 2001 - 1000) / 1000
+
+
+def expected_verdict(symbol: str) -> bool:
+    return zlib.crc32(symbol.encode()) % 3 != 0
+
+
+def check_bars(ticker: str, bars: Bars | None, end):
+    expected = Bars.from_frame(fake_bars(ticker, SERIES_START, end).astype("float64"))
+    if bars is None:
+        assert expected.empty, f"{ticker}: no bars returned, expected {len(expected)}"
+        return
+    assert np.array_equal(bars.time, expected.time), f"{ticker}: bar times differ up to {end}"
+    for field in ("open", "high", "low", "close", "volume"):
+        assert np.array_equal(getattr(bars, field), getattr(expected, field)), f"{ticker}: {field} differs up to {end}"
+
+
+def stress_worker(worker: int, rounds: int) -> dict:
+    FakeUpstreams(STRESS_LATENCY).install()
+    rng = random.Random(worker)
+    sentiment = SentimentCache(max_size=64)
+    symbols = SymbolIndex(refresh_seconds=0.05)
+    counts = {"bar_loads": 0, "sentiment_reads": 0, "sentiment_writes": 0, "symbol_lookups": 0}
+
+    for i in range(rounds):
+        # ends move forward with the round, so workers keep extending the same series at once
+        step = 7 * 24 * 60 // rounds
+        end = SERIES_START + pd.Timedelta(minutes=30 + i * step + rng.randrange(step))
+        if rng.random() < 0.3:
+            for ticker, bars in load_bars_multi(STRESS_TICKERS, "1m", SERIES_START, end).items():
+                check_bars(ticker, bars, end)
+        else:
+            ticker = rng.choice(STRESS_TICKERS)
+            check_bars(ticker, load_bars(ticker, "1m", SERIES_START, end), end)
+        counts["bar_loads"] += 1
+
+        keys = [f"article-{rng.randrange(500)}" for _ in range(20)]
+        sentiment.set_many({key: expected_score(key) for key in keys[:10]})
+        for key, score in sentiment.get_many(keys).items():
+            assert score == expected_score(key), f"sentiment {key}: {score}"
+        counts["sentiment_writes"] += 10
+        counts["sentiment_reads"] += len(keys)
+
+        for symbol in (f"SYM{rng.randrange(200)}" for _ in range(10)):
+            verdict = symbols.lookup(symbol)
+            if verdict is None:
+                symbols.remember(symbol, expected_verdict(symbol))
+            else:
+                assert verdict == expected_verdict(symbol), f"symbol {symbol}: {verdict}"
+            counts["symbol_lookups"] += 1
+    return counts
+
+
+def check_final_state():
+    store = get_bar_store()
+    for ticker in STRESS_TICKERS:
+        coverage = store.coverage(ticker, "1m")
+        assert coverage is not None and coverage[0] == to_ns(SERIES_START), f"{ticker}: coverage {coverage}"
+        stored = Bars.from_columns(store.read(ticker, "1m", coverage[0], coverage[1]))
+        assert np.all(np.diff(stored.time) > 0), f"{ticker}: duplicate or out-of-order bars in the store"
+        check_bars(ticker, stored, pd.Timestamp(coverage[1], tz="UTC"))
+
+    with open(os.environ["SYMBOLS_FILE"]) as f:
+        lines = f.read().split("\n")
+    assert lines[-1] == "", "symbols file does not end with a newline"
+    for line in lines[:-1]:
+        assert line.startswith("SYM") and line[3:].isdigit(), f"malformed symbols line {line!r}"
+        assert expected_verdict(line), f"rejected symbol {line} recorded as valid"
+
+    with sqlite3.connect(SHARED_DB) as conn:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok", "shared cache is corrupt"
+        rows = conn.execute("SELECT key, score FROM sentiment").fetchall()
+    assert all(score == expected_score(key) for key, score in rows), "sentiment table holds a wrong score"
+    return {"sentiment_rows": len(rows), "symbol_lines": len(lines) - 1}
+
+
+def run_stress(workers: int, rounds: int) -> dict:
+    started = time.perf_counter()
+    with get_context("fork").Pool(workers) as pool:
+        per_worker = pool.starmap(stress_worker, [(i, rounds) for i in range(workers)])
+    totals = {key: sum(counts[key] for counts in per_worker) for key in per_worker[0]}
+    final = check_final_state()
+    result = {"workers": workers, "rounds": rounds, "seconds": round(time.perf_counter() - started, 2), **totals, **final}
+    print(f"stress: {workers} workers x {rounds} rounds ok in {result['seconds']} s "
+          f"({totals['bar_loads']} bar loads, {final['sentiment_rows']} shared scores, {final['symbol_lines']} symbols)")
+    return result
+
+
+def scaling_worker(worker: int, workers: int, seconds: float, start_at: float) -> int:
+    FakeUpstreams(SCALING_LATENCY).install()
+    tickers = SCALING_TICKERS[worker::workers] or SCALING_TICKERS
+    pap.get_trade_signal(tickers[0])    # first request per worker pays for model and caches
+    while time.time() < start_at:
+        time.sleep(0.001)
+    done, i = 0, 0
+    while time.time() < start_at + seconds:
+        pap.get_trade_signal(tickers[i % len(tickers)])
+        done += 1
+        i += 1
+    return done
+
+
+def run_scaling(levels: list[int], seconds: float) -> list[dict]:
+    results = []
+    for workers in levels:
+        with get_context("fork").Pool(workers) as pool:
+            start_at = time.time() + 2.0
+            done = sum(pool.starmap(scaling_worker, [(i, workers, seconds, start_at) for i in range(workers)]))
+        rate = done / seconds
+        base = results[0]["requests_per_second"] / results[0]["workers"] if results else rate / workers
+        results.append({
+            "workers": workers,
+            "requests": done,
+            "requests_per_second": round(rate, 1),
+            "scaling_efficiency": round(rate / (base * workers), 2),
+        })
+        print(f"scaling: {workers:>2} workers {rate:>8.1f} req/s  efficiency {results[-1]['scaling_efficiency']:.2f}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rounds", type=int, default=60, help="stress rounds per worker")
+    parser.add_argument("--seconds", type=float, default=5.0, help="measurement time per scaling level")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "stress": run_stress(max(args.workers), args.rounds),
+        "scaling": run_scaling(args.workers, args.seconds),
+    }
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
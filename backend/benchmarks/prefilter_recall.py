@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Recall of the PAP pre-filter (utils/prefilter.py) against the model on historical windows, and
+the render + inference work it saves, for a sweep of PAP_PREFILTER_THRESHOLD values.
+
+A window counts as positive when the model, scoring it without the pre-filter, reports a
+bullish or bearish pattern at PAP_CONFIDENCE_THRESHOLD. Recall is the share of positives a
+threshold keeps; skip rate is the share of all windows it never renders.
+
+Run from the backend directory:
+    python -m benchmarks.prefilter_recall --output prefilter.json
+    python -m benchmarks.prefilter_recall --tickers AAPL MSFT NVDA --start 2025-06-09 --end 2025-07-08
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from benchmarks.backtest_throughput import make_session_bars
+from utils.backtest import score_close_windows
+from utils.market_data import OHLCV_COLUMNS, load_bars, resample_bars
+from utils.pap import interval_settings
+from utils.prefilter import plausibility_scores
+
+THRESHOLDS = [0.0, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.6, 0.7]
+
+
+def history_windows(tickers, start, end, stride: int) -> dict:
+    # (interval, lookback) -> (N, lookback) close windows over every ticker's history
+    if tickers:
+        loaded = [load_bars(t, "1m", pd.Timestamp(start, tz="UTC"), pd.Timestamp(end, tz="UTC")) for t in tickers]
+        frames = [bars.to_frame() for bars in loaded if bars is not None]
+    else:
+        frames = [make_session_bars(10, seed=i) for i in range(3)]
+
+    windows = {}
+    for interval_minutes, lookback_bars in dict.fromkeys(interval_settings):
+        per_frame = []
+        for df in frames:
+            closes = resample_bars(df[OHLCV_COLUMNS], interval_minutes)["Close"].to_numpy(dtype=np.float64)
+            if len(closes) >= lookback_bars:
+                per_frame.append(sliding_window_view(closes, lookback_bars)[::stride])
+        if per_frame:
+            windows[(interval_minutes, lookback_bars)] = np.concatenate(per_frame)
+    return windows
+
+
+def sweep(scores: np.ndarray, positives: np.ndarray, model_seconds: float, filter_seconds: float) -> list[dict]:
+    rows = []
+    for threshold in THRESHOLDS:
+        kept = scores >= threshold
+        # render + inference scale with the windows kept; the filter itself is paid on all of them
+        seconds = filter_seconds + model_seconds * kept.mean()
+        rows.append({
+            "threshold": threshold,
+            "recall": round(float(kept[positives].mean()), 4) if positives.any() else None,
+            "positives_lost": int(np.count_nonzero(positives & ~kept)),
+            "skip_rate": round(float(1 - kept.mean()), 4),
+            "speedup": round(model_seconds / seconds, 2) if seconds else None,
+        })
+    return rows
+
+
+def run(tickers=None, start=None, end=None, stride: int = 3) -> dict:
+    windows = history_windows(tickers, start, end, stride)
+    settings, all_scores, all_positives = [], [], []
+    model_total = filter_total = 0.0
+    for (interval_minutes, lookback_bars), closes in windows.items():
+        started = time.perf_counter()
+        signals, _ = score_close_windows(closes, prefilter_threshold=0)
+        model_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        scores = plausibility_scores(closes)
+        filter_seconds = time.perf_counter() - started
+
+        positives = signals != 0
+        model_total += model_seconds
+        filter_total += filter_seconds
+        all_scores.append(scores)
+        all_positives.append(positives)
+        settings.append({
+            "setting": f"{interval_minutes}m/{lookback_bars}",
+            "windows": len(closes),
+            "positives": int(positives.sum()),
+            "model_us_per_window": round(model_seconds / len(closes) * 1e6, 1),
+            "filter_us_per_window": round(filter_seconds / len(closes) * 1e6, 2),
+            "thresholds": sweep(scores, positives, model_seconds, filter_seconds),
+        })
+        print(f"{settings[-1]['setting']:<8} {len(closes):>7} windows  {settings[-1]['positives']:>6} positives  "
+              f"model {settings[-1]['model_us_per_window']:>8.1f} us  filter {settings[-1]['filter_us_per_window']:>6.2f} us")
+
+    scores, positives = np.concatenate(all_scores), np.concatenate(all_positives)
+    overall = sweep(scores, positives, model_total, filter_total)
+    for row in overall:
+        print(f"threshold {row['threshold']:<5} recall {row['recall']}  skip {row['skip_rate']:.1%}  "
+              f"speedup {row['speedup']}x")
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "source": ",".join(tickers) if tickers else "synthetic",
+        "windows": len(scores),
+        "positives": int(positives.sum()),
+        "overall": overall,
+        "settings": settings,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tickers", nargs="*", help="evaluate on real 1m bars (default: synthetic bars)")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--stride", type=int, default=3, help="score every Nth window")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.tickers, args.start, args.end, args.stride)
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Compare the float, dynamic-range and int8 PAP models (see convert_to_tflite.py --mode) on the
+same rendered chart windows: class and signal agreement with the float model, confidence at
+PAP_CONFIDENCE_THRESHOLD, per-invoke latency and memory. Models whose file is missing are
+skipped. Inputs and outputs go through pap.invoke_pap_model, so int8 models are quantized and
+dequantized exactly as in serving.
+
+Run from the backend directory:
+    python -m benchmarks.quantization_compare --output quantization.json
+    python -m benchmarks.quantization_compare --tickers AAPL MSFT --start 2025-06-09 --end 2025-07-08
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.backtest_throughput import make_session_bars
+from utils.backtest import classify_pap_predictions, history_close_images
+from utils.interpreter_pool import InterpreterPool
+from utils.market_data import load_bars
+from utils.pap import PAP_CONFIDENCE_THRESHOLD, PAP_MODEL_PATHS, PAP_NUM_THREADS, interval_settings, invoke_pap_model
+
+# One live analysis scores one image per distinct setting in a single invoke
+LATENCY_BATCH_SIZES = [1, len(set(interval_settings))]
+EVAL_BATCH_SIZE = 64
+
+
+def evaluation_images(tickers, start, end, samples: int, seed: int = 0) -> np.ndarray:
+    # Rendered windows of every live setting, from real bars or (without tickers) synthetic ones
+    if tickers:
+        loaded = [load_bars(t, "1m", pd.Timestamp(start, tz="UTC"), pd.Timestamp(end, tz="UTC")) for t in tickers]
+        frames = [bars.to_frame() for bars in loaded if bars is not None]
+    else:
+        frames = [make_session_bars(5, seed=i) for i in range(2)]
+    images = np.concatenate([history_close_images(df, interval_settings, stride=7) for df in frames])
+    rng = np.random.default_rng(seed)
+    return images[np.sort(rng.choice(len(images), size=min(samples, len(images)), replace=False))]
+
+
+def load_model(path: str, num_threads: int) -> InterpreterPool:
+    return InterpreterPool(path, size=1, num_threads=num_threads)
+
+
+def predict(pool: InterpreterPool, images: np.ndarray) -> np.ndarray:
+    with pool.interpreter() as interpreter:
+        return np.concatenate([
+            invoke_pap_model(interpreter, images[i:i + EVAL_BATCH_SIZE])
+            for i in range(0, len(images), EVAL_BATCH_SIZE)
+        ])
+
+
+def invoke_latency(pool: InterpreterPool, images: np.ndarray, batch_size: int, repeats: int) -> dict:
+    batch = images[:batch_size]
+    with pool.interpreter() as interpreter:
+        invoke_pap_model(interpreter, batch)   # resize and warm up outside the timing
+        seconds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            invoke_pap_model(interpreter, batch)
+            seconds.append(time.perf_counter() - start)
+    ms = np.array(seconds) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p95_ms": round(float(np.percentile(ms, 95)), 3)}
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _peak_rss_mb() -> float:
+    # VmHWM starts over with the new address space; ru_maxrss would carry the parent's peak
+    # across the fork and exec of a spawned process
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _memory_in_fresh_process(path: str, num_threads: int, batch_size: int) -> dict:
+    # Resident memory added by loading the model, allocating tensors and one batched invoke
+    before = _rss_mb()
+    pool = load_model(path, num_threads)
+    images = np.full((batch_size, 128, 128, 3), 255.0, dtype=np.float32)
+    with pool.interpreter() as interpreter:
+        invoke_pap_model(interpreter, images)
+    memory = {
+        "rss_added_mb": round(_rss_mb() - before, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 2),
+    }
+    pool.close()
+    return memory
+
+
+def measure_memory(path: str, num_threads: int, batch_size: int) -> dict:
+    # A fresh interpreter process per model, so one model's allocations don't hide another's
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(_memory_in_fresh_process, path, num_threads, batch_size).result()
+
+
+def compare(preds: np.ndarray, reference: np.ndarray) -> dict:
+    signals, patterns = classify_pap_predictions(preds)
+    ref_signals, ref_patterns = classify_pap_predictions(reference)
+    confident = preds.max(axis=1) >= PAP_CONFIDENCE_THRESHOLD
+    ref_confident = reference.max(axis=1) >= PAP_CONFIDENCE_THRESHOLD
+    return {
+        "class_agreement": round(float(np.mean(preds.argmax(axis=1) == reference.argmax(axis=1))), 4),
+        "signal_agreement": round(float(np.mean(signals == ref_signals)), 4),
+        "pattern_agreement": round(float(np.mean(patterns == ref_patterns)), 4),
+        "confident_rate": round(float(np.mean(confident)), 4),
+        "threshold_flips": int(np.count_nonzero(confident != ref_confident)),
+        "confidence_abs_error_mean": round(float(np.mean(np.abs(preds.max(axis=1) - reference.max(axis=1)))), 4),
+        "probability_abs_error_max": round(float(np.max(np.abs(preds - reference))), 4),
+    }
+
+
+def run(tickers=None, start=None, end=None, samples=512, repeats=50, num_threads=PAP_NUM_THREADS) -> dict:
+    models = {name: path for name, path in PAP_MODEL_PATHS.items() if os.path.exists(path)}
+    if not models:
+        raise SystemExit("No models found; run convert_to_tflite.py --mode float/dynamic/int8 first")
+    images = evaluation_images(tickers, start, end, samples)
+    print(f"Evaluating {len(models)} models on {len(images)} windows")
+
+    predictions, results = {}, {}
+    for name, path in models.items():
+        pool = load_model(path, num_threads)
+        predictions[name] = predict(pool, images)
+        results[name] = {
+            "path": path,
+            "size_mb": round(os.path.getsize(path) / 2**20, 3),
+            "latency": {f"batch_{n}": invoke_latency(pool, images, n, repeats) for n in LATENCY_BATCH_SIZES},
+            "memory": measure_memory(path, num_threads, max(LATENCY_BATCH_SIZES)),
+        }
+        pool.close()
+        print(f"{name:<8} {results[name]['size_mb']:>8.2f} MB  "
+              + "  ".join(f"{k} p50 {v['p50_ms']:.2f} ms" for k, v in results[name]["latency"].items()))
+
+    reference = "float" if "float" in predictions else next(iter(predictions))
+    for name in results:
+        results[name]["vs_" + reference] = compare(predictions[name], predictions[reference])
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "windows": len(images),
+        "confidence_threshold": PAP_CONFIDENCE_THRESHOLD,
+        "num_threads": num_threads,
+        "reference": reference,
+        "models": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tickers", nargs="*", help="evaluate on real 1m bars (default: synthetic bars)")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--samples", type=int, default=512)
+    parser.add_argument("--repeats", type=int, default=50, help="timed invokes per batch size")
+    parser.add_argument("--threads", type=int, default=PAP_NUM_THREADS)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.tickers, args.start, args.end, args.samples, args.repeats, args.threads)
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Check that utils.rasterizer matches the matplotlib chart renderer the PAP model was trained on
+Run from the backend directory: python -m benchmarks.rasterizer_parity
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from utils.image_generation import make_line_plot_image
+from utils.rasterizer import render_close_image
+
+# Tolerances on 0-255 pixel values
+MAX_MEAN_ABS_DIFF = 1.0
+MAX_BAD_PIXEL_FRACTION = 0.005  # pixels off by more than a quarter of full scale
+WINDOW_LENGTHS = [10, 15, 30, 45]
+SAMPLES_PER_LENGTH = 25
+
+
+def matplotlib_image(closes, temp_dir):
+    path = os.path.join(temp_dir, "ref.png")
+    make_line_plot_image(pd.DataFrame({"Close": closes}), out_path=path)
+    return np.array(Image.open(path).convert('RGB').resize((128, 128)), dtype=np.float32)
+
+
+def check_parity(seed=0):
+    rng = np.random.default_rng(seed)
+    mean_diffs, bad_fractions = [], []
+    ref_time = fast_time = 0.0
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for window in WINDOW_LENGTHS:
+            for _ in range(SAMPLES_PER_LENGTH):
+                closes = 100 + np.cumsum(rng.normal(scale=0.2, size=window))
+
+                start = time.perf_counter()
+                ref = matplotlib_image(closes, temp_dir)
+                ref_time += time.perf_counter() - start
+
+                start = time.perf_counter()
+                img = render_close_image(closes)
+                fast_time += time.perf_counter() - start
+
+                diff = np.abs(ref - img)
+                mean_diffs.append(diff.mean())
+                bad_fractions.append((diff > 64).mean())
+
+    n = len(mean_diffs)
+    print(f"Windows compared: {n}")
+    print(f"Mean abs diff: {np.mean(mean_diffs):.3f} (worst {np.max(mean_diffs):.3f})")
+    print(f"Bad pixel fraction: {np.mean(bad_fractions):.5f} (worst {np.max(bad_fractions):.5f})")
+    print(f"matplotlib: {ref_time / n * 1000:.2f} ms/image, rasterizer: {fast_time / n * 1000:.2f} ms/image")
+    return np.max(mean_diffs) <= MAX_MEAN_ABS_DIFF and np.max(bad_fractions) <= MAX_BAD_PIXEL_FRACTION
+
+
+if __name__ == "__main__":
+    if check_parity():
+        print("✅ Rasterizer output matches matplotlib")
+    else:
+        print("❌ Rasterizer output drifted from matplotlib")
+        exit(1)
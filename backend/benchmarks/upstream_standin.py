@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+The upstream access layer (utils/upstream.py) against a local HTTP stand-in for Polygon and
+NewsAPI. The real client libraries are used, pointed at the stand-in; yfinance's URLs can't be
+redirected, so Yahoo calls are only exercised through benchmarks/fakes.py.
+
+Scenarios, each checked and reported as JSON:
+    keep_alive    sequential NewsAPI calls with and without the pooled session: TCP connections
+                  opened and time per call
+    concurrency   a burst of Polygon calls against a slow server: most requests the server ever
+                  saw in flight must not exceed the host's limit
+    rate          calls through a token bucket: achieved rate against the configured one
+    retry         the first attempts of every call answered 429 / 503: all calls still succeed
+    budget        a server that always fails: the call gives up within its latency budget
+    no_retry      401 (bad key): exactly one attempt
+
+Run from the backend directory:
+    python -m benchmarks.upstream_standin --output upstream.json
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import utils.sentiment as sentiment
+import utils.upstream as upstream
+from utils.upstream import Upstream, newsapi_session, pool_polygon_client
+
+POLYGON_ARTICLES = 3
+NEWSAPI_ARTICLES = 3
+
+
+class StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, delay: float = 0.0, failures: int = 0, fail_status: int = 503):
+        # The first `failures` requests for each query are answered with fail_status
+        # (failures=-1: all of them)
+        with self.lock:
+            self.delay = delay
+            self.failures = failures
+            self.fail_status = fail_status
+            self.connections = 0
+            self.requests = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.attempts = defaultdict(int)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+    # headers and body go out in separate writes; with Nagle on, a kept-alive socket waits out
+    # the client's delayed ACK (~40 ms) before sending the body
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        query = (params.get("ticker") or params.get("q") or [""])[0]
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.attempts[query] += 1
+            fail = server.failures < 0 or server.attempts[query] <= server.failures
+        try:
+            time.sleep(server.delay)
+            if fail:
+                if url.path.startswith("/v2/everything"):
+                    code = {401: "apiKeyInvalid", 429: "rateLimited"}.get(server.fail_status, "unexpectedError")
+                    self._send(server.fail_status, {"status": "error", "code": code, "message": "stand-in"})
+                else:
+                    self._send(server.fail_status, {"status": "ERROR", "error": "stand-in"})
+            elif url.path.startswith("/v2/everything"):
+                self._send(200, {"status": "ok", "totalResults": NEWSAPI_ARTICLES, "articles": [
+                    {"url": f"https://news.example/{query}/{i}", "title": f"{query} {i}", "description": f"{query} story {i}",
+                     "author": "Stand-in", "urlToImage": None, "publishedAt": "2025-07-07T12:00:00Z",
+                     "source": {"id": None, "name": "Stand-in"}}
+                    for i in range(NEWSAPI_ARTICLES)
+                ]})
+            else:
+                self._send(200, {"status": "OK", "results": [
+                    {"id": f"{query}-{i}", "article_url": f"https://news.example/{query}/{i}", "title": f"{query} {i}",
+                     "description": f"{query} story {i}", "author": "Stand-in", "published_utc": "2025-07-08T12:00:00Z",
+                     "publisher": {"name": "Stand-in"}, "tickers": [query]}
+                    for i in range(POLYGON_ARTICLES)
+                ]})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+def install(server: StandIn, host: str, **limits):
+    # Fresh limits for the host and clients pooled to match, pointed at the stand-in
+    import newsapi.const
+    from newsapi import NewsApiClient
+    from polygon import RESTClient
+
+    settings = {"concurrency": 8, "rate": 0.0, "burst": 10, "budget": 10.0, "retries": 3, "backoff": 0.05, "backoff_max": 0.5}
+    upstream._upstreams[host] = Upstream(host, **{**settings, **limits})
+    newsapi.const.EVERYTHING_URL = f"{server.url}/v2/everything"
+    sentiment._newsapi_client = NewsApiClient("stand-in-key", session=newsapi_session())
+    sentiment._polygon_client = pool_polygon_client(RESTClient("stand-in-key", base=server.url, retries=0))
+    return upstream._upstreams[host]
+
+
+def polygon_news(ticker: str) -> list:
+    return sentiment.fetch_polygon_articles(ticker, "2025-07-08T08:00:00Z", "2025-07-08T20:00:00Z", max_articles=10)
+
+
+def newsapi_news(ticker: str) -> list:
+    return sentiment.fetch_newsapi_articles(ticker, "2025-07-07T08:00:00Z", "2025-07-07T20:00:00Z", max_articles=5)
+
+
+def keep_alive(server: StandIn, calls: int) -> dict:
+    from newsapi import NewsApiClient
+
+    result = {}
+    for label, session in (("unpooled", None), ("pooled", "pooled")):
+        install(server, "newsapi")
+        if session is None:
+            sentiment._newsapi_client = NewsApiClient("stand-in-key")
+        server.reset()
+        started = time.perf_counter()
+        for i in range(calls):
+            assert len(newsapi_news(f"K{i}")) == NEWSAPI_ARTICLES
+        result[label] = {
+            "connections": server.connections,
+            "ms_per_call": round((time.perf_counter() - started) / calls * 1000, 2),
+        }
+    assert result["pooled"]["connections"] == 1, result
+    return result
+
+
+def concurrency(server: StandIn, calls: int, limit: int) -> dict:
+    install(server, "polygon", concurrency=limit)
+    server.reset(delay=0.05)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=calls) as executor:
+        results = list(executor.map(polygon_news, [f"C{i}" for i in range(calls)]))
+    assert all(len(r) == POLYGON_ARTICLES for r in results)
+    assert server.max_in_flight <= limit, f"{server.max_in_flight} requests in flight, limit {limit}"
+    return {"calls": calls, "limit": limit, "max_in_flight": server.max_in_flight,
+            "connections": server.connections, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def rate(server: StandIn, calls: int, per_second: float, burst: int) -> dict:
+    install(server, "polygon", rate=per_second, burst=burst)
+    server.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(polygon_news, [f"R{i}" for i in range(calls)]))
+    elapsed = time.perf_counter() - started
+    achieved = (calls - burst) / elapsed
+    assert achieved <= per_second * 1.1, f"{achieved:.1f} calls/s over a {per_second} limit"
+    return {"calls": calls, "rate": per_second, "burst": burst, "seconds": round(elapsed, 3),
+            "achieved_rate_after_burst": round(achieved, 2)}
+
+
+def retry(server: StandIn, calls: int, failures: int) -> dict:
+    result = {}
+    for host, fetch, status, articles in (("polygon", polygon_news, 429, POLYGON_ARTICLES),
+                                          ("newsapi", newsapi_news, 503, NEWSAPI_ARTICLES)):
+        limits = install(server, host, retries=failures)
+        server.reset(failures=failures, fail_status=status)
+        with ThreadPoolExecutor(max_workers=calls) as executor:
+            results = list(executor.map(fetch, [f"T{i}" for i in range(calls)]))
+        assert all(len(r) == articles for r in results), f"{host}: a call failed despite retries"
+        stats = limits.stats()
+        assert stats["retries"] == calls * failures, stats
+        result[host] = {"status": status, "calls": calls, "requests": server.requests, "retries": stats["retries"]}
+    return result
+
+
+def budget(server: StandIn, seconds: float) -> dict:
+    limits = install(server, "polygon", budget=seconds, retries=100, backoff=0.1, backoff_max=0.4)
+    server.reset(failures=-1, fail_status=503)
+    started = time.perf_counter()
+    try:
+        polygon_news("B")
+        raise AssertionError("call succeeded against a failing server")
+    except AssertionError:
+        raise
+    except Exception as e:
+        error = type(e).__name__
+    elapsed = time.perf_counter() - started
+    assert elapsed <= seconds + 0.1, f"gave up after {elapsed:.2f} s, budget {seconds} s"
+    return {"budget": seconds, "gave_up_after": round(elapsed, 3), "attempts": server.requests,
+            "error": error, "retries": limits.stats()["retries"]}
+
+
+def no_retry(server: StandIn) -> dict:
+    limits = install(server, "newsapi")
+    server.reset(failures=-1, fail_status=401)
+    assert newsapi_news("AUTH") == []   # fetch_newsapi_articles logs and returns no articles
+    assert server.requests == 1, f"{server.requests} attempts for a 401"
+    return {"attempts": server.requests, "retries": limits.stats()["retries"]}
+
+
+def run() -> dict:
+    server = StandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        report = {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "keep_alive": keep_alive(server, 40),
+            "concurrency": concurrency(server, 32, 4),
+            "rate": rate(server, 45, 20.0, 5),
+            "retry": retry(server, 16, 2),
+            "budget": budget(server, 1.0),
+            "no_retry": no_retry(server),
+        }
+    finally:
+        server.shutdown()
+    for name, result in report.items():
+        if name != "generated_at":
+            print(f"{name:<12} ok  {json.dumps(result)}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run()
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
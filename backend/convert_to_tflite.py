@@ -2,61 +2,131 @@
 """
 Convert Keras model to TensorFlow Lite format for memory optimization
 Run this once to create the .tflite model file
+(needs TensorFlow: pip install -r requirements-convert.txt)
+
+Modes:
+    dynamic  weights in int8, activations in float (the default, served by pap.py)
+    float    no quantization, the reference for benchmarks/quantization_compare.py
+    int8     full-integer weights, activations and input/output, calibrated on charts
+             rendered from historical 1m bars
+
+    python convert_to_tflite.py --mode int8 --tickers AAPL MSFT --start 2025-06-09 --end 2025-07-08
 """
 
-import tensorflow as tf
+import argparse
 import os
 
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from utils.pap import PAP_MODEL_PATHS as TFLITE_MODEL_PATHS
+
 # Paths
 KERAS_MODEL_PATH = 'ml_models/MulticlassPAP_20k_v2.keras'
-TFLITE_MODEL_PATH = 'ml_models/MulticlassPAP_20k_v2.tflite'
 
-def convert_keras_to_tflite():
+# Calibration data for int8: windows of every live interval setting over these tickers
+REPRESENTATIVE_TICKERS = ['AAPL', 'MSFT', 'NVDA', 'AMZN', 'SPY', 'QQQ', 'TSLA', 'JPM']
+REPRESENTATIVE_SAMPLES = 500
+
+def representative_images(tickers, start, end, samples, stride=15, seed=0):
+    # Charts from the project's own renderer over historical bars, so calibration sees the
+    # same pixel distribution as live inference
+    from utils.backtest import history_close_images
+    from utils.market_data import load_bars
+    from utils.pap import interval_settings
+
+    images = []
+    for ticker in tickers:
+        bars = load_bars(ticker, '1m', pd.Timestamp(start, tz='UTC'), pd.Timestamp(end, tz='UTC'))
+        if bars is None:
+            print(f"No 1m bars for {ticker}, skipping")
+            continue
+        images.append(history_close_images(bars.to_frame(), interval_settings, stride=stride))
+        print(f"{ticker}: {len(images[-1])} windows")
+    images = np.concatenate(images) if images else np.empty((0,))
+    if len(images) == 0:
+        raise ValueError("No representative windows could be rendered")
+
+    # an even sample across tickers and settings
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(images), size=min(samples, len(images)), replace=False)
+    return images[np.sort(picks)]
+
+def convert_keras_to_tflite(mode='dynamic', tickers=REPRESENTATIVE_TICKERS, start=None, end=None,
+                            samples=REPRESENTATIVE_SAMPLES):
+    output_path = TFLITE_MODEL_PATHS[mode]
     print("Loading Keras model...")
     try:
         # Load the Keras model
         model = tf.keras.models.load_model(KERAS_MODEL_PATH, compile=False)
         print(f"Model loaded successfully. Input shape: {model.input_shape}")
-        
+
         # Convert to TensorFlow Lite
-        print("Converting to TensorFlow Lite...")
+        print(f"Converting to TensorFlow Lite ({mode})...")
         converter = tf.lite.TFLiteConverter.from_keras_model(model)
-        
-        # Optional: Enable optimizations to reduce model size further
-        converter.optimizations = [tf.lite.Optimize.DEFAULT]
-        
+
+        if mode in ('dynamic', 'int8'):
+            # Enable optimizations to reduce model size further
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+        if mode == 'int8':
+            images = representative_images(tickers, start, end, samples)
+            print(f"Calibrating on {len(images)} rendered windows")
+
+            def representative_dataset():
+                for image in images:
+                    yield [image[None].astype(np.float32)]
+
+            converter.representative_dataset = representative_dataset
+            # Fail instead of silently keeping float ops; pap.py quantizes the input and
+            # dequantizes the output with the tensors' scale and zero point
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            converter.inference_input_type = tf.int8
+            converter.inference_output_type = tf.int8
+
         # Convert the model
         tflite_model = converter.convert()
-        
+
         # Save the model
-        with open(TFLITE_MODEL_PATH, 'wb') as f:
+        with open(output_path, 'wb') as f:
             f.write(tflite_model)
-        
-        print(f"TensorFlow Lite model saved to: {TFLITE_MODEL_PATH}")
-        
+
+        print(f"TensorFlow Lite model saved to: {output_path}")
+
         # Show size comparison
         keras_size = os.path.getsize(KERAS_MODEL_PATH) / (1024 * 1024)  # MB
-        tflite_size = os.path.getsize(TFLITE_MODEL_PATH) / (1024 * 1024)  # MB
-        
+        tflite_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+
         print(f"Original Keras model size: {keras_size:.2f} MB")
         print(f"TensorFlow Lite model size: {tflite_size:.2f} MB")
         print(f"Size reduction: {((keras_size - tflite_size) / keras_size * 100):.1f}%")
-        
+
         return True
-        
+
     except Exception as e:
         print(f"Error during conversion: {e}")
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the Keras PAP model to TensorFlow Lite")
+    parser.add_argument("--mode", choices=list(TFLITE_MODEL_PATHS), default="dynamic")
+    parser.add_argument("--tickers", nargs="+", default=REPRESENTATIVE_TICKERS, help="int8 calibration tickers")
+    # yfinance only serves 1m bars for the last 30 days
+    parser.add_argument("--start", default=str((pd.Timestamp.utcnow() - pd.Timedelta(days=28)).date()))
+    parser.add_argument("--end", default=str(pd.Timestamp.utcnow().date()))
+    parser.add_argument("--samples", type=int, default=REPRESENTATIVE_SAMPLES, help="int8 calibration images")
+    args = parser.parse_args()
+
     if not os.path.exists(KERAS_MODEL_PATH):
         print(f"Error: Keras model not found at {KERAS_MODEL_PATH}")
         exit(1)
-    
-    success = convert_keras_to_tflite()
+
+    success = convert_keras_to_tflite(args.mode, args.tickers, args.start, args.end, args.samples)
     if success:
         print("✅ Conversion completed successfully!")
-        print("You can now update your requirements.txt and pap.py to use TensorFlow Lite")
+        if args.mode != "dynamic":
+            print("Compare it with the other modes: python -m benchmarks.quantization_compare")
     else:
         print("❌ Conversion failed!")
-        exit(1) 
\ No newline at end of file
+        exit(1)
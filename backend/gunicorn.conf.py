@@ -0,0 +1,31 @@
+# Multi-worker serving (Linux/macOS), from the backend directory:
+#     SHARED_CACHE_DB=data/shared_cache.db gunicorn -c gunicorn.conf.py main:app
+#
+# The app is imported once in the master process (preload_app) along with pandas, yfinance and
+# the PAP model file, and workers are forked from it, so that memory is shared copy-on-write.
+# Everything that holds threads, sockets or interpreter state (TFLite interpreters, the Gemini
+# and news clients, executors, SQLite connections) is created lazily inside each worker.
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Workers answer /api/ready with 503 while they load; the model file read happens before forking
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Runs in the master after main:app is imported and before the first worker is forked
+    from utils.pap import preload_pap_model
+
+    try:
+        preload_pap_model()
+    except OSError as e:
+        server.log.warning("PAP model not preloaded, workers will read it themselves: %s", e)
+    # Keep the collector from touching (and so copying) the objects every worker inherits
+    gc.freeze()
@@ -1,21 +1,75 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi import HTTPException
-from contextlib import asynccontextmanager
+from utils.startup import startup_report
 
-from dotenv import load_dotenv
-load_dotenv()
+with startup_report.phase("import_web"):
+    from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse, StreamingResponse
+    from fastapi import HTTPException
+    from pydantic import BaseModel
+    from contextlib import asynccontextmanager
+
+    from dotenv import load_dotenv
+    load_dotenv()
+import asyncio
+import logging
 import os
+import time
+
+# Pipeline progress is logged at DEBUG/INFO; the default keeps the request path quiet
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
 
-from utils.pap import get_pap_model, get_trade_signal
-from utils.sentiment import get_gemini_model
-from utils.exceptions import AppException
+# pandas and yfinance dominate this phase; the interpreter runtime loads in init_pap_model
+with startup_report.phase("import_pipeline"):
+    from utils.pap import (
+        BAR_INTERVALS,
+        BARS_MAX_LOOKBACK,
+        analysis_flights,
+        build_trade_signal,
+        check_ticker_async,
+        get_analysis_async,
+        get_bars_since,
+        get_pap_model,
+        get_trade_signal_batch_async,
+        news_result_cache,
+        pap_model_stats,
+        pap_result_cache,
+        warm_up_pap_model,
+    )
+    from utils.response_cache import analysis_etag
+    from utils.executors import run_io
+    from utils.serialization import CANDLE_FORMATS, dumps, parse_candle_timestamp, serialize_candlesticks
+    from utils.sentiment import get_gemini_model
+    from utils.sentiment_cache import get_sentiment_cache
+    from utils.streaming import STREAM_QUEUE_SIZE, get_signal_hub
+    from utils.symbols import get_symbol_index
+    from utils.upstream import upstream_stats
+    from utils.exceptions import AppException
+    from utils.metrics import http_request_seconds, register_stats, render_prometheus, stats_snapshot
+
+def initialize():
+    # Load and warm everything the first request would otherwise pay for. Runs off the event
+    # loop so the server answers /api/ready (with 503) while this is in progress.
+    try:
+        with startup_report.phase("init_symbol_index"):
+            get_symbol_index()
+        with startup_report.phase("init_pap_model"):
+            get_pap_model()
+        with startup_report.phase("warm_up_pap_model"):
+            warm_up_pap_model()
+        with startup_report.phase("init_gemini_model"):
+            get_gemini_model()
+        startup_report.mark_ready()
+    except Exception as e:
+        startup_report.mark_failed(e)
 
 @asynccontextmanager
 async def lifespan(app):
-    get_pap_model()
-    get_gemini_model()
+    init = asyncio.get_running_loop().run_in_executor(None, initialize)
     yield
+    await init
 
 app = FastAPI(lifespan=lifespan)
 
@@ -33,33 +87,254 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # label by route template (/api/analysis/{ticker}), not by the raw path
+    route = request.scope.get("route")
+    http_request_seconds.observe(
+        time.perf_counter() - start,
+        route=route.path if route is not None else "unmatched",
+        method=request.method,
+        status=response.status_code,
+    )
+    return response
+
+register_stats("pap_model_pool", pap_model_stats)
+register_stats("sentiment_cache", lambda: get_sentiment_cache().stats())
+register_stats("analysis_single_flight", analysis_flights.stats)
+register_stats("pap_result_cache", pap_result_cache.stats)
+register_stats("news_result_cache", news_result_cache.stats)
+register_stats("symbol_index", lambda: get_symbol_index().stats())
+register_stats("signal_stream", lambda: get_signal_hub().stats())
+register_stats("startup", startup_report.stats)
+register_stats("upstream", upstream_stats)
+# Under gunicorn every worker keeps its own stats; the pid tells the answers apart
+register_stats("worker", lambda: {"pid": os.getpid()})
+
 @app.get("/")
 def read_root():
     return {"message": "Hello, FastAPI!"}
 
+@app.get("/api/ready")
+def get_ready():
+    # Readiness probe: 503 until the PAP model is loaded and has served a warm-up invoke
+    report = {**startup_report.report(), "runtime": get_pap_model().runtime if startup_report.ready else None}
+    return JSONResponse(report, status_code=200 if startup_report.ready else 503)
+
+@app.get("/api/stats")
+def get_stats():
+    return stats_snapshot()
+
+@app.get("/metrics")
+def get_metrics():
+    # Prometheus text exposition: stage latency histograms, counters and the /api/stats gauges
+    return Response(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+BATCH_MAX_TICKERS = int(os.getenv("BATCH_MAX_TICKERS", "500"))
+
+class BatchAnalysisRequest(BaseModel):
+    tickers: list[str]
+    rr_ratio: float = 1.5
+    atr_sl_multiplier: float = 1.5
+    candle_format: str = "rows"
+    include_candles: bool = True
+
+def check_candle_format(candle_format: str):
+    if candle_format not in CANDLE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"candle_format must be one of {', '.join(CANDLE_FORMATS)}")
+
+def trade_signal_response(trade_signal):
+    trade_signal, sl, tp, sentiment, articles, pap_pattern, candlestick_data = trade_signal
+    return {
+        "signal": trade_signal,
+        "stop_loss": sl,
+        "take_profit": tp,
+        "sentiment_score": sentiment,
+        "articles": articles,
+        "pap_pattern": pap_pattern,
+        "candlestick_data": candlestick_data
+    }
+
+@app.post("/api/analysis/batch")
+async def analyze_watchlist(body: BatchAnalysisRequest):
+    # Newline-delimited JSON, one line per ticker in completion order. A ticker that fails
+    # gets an "error" line instead of failing the batch.
+    if not body.tickers:
+        raise HTTPException(status_code=400, detail="No tickers given")
+    if len(body.tickers) > BATCH_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_TICKERS} tickers per batch")
+    check_candle_format(body.candle_format)
+
+    async def stream():
+        async for ticker, result in get_trade_signal_batch_async(
+            body.tickers,
+            atr_sl_multiplier=body.atr_sl_multiplier,
+            rr_ratio=body.rr_ratio,
+            candle_format=body.candle_format if body.include_candles else None,
+        ):
+            if isinstance(result, AppException):
+                line = {"ticker": ticker, "error": result.message, "status_code": result.status_code}
+            else:
+                line = {"ticker": ticker, **trade_signal_response(result)}
+            yield dumps(line) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.get("/api/analysis/{ticker}")
 async def analyze_stock(
     ticker: str,
+    request: Request,
     rr_ratio: float = 1.5,
-    atr_sl_multiplier: float = 1.5
+    atr_sl_multiplier: float = 1.5,
+    candle_format: str = "rows",
+    include_candles: bool = True,
 ):
+    # candle_format=columnar returns candlestick_data as parallel arrays instead of one object per bar.
+    # include_candles=false leaves it out (null) for clients that keep their chart current
+    # through /api/bars.
+    check_candle_format(candle_format)
     try:
-        trade_signal, sl, tp, sentiment, articles, pap_pattern, candlestick_data = get_trade_signal(
-            ticker,
+        analysis = await get_analysis_async(ticker)
+
+        # Repeated polls between bar closes get a 304 without rebuilding the payload
+        etag = analysis_etag(analysis, rr_ratio, atr_sl_multiplier, candle_format, include_candles)
+        cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=cache_headers)
+
+        payload = trade_signal_response(build_trade_signal(
+            *analysis,
             rr_ratio=rr_ratio,
-            atr_sl_multiplier=atr_sl_multiplier
-        )
-        
-        return {
-            "signal": trade_signal,
-            "stop_loss": sl,
-            "take_profit": tp,
-            "sentiment_score": sentiment,
-            "articles": articles,
-            "pap_pattern": pap_pattern,
-            "candlestick_data": candlestick_data
-        }
+            atr_sl_multiplier=atr_sl_multiplier,
+            candle_format=candle_format if include_candles else None,
+        ))
+        # Encode directly rather than through FastAPI's generic jsonable_encoder
+        return Response(content=dumps(payload), media_type="application/json", headers=cache_headers)
     except AppException as e:
         raise HTTPException(status_code=e.status_code, detail=e.message)
 
     
+
+@app.get("/api/bars/{ticker}")
+async def get_bars(
+    ticker: str,
+    since: str | None = None,
+    interval: int = 1,
+    lookback: int = 30,
+    candle_format: str = "rows",
+):
+    # Chart bars without the analysis: only bars starting at or after `since` (the timestamp of
+    # the last candle the client holds, in either candle format), that bar included since it may
+    # have changed. Replace candles with the same timestamp and append the rest. Without
+    # `since`, the last `lookback` bars.
+    check_candle_format(candle_format)
+    if interval not in BAR_INTERVALS:
+        raise HTTPException(status_code=400, detail=f"interval must be one of {', '.join(map(str, BAR_INTERVALS))} (minutes)")
+    if not 1 <= lookback <= BARS_MAX_LOOKBACK:
+        raise HTTPException(status_code=400, detail=f"lookback must be between 1 and {BARS_MAX_LOOKBACK}")
+    try:
+        since_ns = parse_candle_timestamp(since) if since is not None else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be an ISO 8601 timestamp or epoch milliseconds; encode a '+' UTC offset as %2B")
+
+    try:
+        await check_ticker_async(ticker)
+        bars = await run_io("bars", get_bars_since, ticker, interval, since_ns, lookback)
+    except AppException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    payload = {
+        "ticker": ticker.upper(),
+        "interval": interval,
+        "candlestick_data": serialize_candlesticks(bars, candle_format),
+    }
+    return Response(content=dumps(payload), media_type="application/json")
+
+STREAM_MAX_TICKERS = int(os.getenv("STREAM_MAX_TICKERS", "50"))
+SSE_KEEPALIVE_SECONDS = 15
+
+async def subscribe_tickers(tickers, queue, subscriptions, params):
+    # Validate and subscribe each ticker; failures are reported on the stream instead of closing it
+    hub = get_signal_hub()
+    for ticker in dict.fromkeys(t.strip().upper() for t in tickers if t.strip()):
+        if ticker in subscriptions:
+            continue
+        if len(subscriptions) >= STREAM_MAX_TICKERS:
+            queue.put_nowait({"type": "error", "ticker": ticker, "error": f"At most {STREAM_MAX_TICKERS} tickers per stream", "status_code": 400})
+            continue
+        try:
+            await check_ticker_async(ticker)
+        except AppException as e:
+            queue.put_nowait({"type": "error", "ticker": ticker, "error": e.message, "status_code": e.status_code})
+            continue
+        subscriptions[ticker] = await hub.subscribe(ticker, queue, **params)
+
+def unsubscribe_tickers(tickers, subscriptions):
+    hub = get_signal_hub()
+    for ticker in tickers:
+        subscriber = subscriptions.pop(ticker.strip().upper(), None)
+        if subscriber is not None:
+            hub.unsubscribe(subscriber)
+
+@app.websocket("/api/stream")
+async def stream_signals(
+    websocket: WebSocket,
+    rr_ratio: float = 1.5,
+    atr_sl_multiplier: float = 1.5,
+    candle_format: str = "rows",
+):
+    # Send {"subscribe": [...]} / {"unsubscribe": [...]}. Each subscribed ticker gets a snapshot,
+    # then an update with only the changed fields and new candles whenever a bar closes.
+    if candle_format not in CANDLE_FORMATS:
+        await websocket.close(code=1008, reason=f"candle_format must be one of {', '.join(CANDLE_FORMATS)}")
+        return
+    await websocket.accept()
+    params = {"rr_ratio": rr_ratio, "atr_sl_multiplier": atr_sl_multiplier, "candle_format": candle_format}
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    subscriptions = {}
+
+    async def send_messages():
+        while True:
+            await websocket.send_bytes(dumps(await queue.get()))
+
+    sender = asyncio.ensure_future(send_messages())
+    try:
+        while True:
+            command = await websocket.receive_json()
+            await subscribe_tickers(command.get("subscribe", []), queue, subscriptions, params)
+            unsubscribe_tickers(command.get("unsubscribe", []), subscriptions)
+    except (WebSocketDisconnect, ValueError, AttributeError):
+        pass
+    finally:
+        sender.cancel()
+        unsubscribe_tickers(list(subscriptions), subscriptions)
+
+@app.get("/api/stream/sse")
+async def stream_signals_sse(
+    tickers: str,
+    request: Request,
+    rr_ratio: float = 1.5,
+    atr_sl_multiplier: float = 1.5,
+    candle_format: str = "rows",
+):
+    # Server-Sent Events version of /api/stream for a fixed, comma-separated list of tickers
+    check_candle_format(candle_format)
+    params = {"rr_ratio": rr_ratio, "atr_sl_multiplier": atr_sl_multiplier, "candle_format": candle_format}
+
+    async def events():
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        subscriptions = {}
+        try:
+            await subscribe_tickers(tickers.split(","), queue, subscriptions, params)
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"event: " + message["type"].encode() + b"\ndata: " + dumps(message) + b"\n\n"
+        finally:
+            unsubscribe_tickers(list(subscriptions), subscriptions)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
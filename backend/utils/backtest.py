@@ -0,0 +1,245 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.market_data import OHLCV_COLUMNS, load_bars, resample_bars
+from utils.pap import (
+    ATR_PERIOD,
+    BEARISH_INDICES_SET,
+    BULLISH_INDICES_SET,
+    PAP_CONFIDENCE_THRESHOLD,
+    PAP_STRINGS,
+    calculate_max_drawdown,
+    predict_pap_batch,
+)
+from utils.indicators import wilder_atr
+from utils.prefilter import PAP_PREFILTER_THRESHOLD, prefilter_mask
+from utils.rasterizer import IMAGE_SIZE, render_close_images
+
+BACKTEST_BATCH_SIZE = int(os.getenv("BACKTEST_BATCH_SIZE", "256"))
+# Trades still open after this many bars are closed at that bar's close
+BACKTEST_MAX_HOLDING_BARS = int(os.getenv("BACKTEST_MAX_HOLDING_BARS", "390"))
+# Trades are resolved in chunks so the (trades x holding bars) matrices stay small
+TRADE_CHUNK_SIZE = 4096
+
+NOISE_INDEX = PAP_STRINGS.index('Noise')
+EXIT_REASONS = np.array(["take_profit", "stop_loss", "timeout"])
+
+
+def classify_pap_predictions(preds: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # classify_pap_prediction for a whole batch: (signal, pattern index) arrays
+    pred_index = np.argmax(preds, axis=1)
+    confident = np.max(preds, axis=1) >= PAP_CONFIDENCE_THRESHOLD
+    bullish = confident & np.isin(pred_index, list(BULLISH_INDICES_SET))
+    bearish = confident & np.isin(pred_index, list(BEARISH_INDICES_SET))
+    signals = bullish.astype(np.int8) - bearish.astype(np.int8)
+    patterns = np.where(signals != 0, pred_index, NOISE_INDEX)
+    return signals, patterns
+
+
+def score_close_windows(windows: np.ndarray, predict=predict_pap_batch, batch_size: int = BACKTEST_BATCH_SIZE,
+                        prefilter_threshold: float = PAP_PREFILTER_THRESHOLD):
+    # Render and score every row of a (N, lookback) window view in batches. Rows that can't be
+    # rendered, or that the pre-filter rules out, score as Noise.
+    signals = np.zeros(len(windows), dtype=np.int8)
+    patterns = np.full(len(windows), NOISE_INDEX)
+    candidates = np.flatnonzero(prefilter_mask(windows, prefilter_threshold))
+    for chunk_start in range(0, len(candidates), batch_size):
+        chunk = candidates[chunk_start:chunk_start + batch_size]
+        images, valid = render_close_images(windows[chunk])
+        if not valid.any():
+            continue
+        rows = chunk[valid]
+        signals[rows], patterns[rows] = classify_pap_predictions(predict(images if valid.all() else images[valid]))
+    return signals, patterns
+
+
+def resolve_trades(bars: dict, ends: np.ndarray, directions: np.ndarray, sl: np.ndarray, tp: np.ndarray,
+                   max_holding_bars: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # For trades entered at the close of bar `ends`, find the first later bar that reaches the
+    # stop or the target. A bar that touches both counts as a stop; a stop gapped through at
+    # the open fills at the open. Returns (exit bar, exit price, exit reason index).
+    n = len(bars["Close"])
+    pad = np.full(max_holding_bars, np.nan)
+    forward = {col: sliding_window_view(np.concatenate([bars[col][1:], pad]), max_holding_bars)
+               for col in ("Open", "High", "Low")}
+
+    exit_bars = np.empty(len(ends), dtype=np.int64)
+    exit_prices = np.empty(len(ends))
+    reasons = np.empty(len(ends), dtype=np.int64)
+    for chunk_start in range(0, len(ends), TRADE_CHUNK_SIZE):
+        chunk = slice(chunk_start, chunk_start + TRADE_CHUNK_SIZE)
+        e, d = ends[chunk], directions[chunk][:, None]
+        stop, target = sl[chunk][:, None], tp[chunk][:, None]
+        highs, lows, opens = forward["High"][e], forward["Low"][e], forward["Open"][e]
+
+        adverse = np.where(d > 0, lows, highs)
+        favorable = np.where(d > 0, highs, lows)
+        stop_hit = d * (adverse - stop) <= 0
+        target_hit = d * (favorable - target) >= 0
+        first_stop = np.where(stop_hit.any(axis=1), stop_hit.argmax(axis=1), max_holding_bars)
+        first_target = np.where(target_hit.any(axis=1), target_hit.argmax(axis=1), max_holding_bars)
+
+        stopped = (first_stop <= first_target) & (first_stop < max_holding_bars)
+        targeted = (first_target < first_stop)
+        last_bar = np.minimum(e + max_holding_bars, n - 1)
+        offset = np.where(stopped, first_stop, first_target)
+        rows = np.arange(len(e))
+        gap_open = opens[rows, np.minimum(offset, max_holding_bars - 1)]
+        stop_fill = np.where(d[:, 0] * (gap_open - stop[:, 0]) < 0, gap_open, stop[:, 0])
+
+        exit_bars[chunk] = np.where(stopped | targeted, e + 1 + offset, last_bar)
+        exit_prices[chunk] = np.where(stopped, stop_fill, np.where(targeted, target[:, 0], bars["Close"][last_bar]))
+        reasons[chunk] = np.where(targeted, 0, np.where(stopped, 1, 2))
+    return exit_bars, exit_prices, reasons
+
+
+def run_backtest(
+    df: pd.DataFrame,
+    interval_minutes: int = 1,
+    lookback_bars: int = 30,
+    atr_sl_multiplier: float = 1.5,
+    rr_ratio: float = 1.5,
+    stride: int = 1,
+    max_holding_bars: int = BACKTEST_MAX_HOLDING_BARS,
+    allow_overlap: bool = False,
+    predict=predict_pap_batch,
+) -> dict:
+    # Replay the PAP + ATR strategy over a history of 1m bars. Every `stride`-th window of
+    # `lookback_bars` closed bars is scored exactly like a live window; a bullish/bearish
+    # pattern enters at that bar's close with the same SL/TP rules as build_trade_signal.
+    # There is no news history, so windows without a pattern don't trade (live, sentiment
+    # would decide). Without allow_overlap, signals while a trade is open are skipped.
+    started = time.perf_counter()
+    bars = resample_bars(df[OHLCV_COLUMNS], interval_minutes)
+    arrays = {col: bars[col].to_numpy(dtype=np.float64) for col in ("Open", "High", "Low", "Close")}
+
+    # A window ends at bar e and, like build_pap_windows, has `extra` bars before it to warm up
+    # its ATR
+    extra = ATR_PERIOD + 10
+    first_end = lookback_bars + extra - 1
+    last_end = len(bars) - 2   # needs at least one bar to trade on
+    if last_end < first_end:
+        raise ValueError(f"Need more than {first_end + 1} {interval_minutes}m bars to backtest")
+
+    window_start = first_end - lookback_bars + 1
+    closes = sliding_window_view(arrays["Close"], lookback_bars)[window_start:last_end - lookback_bars + 2:stride]
+    ends = np.arange(first_end, last_end + 1)[::stride]
+    signals, patterns = score_close_windows(closes, predict)
+
+    # SL/TP exactly as build_trade_signal: beyond the window's low/high by a multiple of the
+    # window's own ATR, computed afresh over its warm-up bars rather than over the whole history
+    entries = np.flatnonzero(signals != 0)
+    e, d = ends[entries], signals[entries].astype(np.int64)
+    atr = np.array([
+        wilder_atr(*(arrays[col][end - lookback_bars - extra + 1:end + 1] for col in ("High", "Low", "Close")), ATR_PERIOD)[-1]
+        for end in e.tolist()
+    ])
+    support = sliding_window_view(arrays["Low"], lookback_bars).min(axis=1)[e - lookback_bars + 1]
+    resistance = sliding_window_view(arrays["High"], lookback_bars).max(axis=1)[e - lookback_bars + 1]
+    price = arrays["Close"][e]
+    sl = np.where(d > 0, support - atr_sl_multiplier * atr, resistance + atr_sl_multiplier * atr)
+    risk = d * (price - sl)
+    tp = price + d * rr_ratio * risk
+    exit_bars, exit_prices, reasons = resolve_trades(arrays, e, d, sl, tp, max_holding_bars)
+
+    taken = np.ones(len(e), dtype=bool)
+    if not allow_overlap:
+        busy_until = -1
+        for i in range(len(e)):
+            if e[i] <= busy_until:
+                taken[i] = False
+            else:
+                busy_until = exit_bars[i]
+
+    pnl = d * (exit_prices - price)
+    trades = pd.DataFrame({
+        "entry_time": bars.index[e],
+        "exit_time": bars.index[exit_bars],
+        "direction": np.where(d > 0, "long", "short"),
+        "pattern": np.array(PAP_STRINGS)[patterns[entries]],
+        "entry": price,
+        "stop_loss": sl,
+        "take_profit": tp,
+        "exit": exit_prices,
+        "exit_reason": EXIT_REASONS[reasons],
+        "pnl": pnl,
+        "r_multiple": pnl / risk,
+        "return": pnl / price,
+    })[taken].reset_index(drop=True)
+
+    equity = pd.Series((1 + trades["return"]).cumprod().to_numpy(), index=trades["exit_time"], name="equity")
+    wins = int((trades["pnl"] > 0).sum())
+    return {
+        "interval_minutes": interval_minutes,
+        "lookback_bars": lookback_bars,
+        "bars": len(bars),
+        "windows": len(ends),
+        "signals": int(np.count_nonzero(signals)),
+        "trades": len(trades),
+        "hit_rate": wins / len(trades) if len(trades) else np.nan,
+        "exit_reasons": trades["exit_reason"].value_counts().to_dict(),
+        "total_pnl": float(trades["pnl"].sum()),
+        "total_return": float(equity.iloc[-1] - 1) if len(equity) else 0.0,
+        "avg_r_multiple": float(trades["r_multiple"].mean()) if len(trades) else np.nan,
+        "max_drawdown": float(calculate_max_drawdown(equity)),
+        "equity": equity,
+        "trade_log": trades,
+        "elapsed_seconds": time.perf_counter() - started,
+    }
+
+
+def history_close_images(df: pd.DataFrame, settings, stride: int = 1) -> np.ndarray:
+    # Chart images for every `stride`-th window of each (interval, lookback) setting over a
+    # history of 1m bars, rendered exactly like live windows. Used as calibration and
+    # evaluation data for the quantized PAP models.
+    images = []
+    for interval_minutes, lookback_bars in dict.fromkeys(settings):
+        closes = resample_bars(df[OHLCV_COLUMNS], interval_minutes)["Close"].to_numpy(dtype=np.float64)
+        if len(closes) < lookback_bars:
+            continue
+        windows = sliding_window_view(closes, lookback_bars)[::stride]
+        for chunk_start in range(0, len(windows), BACKTEST_BATCH_SIZE):
+            rendered, valid = render_close_images(windows[chunk_start:chunk_start + BACKTEST_BATCH_SIZE])
+            images.append(rendered[valid])
+    if not images:
+        return np.empty((0, IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.float32)
+    return np.concatenate(images)
+
+
+def backtest_ticker(ticker: str, start_dt, end_dt, **kwargs) -> dict:
+    # run_backtest over stored/downloaded 1m bars for [start_dt, end_dt)
+    bars = load_bars(ticker, "1m", pd.Timestamp(start_dt, tz='UTC'), pd.Timestamp(end_dt, tz='UTC'))
+    if bars is None:
+        raise ValueError(f"No 1m price data available for {ticker}")
+    return run_backtest(bars.to_frame(), **kwargs)
+
+
+if __name__ == "__main__":
+    # Run from the backend directory: python -m utils.backtest AAPL 2025-06-09 2025-07-08 --interval 2
+    parser = argparse.ArgumentParser(description="Backtest the PAP + ATR strategy on historical 1m bars")
+    parser.add_argument("ticker")
+    parser.add_argument("start")
+    parser.add_argument("end")
+    parser.add_argument("--interval", type=int, default=1, help="bar size in minutes")
+    parser.add_argument("--lookback", type=int, default=30, help="bars per window")
+    parser.add_argument("--atr-sl-multiplier", type=float, default=1.5)
+    parser.add_argument("--rr-ratio", type=float, default=1.5)
+    parser.add_argument("--stride", type=int, default=1, help="score every Nth window")
+    args = parser.parse_args()
+
+    result = backtest_ticker(
+        args.ticker, args.start, args.end,
+        interval_minutes=args.interval,
+        lookback_bars=args.lookback,
+        atr_sl_multiplier=args.atr_sl_multiplier,
+        rr_ratio=args.rr_ratio,
+        stride=args.stride,
+    )
+    for key, value in result.items():
+        if key not in ("equity", "trade_log"):
+            print(f"{key:<18} {value}")
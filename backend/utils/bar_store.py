@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:     # Windows: single-process serving only, thread locks are enough
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from utils.bars import PRICE_FIELDS, Bars
+
+# On-disk layout, one raw little-endian array per column and UTC day:
+#   <root>/<TICKER>/<interval>/<YYYY-MM-DD>/{timestamp,Open,High,Low,Close,Volume}.bin
+#   <root>/<TICKER>/<interval>/coverage.json
+# Timestamps are int64 nanoseconds since the epoch (bar start, UTC), prices and volume float64.
+# Partitions are appended to, except that extending a series backwards rewrites its first
+# partition with the older rows in front; coverage.json records the contiguous time range that
+# has been fetched, so an empty stretch (market closed) is not mistaken for missing data.
+# Worker processes sharing the directory serialize writes to a series through an flock on
+#   <root>/<TICKER>/<interval>/.lock
+# Readers only trust rows present in every column file, which is enough alongside appends; a
+# read that may overlap a prepend has to hold the lock too (market_data reads under it).
+BAR_STORE_DIR = os.getenv("BAR_STORE_DIR", "bar_store")
+
+TIMESTAMP_COLUMN = 'timestamp'
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+COLUMN_DTYPES = {TIMESTAMP_COLUMN: np.dtype('<i8'), **{col: np.dtype('<f8') for col in PRICE_COLUMNS}}
+
+NS_PER_DAY = 86_400 * 10**9
+
+
+def to_ns(dt) -> int:
+    # Epoch nanoseconds for a datetime or string; naive values are taken as UTC
+    ts = pd.Timestamp(dt)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return ts.value
+
+
+class BarStore:
+    def __init__(self, root: str = BAR_STORE_DIR):
+        self.root = root
+        self._root_dir = os.path.abspath(root)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _thread_lock(self, ticker: str, interval: str) -> threading.Lock:
+        key = (ticker, interval)
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    @contextmanager
+    def lock(self, ticker: str, interval: str):
+        # Serializes the fetch-and-append cycle for one series, between threads and between
+        # processes sharing the store
+        with self._thread_lock(ticker, interval):
+            if fcntl is None:
+                yield
+                return
+            series_dir = self._series_dir(ticker, interval)
+            os.makedirs(series_dir, exist_ok=True)
+            with open(os.path.join(series_dir, '.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _series_dir(self, ticker: str, interval: str) -> str:
+        series_dir = os.path.abspath(os.path.join(self.root, ticker.upper(), interval))
+        # a ticker or interval like '..' or an absolute path must not reach outside the store
+        if os.path.dirname(os.path.dirname(series_dir)) != self._root_dir:
+            raise ValueError(f"Invalid bar series {ticker!r} / {interval!r}")
+        return series_dir
+
+    def _partition_dir(self, ticker: str, interval: str, day: int) -> str:
+        name = pd.Timestamp(day * NS_PER_DAY, tz='UTC').strftime('%Y-%m-%d')
+        return os.path.join(self._series_dir(ticker, interval), name)
+
+    def coverage(self, ticker: str, interval: str) -> tuple[int, int] | None:
+        # (from_ns, to_ns) of the range already fetched, or None for an unknown series
+        path = os.path.join(self._series_dir(ticker, interval), 'coverage.json')
+        try:
+            with open(path) as f:
+                meta = json.load(f)
+            return meta['from'], meta['to']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set_coverage(self, ticker: str, interval: str, from_ns: int, to_ns: int):
+        series_dir = self._series_dir(ticker, interval)
+        os.makedirs(series_dir, exist_ok=True)
+        tmp_path = os.path.join(series_dir, f'coverage.json.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'from': int(from_ns), 'to': int(to_ns)}, f)
+        os.replace(tmp_path, os.path.join(series_dir, 'coverage.json'))
+
+    def clear(self, ticker: str, interval: str):
+        series_dir = self._series_dir(ticker, interval)
+        if not os.path.isdir(series_dir):
+            return
+        for day_dir in os.listdir(series_dir):
+            day_path = os.path.join(series_dir, day_dir)
+            if os.path.isdir(day_path):
+                for name in os.listdir(day_path):
+                    os.remove(os.path.join(day_path, name))
+                os.rmdir(day_path)
+        coverage_path = os.path.join(series_dir, 'coverage.json')
+        if os.path.exists(coverage_path):
+            os.remove(coverage_path)
+
+    def _read_partition(self, partition_dir: str) -> dict[str, np.ndarray] | None:
+        sizes = {}
+        for col, dtype in COLUMN_DTYPES.items():
+            path = os.path.join(partition_dir, f"{col}.bin")
+            if not os.path.exists(path):
+                return None
+            sizes[col] = os.path.getsize(path) // dtype.itemsize
+        # a reader can race an append; only trust rows present in every column
+        rows = min(sizes.values())
+        if rows == 0:
+            return None
+        return {
+            col: np.memmap(os.path.join(partition_dir, f"{col}.bin"), dtype=dtype, mode='r', shape=(rows,))
+            for col, dtype in COLUMN_DTYPES.items()
+        }
+
+    def _edge_timestamp(self, ticker: str, interval: str, last: bool) -> int | None:
+        series_dir = self._series_dir(ticker, interval)
+        if not os.path.isdir(series_dir):
+            return None
+        days = sorted((d for d in os.listdir(series_dir) if os.path.isdir(os.path.join(series_dir, d))), reverse=last)
+        for day_dir in days:
+            columns = self._read_partition(os.path.join(series_dir, day_dir))
+            if columns is not None:
+                return int(columns[TIMESTAMP_COLUMN][-1 if last else 0])
+        return None
+
+    def first_timestamp(self, ticker: str, interval: str) -> int | None:
+        return self._edge_timestamp(ticker, interval, last=False)
+
+    def last_timestamp(self, ticker: str, interval: str) -> int | None:
+        return self._edge_timestamp(ticker, interval, last=True)
+
+    def append(self, ticker: str, interval: str, bars: Bars) -> int:
+        # Append Bars strictly newer than the last stored one; returns the number of rows written
+        if bars is None or bars.empty:
+            return 0
+        last = self.last_timestamp(ticker, interval)
+        newer = bars.time > last if last is not None else np.ones(len(bars), dtype=bool)
+        if not newer.any():
+            return 0
+
+        columns = {TIMESTAMP_COLUMN: bars.time[newer]}
+        for col, field in zip(PRICE_COLUMNS, PRICE_FIELDS):
+            columns[col] = getattr(bars, field)[newer]
+
+        days = columns[TIMESTAMP_COLUMN] // NS_PER_DAY
+        for day in np.unique(days):
+            in_day = days == day
+            partition_dir = self._partition_dir(ticker, interval, int(day))
+            os.makedirs(partition_dir, exist_ok=True)
+            for col, dtype in COLUMN_DTYPES.items():
+                with open(os.path.join(partition_dir, f"{col}.bin"), 'ab') as f:
+                    f.write(np.ascontiguousarray(columns[col][in_day], dtype=dtype).tobytes())
+        return int(newer.sum())
+
+    def prepend(self, ticker: str, interval: str, bars: Bars) -> int:
+        # Write Bars strictly older than the first stored one; returns the number of rows written.
+        # A partition that already has rows is rewritten through temp files, so memory maps
+        # handed out by read() keep the old contents.
+        if bars is None or bars.empty:
+            return 0
+        first = self.first_timestamp(ticker, interval)
+        if first is None:
+            return self.append(ticker, interval, bars)
+        older = bars.time < first
+        if not older.any():
+            return 0
+
+        columns = {TIMESTAMP_COLUMN: bars.time[older]}
+        for col, field in zip(PRICE_COLUMNS, PRICE_FIELDS):
+            columns[col] = getattr(bars, field)[older]
+
+        days = columns[TIMESTAMP_COLUMN] // NS_PER_DAY
+        for day in np.unique(days):
+            in_day = days == day
+            partition_dir = self._partition_dir(ticker, interval, int(day))
+            os.makedirs(partition_dir, exist_ok=True)
+            existing = self._read_partition(partition_dir)
+            for col, dtype in COLUMN_DTYPES.items():
+                data = np.ascontiguousarray(columns[col][in_day], dtype=dtype)
+                if existing is not None:
+                    data = np.concatenate([data, existing[col]])
+                path = os.path.join(partition_dir, f"{col}.bin")
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data.tobytes())
+                os.replace(tmp_path, path)
+        return int(older.sum())
+
+    def read(self, ticker: str, interval: str, start_ns: int, end_ns: int) -> dict[str, np.ndarray]:
+        # Columns for bars with start_ns <= timestamp < end_ns. Within a single day these are
+        # slices of the memory-mapped files; ranges spanning days are concatenated.
+        pieces = []
+        for day in range(start_ns // NS_PER_DAY, (end_ns - 1) // NS_PER_DAY + 1):
+            columns = self._read_partition(self._partition_dir(ticker, interval, day))
+            if columns is None:
+                continue
+            ts = columns[TIMESTAMP_COLUMN]
+            lo, hi = np.searchsorted(ts, start_ns, 'left'), np.searchsorted(ts, end_ns, 'left')
+            if hi > lo:
+                pieces.append({col: arr[lo:hi] for col, arr in columns.items()})
+
+        if not pieces:
+            return {col: np.empty(0, dtype=dtype) for col, dtype in COLUMN_DTYPES.items()}
+        if len(pieces) == 1:
+            return pieces[0]
+        return {col: np.concatenate([p[col] for p in pieces]) for col in COLUMN_DTYPES}
+
+    def read_frame(self, ticker: str, interval: str, start_ns: int, end_ns: int) -> pd.DataFrame:
+        columns = self.read(ticker, interval, start_ns, end_ns)
+        index = pd.DatetimeIndex(pd.to_datetime(columns[TIMESTAMP_COLUMN], utc=True))
+        return pd.DataFrame({col: columns[col] for col in PRICE_COLUMNS}, index=index)
+
+
+_bar_store = None
+def get_bar_store() -> BarStore | None:
+    # None when BAR_STORE_DIR is set to an empty string
+    global _bar_store
+    if _bar_store is None and BAR_STORE_DIR:
+        _bar_store = BarStore(BAR_STORE_DIR)
+    return _bar_store
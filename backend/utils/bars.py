@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+# DataFrame column for each field, as yfinance and the bar store name them
+FRAME_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+
+class Bars:
+    # Compact OHLCV bars for the signal path: one contiguous float64 array per field and int64
+    # bar start times in epoch nanoseconds (UTC). Row selections return views where NumPy can,
+    # so windows, resampled series and ATR warm-up trims don't copy the underlying columns.
+    # DataFrames are only built at the edges (yfinance in, backtest and scripts out).
+    __slots__ = ("time", "open", "high", "low", "close", "volume", "atr")
+
+    def __init__(self, time, open, high, low, close, volume, atr=None):
+        self.time = time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.atr = atr
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.time) == 0
+
+    def __getitem__(self, rows) -> "Bars":
+        # rows is a slice (views) or an index / boolean array (copies)
+        return Bars(self.time[rows], self.open[rows], self.high[rows], self.low[rows], self.close[rows],
+                    self.volume[rows], None if self.atr is None else self.atr[rows])
+
+    def between(self, start_ns: int | None = None, end_ns: int | None = None) -> "Bars":
+        # Bars with start_ns <= time < end_ns, as views
+        lo = 0 if start_ns is None else int(np.searchsorted(self.time, start_ns, "left"))
+        hi = len(self.time) if end_ns is None else int(np.searchsorted(self.time, end_ns, "left"))
+        return self[lo:hi]
+
+    def tail(self, n: int) -> "Bars":
+        return self[max(len(self.time) - n, 0):]
+
+    def last_time(self) -> pd.Timestamp:
+        return pd.Timestamp(int(self.time[-1]), tz="UTC")
+
+    def resample(self, interval_minutes: int) -> "Bars":
+        # Same bars as market_data.resample_bars: left-closed bins aligned to the epoch, labelled
+        # by their start, bins without any bar left out
+        if interval_minutes == 1 or self.empty:
+            return self
+        step = interval_minutes * 60 * 10**9
+        bins = self.time // step
+        starts = np.flatnonzero(np.concatenate(([True], bins[1:] != bins[:-1])))
+        ends = np.append(starts[1:], len(bins)) - 1
+        return Bars(
+            bins[starts] * step,
+            self.open[starts],
+            np.maximum.reduceat(self.high, starts),
+            np.minimum.reduceat(self.low, starts),
+            self.close[ends],
+            np.add.reduceat(self.volume, starts),
+        )
+
+    @classmethod
+    def concat(cls, parts: list["Bars"]) -> "Bars":
+        parts = [p for p in parts if p is not None and not p.empty]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return cls.from_columns({})
+        return cls(*(np.concatenate([getattr(p, field) for p in parts]) for field in ("time",) + PRICE_FIELDS))
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> "Bars":
+        # From BarStore.read() output (timestamp, Open, ..., Volume arrays)
+        empty = np.empty(0, dtype=np.float64)
+        return cls(
+            np.asarray(columns.get("timestamp", np.empty(0, dtype=np.int64)), dtype=np.int64),
+            *(np.asarray(columns.get(FRAME_COLUMNS[field], empty), dtype=np.float64) for field in PRICE_FIELDS),
+        )
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "Bars":
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is not None:
+            index = index.tz_convert("UTC")
+        atr = next((col for col in df.columns if str(col).startswith("ATR_")), None)
+        return cls(
+            np.ascontiguousarray(index.asi8),
+            *(np.ascontiguousarray(df[FRAME_COLUMNS[field]].to_numpy(dtype=np.float64)) for field in PRICE_FIELDS),
+            atr=None if atr is None else np.ascontiguousarray(df[atr].to_numpy(dtype=np.float64)),
+        )
+
+    def to_frame(self, atr_period: int = 14) -> pd.DataFrame:
+        columns = {FRAME_COLUMNS[field]: getattr(self, field) for field in PRICE_FIELDS}
+        if self.atr is not None:
+            columns[f"ATR_{atr_period}"] = self.atr
+        return pd.DataFrame(columns, index=pd.DatetimeIndex(pd.to_datetime(self.time, utc=True), name="Datetime"))
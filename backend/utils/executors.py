@@ -0,0 +1,48 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from utils.exceptions import AppException
+
+# Blocking network calls (yfinance, Polygon, NewsAPI, Gemini) and CPU-bound work (chart
+# rendering, TFLite inference) each get their own bounded pool, so a burst of slow upstream
+# calls can't starve inference and neither ever runs on the event loop thread.
+# Rendering and inference run in threads rather than processes: TFLite and NumPy release the
+# GIL for the heavy parts, and the interpreter pool already lives in this process.
+IO_WORKERS = int(os.getenv("IO_WORKERS", "32"))
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 2)))
+
+# Seconds each stage may take before the request fails
+STAGE_TIMEOUTS = {
+    "ticker_check": float(os.getenv("TICKER_CHECK_TIMEOUT", "10")),
+    "bars": float(os.getenv("BARS_TIMEOUT", "20")),
+    "pap": float(os.getenv("PAP_TIMEOUT", "20")),
+    "news": float(os.getenv("NEWS_TIMEOUT", "45")),
+}
+
+_io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+_cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+
+
+async def _run(executor, status_code: int, stage: str, fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # carry the caller's context (metric tags) into the worker thread, like asyncio.to_thread
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(executor, partial(context.run, fn, *args, **kwargs))
+    try:
+        return await asyncio.wait_for(future, timeout=STAGE_TIMEOUTS.get(stage))
+    except asyncio.TimeoutError:
+        # the worker thread can't be interrupted; it finishes in the background and its result is dropped
+        raise AppException(f"Timed out during {stage}, please try again", status_code)
+
+
+async def run_io(stage: str, fn, *args, **kwargs):
+    # Upstream timeouts surface as 504 Gateway Timeout
+    return await _run(_io_executor, 504, stage, fn, *args, **kwargs)
+
+
+async def run_cpu(stage: str, fn, *args, **kwargs):
+    # A saturated CPU pool surfaces as 503 Service Unavailable
+    return await _run(_cpu_executor, 503, stage, fn, *args, **kwargs)
@@ -2,10 +2,13 @@
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+import logging
 import os
 import numpy as np  
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
 def make_line_plot_image(df_segment: pd.DataFrame, out_path="temp_plot.png") -> bool:
     if df_segment is None or df_segment.empty or 'Close' not in df_segment.columns or df_segment['Close'].isnull().all():
         return False
@@ -28,7 +31,7 @@ def generate_image(df, window, temp_dir):
         else:
             image_path = None
     except Exception as e:
-        print(f"Error in image generation: {e}")
+        logger.error("Error in image generation: %s", e)
         image_path = None
     if not image_path and temp_file_path and os.path.exists(temp_file_path):
          try:
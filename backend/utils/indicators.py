@@ -0,0 +1,120 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from utils.bars import Bars
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    # max(high - low, |high - prev close|, |low - prev close|); the first bar has no previous
+    # close, so it is NaN like the pandas max(axis=1, skipna=False) it replaces
+    if len(close) == 0:
+        return np.empty(0, dtype=np.float64)
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+    return np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def wilder_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    # calculate_atr without pandas, for short windows: the same recursion as IndicatorState
+    # (and pandas' ewm(alpha=1/period, adjust=False)), NaN until `period` true ranges are in
+    tr = true_range(high, low, close).tolist()
+    alpha = 1 / period
+    old_wt = 1 - alpha
+    atr = [np.nan] * len(tr)
+    value = None
+    for i in range(1, len(tr)):
+        if value is None:
+            value = tr[i]
+        elif value != tr[i]:
+            value = (old_wt * value + alpha * tr[i]) / (old_wt + alpha)
+        if i >= period:
+            atr[i] = value
+    return np.array(atr, dtype=np.float64)
+
+
+class IndicatorState:
+    # ATR (Wilder smoothing), rolling low/high over the last `window` bars and the previous
+    # close for one bar series, updated in O(1) per bar. After the same bars have been fed in,
+    # atr equals calculate_atr(...).iloc[-1] exactly: the update mirrors the recursion pandas
+    # runs for ewm(alpha=1/period, adjust=False).
+    def __init__(self, atr_period: int = 14, window: int = 30):
+        self.atr_period = atr_period
+        self.window = window
+        self._alpha = 1 / atr_period
+        self._atr = None
+        self._tr_count = 0
+        self.prev_close = None
+        self.last_timestamp = None
+        self.bars = 0
+        self._lows = deque()    # (bar number, low), increasing lows
+        self._highs = deque()   # (bar number, high), decreasing highs
+
+    @property
+    def atr(self) -> float | None:
+        # None until the warm-up period is covered, where calculate_atr is NaN
+        return self._atr if self._tr_count >= self.atr_period else None
+
+    @property
+    def low(self) -> float | None:
+        return self._lows[0][1] if self._lows else None
+
+    @property
+    def high(self) -> float | None:
+        return self._highs[0][1] if self._highs else None
+
+    def update(self, high: float, low: float, close: float, timestamp=None):
+        # Bars with missing prices are skipped rather than folded into the state
+        if not (np.isfinite(high) and np.isfinite(low) and np.isfinite(close)):
+            return
+        if self.prev_close is not None:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+            if self._atr is None:
+                self._atr = tr
+            elif self._atr != tr:
+                old_wt = 1 - self._alpha
+                self._atr = (old_wt * self._atr + self._alpha * tr) / (old_wt + self._alpha)
+            self._tr_count += 1
+        self.prev_close = close
+
+        n = self.bars
+        self.bars += 1
+        expired = n - self.window
+        while self._lows and self._lows[-1][1] >= low:
+            self._lows.pop()
+        self._lows.append((n, low))
+        if self._lows[0][0] <= expired:
+            self._lows.popleft()
+        while self._highs and self._highs[-1][1] <= high:
+            self._highs.pop()
+        self._highs.append((n, high))
+        if self._highs[0][0] <= expired:
+            self._highs.popleft()
+
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+
+    def update_bars(self, bars: Bars) -> int:
+        # Feed the bars newer than the last one seen (last_timestamp is in epoch nanoseconds);
+        # returns how many were used
+        if self.last_timestamp is not None:
+            bars = bars.between(self.last_timestamp + 1)
+        for timestamp, high, low, close in zip(bars.time.tolist(), bars.high.tolist(),
+                                               bars.low.tolist(), bars.close.tolist()):
+            self.update(high, low, close, timestamp)
+        return len(bars)
+
+    def update_frame(self, df: pd.DataFrame) -> int:
+        return self.update_bars(Bars.from_frame(df))
+
+    @classmethod
+    def from_bars(cls, bars: Bars | pd.DataFrame, atr_period: int = 14, window: int = 30) -> "IndicatorState":
+        state = cls(atr_period, window)
+        if isinstance(bars, pd.DataFrame):
+            state.update_frame(bars)
+        else:
+            state.update_bars(bars)
+        return state
+
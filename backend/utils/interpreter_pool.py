@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.exceptions import AppException
+
+
+def load_interpreter_class():
+    # The standalone LiteRT runtime (formerly tflite_runtime) imports in a fraction of the time
+    # of TensorFlow; fall back through tflite_runtime to the full TensorFlow package.
+    # Returns (Interpreter class, name of the package it came from).
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter, "ai_edge_litert"
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter, "tflite_runtime"
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter, "tensorflow"
+
+
+class InterpreterPool:
+    # A fixed set of TFLite interpreters, each with its own allocated tensors. A TFLite
+    # interpreter must not be used from two threads at once, so callers check one out,
+    # run set_tensor/invoke/get_tensor on it, and hand it back. make_interpreter(model_path,
+    # num_threads) can stand in for the TFLite constructor (benchmarks use a fake model).
+    # With model_content (the model file's bytes) the interpreters are built from that buffer
+    # rather than the file, so bytes read before a fork stay shared with the parent.
+    def __init__(self, model_path: str, size: int = 1, num_threads: int = 1, checkout_timeout: float = 30.0,
+                 make_interpreter=None, model_content: bytes | None = None):
+        if make_interpreter is None:
+            interpreter_class, self.runtime = load_interpreter_class()
+            if model_content is not None:
+                make_interpreter = lambda path, threads: interpreter_class(model_content=model_content, num_threads=threads)
+            else:
+                make_interpreter = lambda path, threads: interpreter_class(model_path=path, num_threads=threads)
+        else:
+            self.runtime = "custom"
+
+        self.model_path = model_path
+        self.preloaded = model_content is not None
+        self.size = size
+        self.num_threads = num_threads
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = queue.LifoQueue()
+        self._input_shapes = None
+        for _ in range(size):
+            interpreter = make_interpreter(model_path, num_threads)
+            interpreter.allocate_tensors()
+            if self._input_shapes is None:
+                self._input_shapes = [list(details['shape']) for details in interpreter.get_input_details()]
+            self._idle.put(interpreter)
+
+        self._stats_lock = threading.Lock()
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+
+    @contextmanager
+    def interpreter(self):
+        with self._stats_lock:
+            self._waiting += 1
+        start = time.perf_counter()
+        try:
+            interpreter = self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            with self._stats_lock:
+                self._waiting -= 1
+                self._timeouts += 1
+            raise AppException("PAP model is busy, please try again", 503)
+
+        waited = time.perf_counter() - start
+        with self._stats_lock:
+            self._waiting -= 1
+            self._checkouts += 1
+            self._wait_seconds_total += waited
+            self._wait_seconds_max = max(self._wait_seconds_max, waited)
+
+        try:
+            yield interpreter
+        finally:
+            self._idle.put(interpreter)
+
+    def warm_up(self, fn):
+        # Call fn(interpreter) once on every interpreter, so first requests don't pay for
+        # lazy allocation and kernel setup
+        interpreters = [self._idle.get(timeout=self.checkout_timeout) for _ in range(self.size)]
+        try:
+            for interpreter in interpreters:
+                fn(interpreter)
+        finally:
+            for interpreter in interpreters:
+                self._idle.put(interpreter)
+
+    def close(self):
+        # Release the interpreters with their inputs back in the shape they were built with.
+        # LiteRT segfaults destroying an interpreter for a dynamic-range model whose input was
+        # resized (as batched invokes do) while XNNPACK is applied, which otherwise takes the
+        # process down on exit.
+        interpreters = [self._idle.get(timeout=self.checkout_timeout) for _ in range(self.size)]
+        for interpreter in interpreters:
+            for details, shape in zip(interpreter.get_input_details(), self._input_shapes):
+                if list(details['shape']) != shape:
+                    interpreter.resize_tensor_input(details['index'], shape)
+            interpreter.allocate_tensors()
+        self.size = 0
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "size": self.size,
+                "preloaded": self.preloaded,
+                "num_threads": self.num_threads,
+                "idle": self._idle.qsize(),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_seconds_total": self._wait_seconds_total,
+                "wait_seconds_avg": self._wait_seconds_total / self._checkouts if self._checkouts else 0.0,
+                "wait_seconds_max": self._wait_seconds_max,
+            }
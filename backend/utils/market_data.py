@@ -0,0 +1,229 @@
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+import yfinance as yf
+
+from utils.bar_store import get_bar_store, to_ns
+from utils.bars import Bars
+from utils.metrics import span
+from utils.upstream import call_upstream
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+VALID_INTERVALS = ['1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h', '1d']
+# How far back Yahoo serves each intraday interval, and the longest span one request may ask
+# for; longer downloads are split into requests of that span
+INTERVAL_HISTORY_DAYS = {'1m': 30, '2m': 60, '5m': 60, '15m': 60, '30m': 60, '60m': 730, '90m': 60, '1h': 730}
+INTERVAL_REQUEST_DAYS = {'1m': 7}
+
+# How each OHLCV column combines when several bars are merged into one
+OHLCV_AGGREGATION = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+}
+
+
+def normalize_bars(df: pd.DataFrame) -> Bars | None:
+    # Compact bars from a yfinance frame: UTC epoch times, float64 OHLCV columns, no NaN rows;
+    # None if nothing is left. Columns are converted straight into arrays, without an
+    # intermediate copy of the frame.
+    if df.empty:
+        logger.info("No data returned by yfinance.")
+        return None
+
+    if isinstance(df.columns, pd.MultiIndex):
+        # keep only the first level: 'Open', 'High', ...
+        df.columns = df.columns.get_level_values(0)
+
+    times = pd.to_datetime(df.index, utc=True).asi8
+    columns = [pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64) for col in OHLCV_COLUMNS]
+
+    valid = ~np.isnan(columns[0])
+    for column in columns[1:]:
+        valid &= ~np.isnan(column)
+    rows = np.flatnonzero(valid)
+    if len(rows) < len(times):
+        logger.debug("Dropped %d initial NaN rows.", len(times) - len(rows))
+    if len(rows) == 0:
+        logger.info("Data empty after initial NaN drop.")
+        return None
+    if np.any(times[rows][1:] < times[rows][:-1]):
+        rows = rows[np.argsort(times[rows], kind='stable')]
+
+    return Bars(times[rows], *(column[rows] for column in columns))
+
+
+def _request_ranges(interval: str, start_dt, end_dt) -> list[tuple]:
+    # [start_dt, end_dt) split into spans a single Yahoo request accepts
+    days = INTERVAL_REQUEST_DAYS.get(interval)
+    if days is None:
+        return [(start_dt, end_dt)]
+    start, end = pd.Timestamp(to_ns(start_dt), tz='UTC'), pd.Timestamp(to_ns(end_dt), tz='UTC')
+    step = pd.Timedelta(days=days)
+    ranges = []
+    while start < end:
+        ranges.append((start, min(start + step, end)))
+        start += step
+    return ranges or [(start_dt, end_dt)]
+
+
+def download_bars(ticker: str, interval: str, start_dt, end_dt) -> Bars | None:
+    # Fetch OHLCV bars from yfinance and normalize them
+    if interval not in VALID_INTERVALS:
+        logger.error("Interval '%s' not supported by yfinance.", interval)
+        return None
+
+    parts = []
+    with span("download", ticker=ticker, interval=interval):
+        for start, end in _request_ranges(interval, start_dt, end_dt):
+            df = call_upstream("yahoo", yf.download, ticker, start=start, end=end, interval=interval, progress=False)
+            parts.append(normalize_bars(df))
+    bars = Bars.concat(parts)
+    return None if bars.empty else bars
+
+
+def download_bars_multi(tickers: list[str], interval: str, start_dt, end_dt) -> dict[str, Bars | None]:
+    # One multi-symbol yfinance request for many tickers; missing symbols map to None
+    if interval not in VALID_INTERVALS:
+        logger.error("Interval '%s' not supported by yfinance.", interval)
+        return {ticker: None for ticker in tickers}
+    if not tickers:
+        return {}
+
+    parts = {ticker: [] for ticker in tickers}
+    with span("download", tickers=len(tickers), interval=interval):
+        for start, end in _request_ranges(interval, start_dt, end_dt):
+            df = call_upstream("yahoo", yf.download, tickers, start=start, end=end, interval=interval,
+                               group_by='ticker', progress=False)
+            downloaded = set(df.columns.get_level_values(0)) if isinstance(df.columns, pd.MultiIndex) else set()
+            for ticker in downloaded & parts.keys():
+                parts[ticker].append(normalize_bars(df[ticker]))
+    bars = {ticker: Bars.concat(chunks) for ticker, chunks in parts.items()}
+    return {ticker: None if b.empty else b for ticker, b in bars.items()}
+
+
+def resample_bars(df: pd.DataFrame, interval_minutes: int) -> pd.DataFrame:
+    # Build N-minute bars from 1-minute bars. Bins are left-closed and labelled by their start,
+    # aligned to the epoch like Yahoo's intraday bars (9:30 ET falls on a 2m and 5m boundary).
+    # Bars.resample does the same on compact bars.
+    if interval_minutes == 1:
+        return df
+    resampled = df[OHLCV_COLUMNS].resample(
+        f"{interval_minutes}min", closed='left', label='left', origin='epoch'
+    ).agg(OHLCV_AGGREGATION)
+    # bins without any 1m bar (outside market hours, halts) come back as NaN rows
+    return resampled.dropna(subset=['Open', 'High', 'Low', 'Close'])
+
+
+def _closed_boundary(interval: str, end_ns: int) -> int:
+    # Bars starting before this are closed and safe to persist
+    interval_ns = pd.Timedelta(interval).value
+    now_ns = time.time_ns()
+    return min(end_ns, now_ns - now_ns % interval_ns)
+
+
+def _stored_coverage(store, ticker: str, interval: str, start_ns: int) -> tuple[int, int]:
+    # Coverage to extend for a request starting at start_ns. A request after the stored range
+    # fills the gap (_fetch_range downloads from the stored end), unless the gap reaches back
+    # further than the provider serves bars for, in which case the series starts over.
+    coverage = store.coverage(ticker, interval)
+    history_days = INTERVAL_HISTORY_DAYS.get(interval)
+    if coverage is None or (history_days is not None and start_ns - coverage[1] > pd.Timedelta(days=history_days).value):
+        store.clear(ticker, interval)
+        coverage = (start_ns, start_ns)
+    return coverage
+
+
+def _fetch_range(coverage, start_ns: int, end_ns: int) -> tuple[int, int] | None:
+    # What to download so the stored range covers [start_ns, end_ns) and stays contiguous:
+    # everything from start_ns when the request begins before the stored range (a longer
+    # lookback than whatever created the series), otherwise just what is newer than it
+    if start_ns < coverage[0]:
+        return start_ns, max(end_ns, coverage[0])
+    if coverage[1] < end_ns:
+        return coverage[1], end_ns
+    return None
+
+
+def _merge_fetched(store, ticker: str, interval: str, coverage, fetched, start_ns: int, end_ns: int, closed_ns: int):
+    # Persist the closed part of freshly fetched bars and return the requested range: stored
+    # bars plus the still-forming ones that aren't persisted. Coverage only advances to the
+    # end of the last closed bar actually received, so bars the provider publishes late (or a
+    # partial response left out) are asked for again next time.
+    if fetched is not None:
+        stored = store.coverage(ticker, interval)
+        if stored is not None and stored[0] <= coverage[1] and coverage[0] <= stored[1]:
+            # another worker may have extended the series since `coverage` was read
+            coverage = (min(coverage[0], stored[0]), max(coverage[1], stored[1]))
+        if start_ns < coverage[0]:
+            store.prepend(ticker, interval, fetched.between(None, coverage[0]))
+            coverage = (start_ns, coverage[1])
+        closed = fetched.between(coverage[1], closed_ns)
+        store.append(ticker, interval, closed)
+        if not closed.empty:
+            received_ns = int(closed.time[-1]) + pd.Timedelta(interval).value
+            coverage = (coverage[0], max(coverage[1], min(received_ns, closed_ns)))
+        store.set_coverage(ticker, interval, *coverage)
+        fetched = fetched.between(coverage[1], end_ns)
+
+    bars = Bars.concat([Bars.from_columns(store.read(ticker, interval, start_ns, min(end_ns, coverage[1]))), fetched])
+    if bars.empty:
+        return None
+    return bars
+
+
+def load_bars(ticker: str, interval: str, start_dt, end_dt) -> Bars | None:
+    # download_bars backed by the local bar store: only bars outside the stored range are
+    # fetched, and only closed bars are persisted (the still-forming bar is returned but not kept)
+    store = get_bar_store()
+    if store is None:
+        return download_bars(ticker, interval, start_dt, end_dt)
+
+    start_ns, end_ns = to_ns(start_dt), to_ns(end_dt)
+    closed_ns = _closed_boundary(interval, end_ns)
+
+    with store.lock(ticker, interval):
+        coverage = _stored_coverage(store, ticker, interval, start_ns)
+        fetch = _fetch_range(coverage, start_ns, end_ns)
+        fetched = None
+        if fetch is not None:
+            fetched = download_bars(ticker, interval, pd.Timestamp(fetch[0], tz='UTC'), pd.Timestamp(fetch[1], tz='UTC'))
+        return _merge_fetched(store, ticker, interval, coverage, fetched, start_ns, end_ns, closed_ns)
+
+
+def load_bars_multi(tickers: list[str], interval: str, start_dt, end_dt) -> dict[str, Bars | None]:
+    # load_bars for many tickers with one upstream request covering everything missing
+    store = get_bar_store()
+    if store is None:
+        return download_bars_multi(tickers, interval, start_dt, end_dt)
+
+    start_ns, end_ns = to_ns(start_dt), to_ns(end_dt)
+    closed_ns = _closed_boundary(interval, end_ns)
+
+    coverages = {}
+    for ticker in tickers:
+        with store.lock(ticker, interval):
+            coverages[ticker] = _stored_coverage(store, ticker, interval, start_ns)
+
+    fetches = {ticker: _fetch_range(coverages[ticker], start_ns, end_ns) for ticker in tickers}
+    stale = [ticker for ticker in tickers if fetches[ticker] is not None]
+    fetched = {}
+    if stale:
+        fetch_from = min(fetches[ticker][0] for ticker in stale)
+        fetch_to = max(fetches[ticker][1] for ticker in stale)
+        fetched = download_bars_multi(stale, interval, pd.Timestamp(fetch_from, tz='UTC'), pd.Timestamp(fetch_to, tz='UTC'))
+
+    results = {}
+    for ticker in tickers:
+        with store.lock(ticker, interval):
+            results[ticker] = _merge_fetched(
+                store, ticker, interval, coverages[ticker], fetched.get(ticker), start_ns, end_ns, closed_ns
+            )
+    return results
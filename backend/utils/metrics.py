@@ -0,0 +1,140 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Tickers make unbounded label sets, so spans only carry them in logs unless this is enabled
+METRICS_TICKER_LABELS = os.getenv("METRICS_TICKER_LABELS", "0") == "1"
+# Tags that become histogram labels; they all have a small, fixed set of values
+LABEL_TAGS = ("setting", "source")
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Tags (ticker, setting, ...) that spans opened in this context inherit
+_tags = contextvars.ContextVar("metric_tags", default={})
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_text(labels)} {value}" for labels, value in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}   # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, values in series:
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"{self.name}_bucket{_label_text(labels + (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_label_text(labels + (('le', '+Inf'),))} {values[-1]}")
+            lines.append(f"{self.name}_sum{_label_text(labels)} {values[-2]}")
+            lines.append(f"{self.name}_count{_label_text(labels)} {values[-1]}")
+        return lines
+
+
+stage_seconds = Histogram("pap_stage_duration_seconds", "Time spent in each pipeline stage")
+stage_errors = Counter("pap_stage_errors_total", "Pipeline stages that raised")
+http_request_seconds = Histogram("http_request_duration_seconds", "HTTP request latency by route")
+events = Counter("pap_events_total", "Work done by the pipeline (images scored, snippets sent to the LLM, ...)")
+
+_stats_sources = {}
+
+
+def register_stats(prefix: str, stats_fn):
+    # Expose every numeric value of a component's stats() dict as a gauge named prefix_key
+    _stats_sources[prefix] = stats_fn
+
+
+def stats_snapshot() -> dict:
+    return {prefix: stats_fn() for prefix, stats_fn in _stats_sources.items()}
+
+
+@contextmanager
+def tagged(**tags):
+    # Spans opened inside this block (and in work handed to run_io/run_cpu) carry these tags
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+@contextmanager
+def span(stage: str, **tags):
+    # Time a pipeline stage into pap_stage_duration_seconds, labelled by stage and LABEL_TAGS;
+    # the ticker and any other tags go to the debug log
+    tags = {**_tags.get(), **tags}
+    labels = {"stage": stage, **{key: tags[key] for key in LABEL_TAGS if key in tags}}
+    if METRICS_TICKER_LABELS and "ticker" in tags:
+        labels["ticker"] = tags["ticker"]
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(**labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, **labels)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s took %.1f ms %s", stage, elapsed * 1000, tags)
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in (stage_seconds, stage_errors, http_request_seconds, events):
+        lines += metric.render()
+    for prefix, stats in stats_snapshot().items():
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = f"{prefix}_{key}"
+                lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
@@ -1,42 +1,80 @@
+import atexit
+import contextvars
+import logging
 import os
+import threading
+import time
 
 import pandas as pd
 import numpy as np 
 
-from PIL import Image
-
 import yfinance as yf
 
 from utils.exceptions import AppException
-
-PAP_MODEL_PATH = 'ml_models/MulticlassPAP_20k_v2.tflite'
+from utils.bar_store import to_ns
+from utils.bars import Bars
+from utils.indicators import wilder_atr
+from utils.indicators import true_range as compute_true_range
+from utils.interpreter_pool import InterpreterPool
+from utils.market_data import INTERVAL_HISTORY_DAYS, load_bars, load_bars_multi
+from utils.metrics import events, span, tagged
+
+logger = logging.getLogger(__name__)
+
+# Model files written by convert_to_tflite.py --mode; the dynamic-range model is served by
+# default, and the full-integer one can be served from here too
+PAP_MODEL_PATHS = {
+    'dynamic': 'ml_models/MulticlassPAP_20k_v2.tflite',
+    'float': 'ml_models/MulticlassPAP_20k_v2_float32.tflite',
+    'int8': 'ml_models/MulticlassPAP_20k_v2_int8.tflite',
+}
+PAP_MODEL_PATH = os.getenv("PAP_MODEL_PATH", PAP_MODEL_PATHS['dynamic'])
+PAP_POOL_SIZE = int(os.getenv("PAP_POOL_SIZE", "2"))
+PAP_NUM_THREADS = int(os.getenv("PAP_NUM_THREADS", "1"))
+PAP_BATCH_SIZE = int(os.getenv("PAP_BATCH_SIZE", "64"))
+
+_pap_model_content = None
+def preload_pap_model():
+    # Read the model file in the parent process before workers are forked (gunicorn.conf.py).
+    # Each worker still builds its own interpreters, but from these bytes, which stay shared
+    # copy-on-write instead of every worker reading the file into memory of its own.
+    global _pap_model_content
+    if _pap_model_content is None:
+        with open(PAP_MODEL_PATH, "rb") as f:
+            _pap_model_content = f.read()
+        logger.info("PAP model preloaded (%d bytes)", len(_pap_model_content))
 
 _pap_model = None
-def get_pap_model():
+_pap_model_lock = threading.Lock()
+def get_pap_model() -> InterpreterPool:
     global _pap_model
-    if _pap_model is None:
-        print("------- IMPORTING TFLITE ---------")
-        import tensorflow.lite as tflite
-        print("------- LOADING PAP MODEL ---------")
-        _pap_model = tflite.Interpreter(model_path=PAP_MODEL_PATH)
-        _pap_model.allocate_tensors()
-        print("------- PAP MODEL LOAD DONE -------")
+    with _pap_model_lock:
+        if _pap_model is None:
+            logger.info("Loading PAP model")
+            _pap_model = InterpreterPool(PAP_MODEL_PATH, size=PAP_POOL_SIZE, num_threads=PAP_NUM_THREADS,
+                                         model_content=_pap_model_content)
+            atexit.register(_pap_model.close)
+            logger.info("PAP model loaded (%d interpreters x %d threads)", PAP_POOL_SIZE, PAP_NUM_THREADS)
     return _pap_model
 
+def pap_model_stats() -> dict:
+    # For /api/stats and /metrics, which must not load the model (or wait on a load in progress)
+    pap_model = _pap_model
+    return pap_model.stats() if pap_model is not None else {}
+
 def calculate_atr(data: pd.DataFrame, period: int) -> pd.Series:
     required_cols = ['High', 'Low', 'Close']
     if not all(col in data.columns for col in required_cols):
         raise AppException(f"ATR: Missing columns {required_cols}.", 500)
 
-    high_low = data['High'] - data['Low']
-    high_close_prev = (data['High'] - data['Close'].shift(1)).abs()
-    low_close_prev = (data['Low'] - data['Close'].shift(1)).abs()
-
-    true_range = pd.DataFrame({
-        'hl': high_low,
-        'hc': high_close_prev,
-        'lc': low_close_prev
-    }).max(axis=1, skipna=False)
+    true_range = pd.Series(
+        compute_true_range(
+            data['High'].to_numpy(dtype=np.float64),
+            data['Low'].to_numpy(dtype=np.float64),
+            data['Close'].to_numpy(dtype=np.float64),
+        ),
+        index=data.index,
+    )
 
     atr = true_range.ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
 
@@ -55,7 +93,16 @@ def calculate_max_drawdown(equity_series: pd.Series) -> float: #calculates max d
     return max_drawdown
 
 
-def get_processed_data(ticker: str, interval: str, start_dt: str, end_dt: str, atr_period: int = 14) -> pd.DataFrame | None:
+def add_atr(bars: Bars, atr_period: int = 14) -> Bars:
+    # Calculate ATR and drop the warm-up rows it can't cover; the price columns are shared
+    # with `bars`, not copied
+    with span("atr"):
+        atr = wilder_atr(bars.high, bars.low, bars.close, atr_period)
+    bars = Bars(bars.time, bars.open, bars.high, bars.low, bars.close, bars.volume, atr)
+    return bars[min(atr_period, len(bars)):]
+
+
+def get_processed_data(ticker: str, interval: str, start_dt: str, end_dt: str, atr_period: int = 14) -> Bars | None:
     def convert_to_et(dt_str: str) -> str:
         dt = pd.to_datetime(dt_str)
         if dt.tz is None:
@@ -63,137 +110,179 @@ def get_processed_data(ticker: str, interval: str, start_dt: str, end_dt: str, a
         et = dt.tz_convert('America/New_York')
         return et.strftime('%Y-%m-%d %H:%M:%S ET')
 
-    print(f"\n--- Processing {ticker} for Interval: {interval} from {convert_to_et(start_dt)} to {convert_to_et(end_dt)} using yfinance ---")
-
-    valid_intervals = ['1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h', '1d']
-    if interval not in valid_intervals:
-        print(f"Error: Interval '{interval}' not supported by yfinance.")
-        return None
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Processing %s for interval %s from %s to %s", ticker, interval, convert_to_et(start_dt), convert_to_et(end_dt))
 
     # Fetch OHLCV data
-    df = yf.download(ticker, start=start_dt, end=end_dt, interval=interval, progress=False)
-
-    if df.empty:
-        print("No data returned by yfinance.")
+    bars = load_bars(ticker, interval, start_dt, end_dt)
+    if bars is None:
         return None
 
-    if isinstance(df.columns, pd.MultiIndex):
-        # keep only the first level: 'Open', 'High', ...
-        df.columns = df.columns.get_level_values(0)
+    return add_atr(bars, atr_period)
 
-    df.index = pd.to_datetime(df.index, utc=True)
-    df.sort_index(inplace=True)
 
-    # Keep only necessary columns
-    cols_to_keep = ['Open', 'High', 'Low', 'Close', 'Volume']
-    df = df[cols_to_keep].copy()
-
-    # Convert columns to numeric
-    for col in cols_to_keep:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    rows_before_na = len(df)
-    df.dropna(subset=cols_to_keep, inplace=True)
-    if len(df) < rows_before_na:
-        print(f"Dropped {rows_before_na - len(df)} initial NaN rows.")
-    if df.empty:
-        print("Data empty after initial NaN drop.")
-        return None
-
-    # Calculate ATR
-    atr_col_name = f"ATR_{atr_period}"
-    df[atr_col_name] = calculate_atr(df.copy(), atr_period)
-    df.dropna(subset=[atr_col_name], inplace=True)
-
-    expected_cols = cols_to_keep + [atr_col_name]
-    if not all(col in df.columns for col in expected_cols):
-        raise AppException(f"Final columns missing: {df.columns.tolist()}", 500)
-
-    return df
-
-
-import tempfile
-from utils.image_generation import generate_image
+from utils.prefilter import prefilter_mask
+from utils.rasterizer import render_close_image, render_close_images
 
 PAP_CONFIDENCE_THRESHOLD = 0.5
-def precompute_pap_score(
-    df: pd.DataFrame,
-    interval_minutes: int,
-    model_input_window: int,
-) -> pd.DataFrame:
-
-    # Generate image
-    with tempfile.TemporaryDirectory() as temp_dir:
-        image_path = generate_image(df, model_input_window, temp_dir)
-
-        # If no images were generated, skip prediction
-        if not image_path or not os.path.exists(image_path):
-            return 0, "N/A"  # No valid image
-
+BULLISH_INDICES_SET = {1, 2, 5}
+BEARISH_INDICES_SET = {0, 3, 4}
+PAP_STRINGS = ['Bearish Flag', 'Bullish Flag', 'Double Bottom', 'Double Top', 'Head & Shoulders', 'Inverted Head & Shoulders', 'Noise']
+
+def quantize_input(images: np.ndarray, detail: dict) -> np.ndarray:
+    # Float charts -> the input tensor's dtype. Full-integer models take int8/uint8 with
+    # real = scale * (q - zero_point); float models take the charts as they are.
+    dtype = np.dtype(detail['dtype'])
+    if dtype.kind == 'f':
+        return images.astype(dtype, copy=False)
+    scale, zero_point = detail['quantization']
+    info = np.iinfo(dtype)
+    return np.clip(np.round(images / scale + zero_point), info.min, info.max).astype(dtype)
+
+def dequantize_output(preds: np.ndarray, detail: dict) -> np.ndarray:
+    # Quantized class probabilities back to float32, so thresholds apply unchanged
+    if np.dtype(detail['dtype']).kind == 'f':
+        return preds
+    scale, zero_point = detail['quantization']
+    return (preds.astype(np.float32) - zero_point) * scale
+
+def invoke_pap_model(pap_model, images: np.ndarray) -> np.ndarray:
+    # One invoke over an (N, 128, 128, 3) batch, resizing the interpreter's batch dimension if needed
+    input_details = pap_model.get_input_details()
+    if input_details[0]['shape'][0] != len(images):
+        pap_model.resize_tensor_input(input_details[0]['index'], list(images.shape))
+        pap_model.allocate_tensors()
+    output_details = pap_model.get_output_details()
+
+    pap_model.set_tensor(input_details[0]['index'], quantize_input(images, input_details[0]))
+    pap_model.invoke()
+    return dequantize_output(pap_model.get_tensor(output_details[0]['index']), output_details[0])
+
+def predict_pap_batch(images: np.ndarray) -> np.ndarray:
+    with get_pap_model().interpreter() as pap_model:
         try:
-            img = Image.open(image_path).convert('RGB').resize((128, 128))
-            img_arr = np.array(img, dtype=np.float32)
-            img_arr = np.expand_dims(img_arr, axis=0)
-
-            pap_model = get_pap_model()
-            
-            # Get input and output tensors
-            input_details = pap_model.get_input_details()
-            output_details = pap_model.get_output_details()
-            
-            # Set the input tensor
-            pap_model.set_tensor(input_details[0]['index'], img_arr)
-            
-            # Run inference
-            pap_model.invoke()
-            
-            # Get the output
-            preds = pap_model.get_tensor(output_details[0]['index'])
-            print(preds)
-            pred_index = int(np.argmax(preds))
-            confidence = float(np.max(preds))
-
+            with span("inference"):
+                preds = invoke_pap_model(pap_model, images)
+            events.inc(len(images), event="images_scored")
+            return preds
         except Exception as e:
             raise AppException(f"Error during TFLite prediction: {e}", 500)
 
-        # Assign scores based on confidence threshold
-        BULLISH_INDICES_SET = {1, 2, 5}
-        BEARISH_INDICES_SET = {0, 3, 4}
-        
-        pap_strings = ['Bearish Flag', 'Bullish Flag', 'Double Bottom', 'Double Top', 'Head & Shoulders', 'Inverted Head & Shoulders', 'Noise']
-        signal_prediction, pap_prediction = 0, 'Noise'
-        if pred_index != -1 and confidence >= PAP_CONFIDENCE_THRESHOLD:
-            if pred_index in BULLISH_INDICES_SET:
-                signal_prediction, pap_prediction = 1, pap_strings[pred_index]
-            elif pred_index in BEARISH_INDICES_SET:
-                signal_prediction, pap_prediction = -1, pap_strings[pred_index]
-            # sanity check image
-            # sanity_path = os.path.join('Generated_Images', f"{pap_prediction}_{interval_minutes}_{model_input_window}.png")
-            # shutil.copy(image_path, sanity_path)
+def warm_up_pap_model():
+    # Invoke every pooled interpreter once on blank charts, at the batch size of one analysis
+    batch = np.full((len(set(interval_settings)), 128, 128, 3), 255.0, dtype=np.float32)
+    get_pap_model().warm_up(lambda pap_model: invoke_pap_model(pap_model, batch))
+
+def classify_pap_prediction(preds: np.ndarray) -> tuple[int, str]:
+    # Assign scores based on confidence threshold
+    pred_index = int(np.argmax(preds))
+    confidence = float(np.max(preds))
+
+    signal_prediction, pap_prediction = 0, 'Noise'
+    if pred_index != -1 and confidence >= PAP_CONFIDENCE_THRESHOLD:
+        if pred_index in BULLISH_INDICES_SET:
+            signal_prediction, pap_prediction = 1, PAP_STRINGS[pred_index]
+        elif pred_index in BEARISH_INDICES_SET:
+            signal_prediction, pap_prediction = -1, PAP_STRINGS[pred_index]
     return signal_prediction, pap_prediction
 
+def precompute_pap_score(
+    df: Bars,
+    interval_minutes: int,
+    model_input_window: int,
+) -> tuple[int, str]:
+
+    closes = df.close[-model_input_window:]
+    # Windows the pre-filter rules out can't be any of the six patterns
+    with span("prefilter"):
+        if not prefilter_mask([closes])[0]:
+            events.inc(event="windows_prefiltered")
+            return 0, "Noise"
+
+    # Render the close-price chart straight into the model's input buffer
+    with span("render"):
+        img_arr = render_close_image(closes)
+
+    # If no image was generated, skip prediction
+    if img_arr is None:
+        return 0, "N/A"  # No valid image
+
+    preds = predict_pap_batch(np.expand_dims(img_arr, axis=0))
+    logger.debug("PAP prediction: %s", preds)
+    return classify_pap_prediction(preds[0])
+
+def score_pap_windows(windows: list[Bars]) -> list[tuple[int, str]]:
+    # Batched precompute_pap_score: one invoke per PAP_BATCH_SIZE images bounds the memory of
+    # large (watchlist) batches. Windows the pre-filter rules out score as Noise without rendering.
+    scores = [(0, "N/A")] * len(windows)
+    closes = [df.close for df in windows]
+    with span("prefilter"):
+        keep = prefilter_mask(closes)
+    skipped = np.flatnonzero(~keep)
+    for i in skipped:
+        scores[i] = (0, "Noise")
+    if len(skipped):
+        events.inc(len(skipped), event="windows_prefiltered")
+
+    candidates = np.flatnonzero(keep)
+    for chunk_start in range(0, len(candidates), PAP_BATCH_SIZE):
+        chunk = candidates[chunk_start:chunk_start + PAP_BATCH_SIZE]
+        with span("render"):
+            images, valid = render_close_images([closes[i] for i in chunk])
+        if not valid.any():
+            continue
+
+        # boolean indexing would copy the whole batch; only do it when some window failed
+        preds = predict_pap_batch(images if valid.all() else images[valid])
+        for i, row in zip(chunk[valid], preds):
+            scores[i] = classify_pap_prediction(row)
+    return scores
+
 
 ATR_PERIOD = 14
 
-from .sentiment import get_news_data_today
+from .sentiment import get_news_data_today, get_news_data_today_async
+from .executors import run_cpu, run_io
+from .singleflight import SingleFlight, current_bar_boundary
+from .response_cache import NEWS_CACHE_TTL, ExpiringCache, next_bar_boundary
+from .serialization import serialize_candlesticks
+from .symbols import get_symbol_index, normalize_symbol
+from .upstream import call_upstream
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
 from datetime import datetime, timezone
 
 
-def ticker_exists(ticker: str) -> bool:
+def lookup_ticker_upstream(ticker: str) -> bool:
+    # yfinance swallows HTTP errors for unknown symbols and returns a stub info dict, so a real
+    # listing is recognized by its quoteType. Anything raised is an upstream failure, not a verdict.
     try:
-        yf.Ticker(ticker).info 
-        return True
-    except Exception:
-        return False
+        with span("ticker_check", ticker=ticker):
+            info = call_upstream("yahoo", lambda: yf.Ticker(ticker).info)
+    except Exception as e:
+        raise AppException(f"Could not validate ticker {ticker}: {e}", 503)
+    return bool(info) and info.get("quoteType") not in (None, "NONE")
 
-def get_pap_signal(
+def ticker_exists(ticker: str) -> bool:
+    # Answered from the local symbol index; only symbols it has never seen go to the network
+    index = get_symbol_index()
+    exists = index.lookup(ticker)
+    if exists is None:
+        exists = lookup_ticker_upstream(ticker)
+        index.remember(ticker, exists)
+    return exists
+
+def get_analysis_time() -> datetime:
+    # Fixed time for testing: 1:00 PM EST (6:00 PM UTC)
+    return datetime(2025, 7, 8, 18, 0, 0, tzinfo=timezone.utc)
+    #return datetime.now(timezone.utc);
+
+def get_pap_window(
     ticker: str,
     interval_minutes: int = 1,
     lookback_bars: int = 30,
-):
-    # Fixed time for testing: 1:00 PM EST (6:00 PM UTC)
-    now_dt = datetime(2025, 7, 8, 18, 0, 0, tzinfo=timezone.utc)
-    #now_dt = datetime.now(timezone.utc);
+) -> Bars:
+    now_dt = get_analysis_time()
 
     extra = ATR_PERIOD + 10   
     df = get_processed_data(
@@ -203,7 +292,100 @@ def get_pap_signal(
         end_dt=now_dt,
         atr_period=ATR_PERIOD
     )
-    df = df.iloc[-(lookback_bars):]   # drop older rows
+    if df is None:
+        raise AppException(f"No {interval_minutes}m price data available for {ticker}", 404)
+    return df.tail(lookback_bars)   # drop older rows
+
+def pap_window_span(settings) -> int:
+    # Minutes of 1m history needed to build every window in settings, ATR warm-up included
+    extra = ATR_PERIOD + 10
+    return max(interval_minutes*(lookback_bars+extra) for interval_minutes, lookback_bars in settings)
+
+def build_pap_windows(bars_1m: Bars, settings, now_dt) -> list[Bars]:
+    # Coarser intervals are resampled locally and each window gets its own ATR warm-up. Windows
+    # are views into the resampled columns plus their own ATR array.
+    extra = ATR_PERIOD + 10
+    now_ns = to_ns(now_dt)
+    bars_by_interval = {}
+    windows = []
+    for interval_minutes, lookback_bars in settings:
+        if interval_minutes not in bars_by_interval:
+            bars_by_interval[interval_minutes] = bars_1m.resample(interval_minutes)
+        bars = bars_by_interval[interval_minutes]
+        start_ns = now_ns - interval_minutes*(lookback_bars+extra) * 60 * 10**9
+        with tagged(setting=f"{interval_minutes}m/{lookback_bars}"):
+            window = add_atr(bars.between(start_ns), ATR_PERIOD)
+        windows.append(window.tail(lookback_bars))   # drop older rows
+    return windows
+
+def get_pap_windows(ticker: str, settings) -> list[Bars]:
+    # Same windows as get_pap_window for every setting, but from a single 1m download
+    now_dt = get_analysis_time()
+    widest = pap_window_span(settings)
+
+    logger.debug("Fetching %s 1m bars for the last %d minutes", ticker, widest)
+    bars_1m = load_bars(ticker, "1m", now_dt - pd.Timedelta(minutes=widest), now_dt)
+    if bars_1m is None:
+        raise AppException(f"No 1m price data available for {ticker}", 404)
+    return build_pap_windows(bars_1m, settings, now_dt)
+
+def get_pap_windows_multi(tickers: list[str], settings) -> dict[str, list[Bars] | AppException]:
+    # get_pap_windows for a watchlist from one multi-symbol download; per-ticker failures are
+    # returned as AppExceptions instead of failing the whole batch
+    now_dt = get_analysis_time()
+    widest = pap_window_span(settings)
+
+    logger.debug("Fetching 1m bars for %d tickers for the last %d minutes", len(tickers), widest)
+    bars_by_ticker = load_bars_multi(tickers, "1m", now_dt - pd.Timedelta(minutes=widest), now_dt)
+
+    results = {}
+    for ticker in tickers:
+        bars_1m = bars_by_ticker.get(ticker)
+        if bars_1m is None:
+            results[ticker] = AppException(f"No 1m price data available for {ticker}", 404)
+            continue
+        try:
+            results[ticker] = build_pap_windows(bars_1m, settings, now_dt)
+        except AppException as e:
+            results[ticker] = e
+    return results
+
+# /api/bars: intervals served (resampled from 1m bars) and the most bars one response holds
+BAR_INTERVALS = (1, 2, 5, 15, 30, 60)
+BARS_MAX_LOOKBACK = int(os.getenv("BARS_MAX_LOOKBACK", "500"))
+
+def get_bars_since(ticker: str, interval_minutes: int = 1, since_ns: int | None = None, lookback_bars: int = 30) -> Bars:
+    # Bars of the interval from the one containing since_ns on: that bar may still have been
+    # forming when the client got it, so it is sent again with its final values. Without
+    # since_ns, the last lookback_bars. Never more than the BARS_MAX_LOOKBACK most recent bars,
+    # nor bars older than Yahoo keeps 1m history for.
+    now_dt = get_analysis_time()
+    now_ns = to_ns(now_dt)
+    step = interval_minutes * 60 * 10**9
+    start_ns = now_ns - now_ns % step - (BARS_MAX_LOOKBACK - 1) * step
+    history_ns = now_ns - pd.Timedelta(days=INTERVAL_HISTORY_DAYS["1m"]).value
+    start_ns = max(start_ns, history_ns + (-history_ns) % step)    # first whole bar within it
+    if since_ns is None:
+        start_ns = max(start_ns, now_ns - interval_minutes * lookback_bars * 60 * 10**9)
+    else:
+        if since_ns >= now_ns:
+            return Bars.from_columns({})
+        start_ns = max(start_ns, since_ns - since_ns % step)
+
+    bars_1m = load_bars(ticker, "1m", pd.Timestamp(start_ns, tz="UTC"), now_dt)
+    if bars_1m is None:
+        return Bars.from_columns({})
+    bars = bars_1m.resample(interval_minutes)
+    if since_ns is not None:
+        bars = bars.between(start_ns)
+    return bars.tail(lookback_bars if since_ns is None else BARS_MAX_LOOKBACK)
+
+def get_pap_signal(
+    ticker: str,
+    interval_minutes: int = 1,
+    lookback_bars: int = 30,
+):
+    df = get_pap_window(ticker, interval_minutes, lookback_bars)
 
     # Compute PAP_Score for that window
     pap_signal, pap_pattern = precompute_pap_score(df, interval_minutes, lookback_bars)
@@ -211,32 +393,35 @@ def get_pap_signal(
     # Always return the actual pattern (including "Noise"), not "N/A"
     return pap_signal, pap_pattern, df
 
-interval_settings = [(1, 30), (1, 15), (1, 30), (1, 45), (2, 10), (2, 15), (2, 30), (2, 45), (5, 10), (5, 15)]
-def get_trade_signal(
-    ticker: str,
-    atr_sl_multiplier: float = 1.5,  
-    rr_ratio: float = 1.5, 
-):
-    if not ticker_exists(ticker):
-        raise AppException("Invalid ticker symbol. Please try again", 404)
-
-    # Store the dataframe that was actually analyzed
-    analyzed_df = None
-    pap_signal = 0
-    pap_pattern = "Noise"
-    
-    for interval_minutes, lookback_bars in interval_settings:
-        print(f"-------{interval_minutes}m, {lookback_bars} bars-----")
-        pap_signal, pap_pattern, df = get_pap_signal(
-            ticker,
-            interval_minutes=interval_minutes,
-            lookback_bars=lookback_bars
-        )
-        analyzed_df = df.copy()  # Always capture the dataframe for chart display
+def select_pap_signal(settings, scores, windows):
+    # Apply the "first non-Noise pattern wins" rule in settings order; without a match the
+    # last window tried is returned for chart display
+    for (interval_minutes, lookback_bars), (pap_signal, pap_pattern), df in zip(settings, scores, windows):
+        logger.debug("%dm, %d bars: %s", interval_minutes, lookback_bars, pap_pattern)
         if pap_signal != 0:
-            break  # Found a valid pattern, break early
+            break  # Found a valid pattern
+    return pap_signal, pap_pattern, df
 
-    sent_score, articles = get_news_data_today(ticker)
+def get_pap_signal_batch(ticker: str, settings=None):
+    # Score every (interval, lookback) window for the ticker in one invoke
+    settings = unique_settings(settings)
+    windows = get_pap_windows(ticker, settings)
+    scores = score_pap_windows(windows)
+    return select_pap_signal(settings, scores, windows)
+
+def build_trade_signal(
+    pap_signal: int,
+    pap_pattern: str,
+    df: Bars,
+    sent_score: float,
+    articles: list,
+    atr_sl_multiplier: float = 1.5,
+    rr_ratio: float = 1.5,
+    candle_format: str = "rows",
+):
+    # Prepare candlestick data for frontend from the dataframe that was actually analyzed
+    # (candle_format=None leaves it out)
+    candlestick_data = serialize_candlesticks(df, candle_format) if candle_format else None
 
     # Determine signal
     signal = None
@@ -247,51 +432,231 @@ def get_trade_signal(
     else:
         if sent_score == 0:
             # For "no action" cases, still return the pattern and candlestick data
-            # Prepare candlestick data for frontend
-            candlestick_data = None
-            if analyzed_df is not None:
-                candlestick_data = []
-                for timestamp, row in analyzed_df.iterrows():
-                    candlestick_data.append({
-                        "timestamp": timestamp.isoformat(),
-                        "open": float(row["Open"]),
-                        "high": float(row["High"]),
-                        "low": float(row["Low"]),
-                        "close": float(row["Close"]),
-                        "volume": float(row["Volume"])
-                    })
             return "no action", "N/A", "N/A", sent_score, articles, pap_pattern, candlestick_data
         signal = "long" if sent_score > 0 else "short"
     
-    atr = df["ATR_14"].iloc[-1]
-    price = df["Close"].iloc[-1]
-
-    lows  = df["Low"].values
-    highs = df["High"].values
+    atr = df.atr[-1]
+    price = df.close[-1]
+    support, resistance = np.min(df.low), np.max(df.high)
 
     if signal == "long":
-        support = np.min(lows)
         sl = support - atr_sl_multiplier * atr
         risk = price - sl
         tp = price + rr_ratio * risk
     else:
-        resistance = np.max(highs)
         sl = resistance + atr_sl_multiplier * atr
         risk = sl - price
         tp = price - rr_ratio * risk
     
-    # Prepare candlestick data for frontend
-    candlestick_data = None
-    if analyzed_df is not None:
-        candlestick_data = []
-        for timestamp, row in analyzed_df.iterrows():
-            candlestick_data.append({
-                "timestamp": timestamp.isoformat(),
-                "open": float(row["Open"]),
-                "high": float(row["High"]),
-                "low": float(row["Low"]),
-                "close": float(row["Close"]),
-                "volume": float(row["Volume"])
-            })
-    
-    return signal, sl, tp, sent_score, articles, pap_pattern, candlestick_data
\ No newline at end of file
+    return signal, sl, tp, sent_score, articles, pap_pattern, candlestick_data
+interval_settings = [(1, 30), (1, 15), (1, 30), (1, 45), (2, 10), (2, 15), (2, 30), (2, 45), (5, 10), (5, 15)]
+smallest_interval = min(interval_minutes for interval_minutes, _ in interval_settings)
+def unique_settings(settings=None) -> list:
+    # The (interval, lookback) settings to analyze, defaulting to interval_settings, in order
+    # and without repeats
+    return list(dict.fromkeys(settings or interval_settings))
+BATCH_NEWS_CONCURRENCY = int(os.getenv("BATCH_NEWS_CONCURRENCY", "8"))
+def get_trade_signal(
+    ticker: str,
+    atr_sl_multiplier: float = 1.5,  
+    rr_ratio: float = 1.5, 
+):
+    with tagged(ticker=ticker):
+        if not ticker_exists(ticker):
+            raise AppException("Invalid ticker symbol. Please try again", 404)
+
+        # The price-pattern branch and the news/sentiment branch are independent; run them side by side
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            news_future = executor.submit(contextvars.copy_context().run, get_news_data_today, ticker)
+            pap_signal, pap_pattern, df = get_pap_signal_batch(ticker, interval_settings)
+            sent_score, articles = news_future.result()
+
+    return build_trade_signal(pap_signal, pap_pattern, df, sent_score, articles, atr_sl_multiplier, rr_ratio)
+
+async def get_pap_signal_async(ticker: str, settings=None):
+    settings = unique_settings(settings)
+    windows = await run_io("bars", get_pap_windows, ticker, settings)
+    scores = await run_cpu("pap", score_pap_windows, windows)
+    return select_pap_signal(settings, scores, windows)
+
+pap_result_cache = ExpiringCache()
+news_result_cache = ExpiringCache()
+
+async def get_pap_signal_cached(ticker: str):
+    # Valid until the next bar of the smallest analyzed interval opens
+    key = ticker.upper()
+    result = pap_result_cache.get(key)
+    if result is None:
+        result = await get_pap_signal_async(ticker, interval_settings)
+        pap_result_cache.set(key, result, next_bar_boundary(smallest_interval))
+    return result
+
+async def get_news_data_cached(ticker: str):
+    key = ticker.upper()
+    result = news_result_cache.get(key)
+    if result is None:
+        result = await get_news_data_today_async(ticker)
+        news_result_cache.set(key, result, time.time() + NEWS_CACHE_TTL)
+    return result
+
+async def check_ticker_async(ticker: str):
+    # Symbols the index already knows are answered without a trip to the I/O pool
+    exists = get_symbol_index().lookup(ticker)
+    if exists is None:
+        exists = await run_io("ticker_check", ticker_exists, ticker)
+    if not exists:
+        raise AppException("Invalid ticker symbol. Please try again", 404)
+
+def screen_batch_tickers(tickers: list[str]) -> tuple[list[str], dict[str, AppException]]:
+    # Watchlist tickers split into those to analyze and the rejected ones with their errors.
+    # Only local checks run here (symbol format, symbols already known to be bad), so a large
+    # watchlist doesn't turn into one upstream lookup per ticker; a ticker Yahoo doesn't know
+    # gets no bars from the shared download, and that is its verdict.
+    index = get_symbol_index()
+    accepted, rejected = [], {}
+    for ticker in dict.fromkeys(normalize_symbol(t) for t in tickers):
+        if index.lookup(ticker) is False:
+            rejected[ticker] = AppException("Invalid ticker symbol. Please try again", 404)
+        else:
+            accepted.append(ticker)
+    return accepted, rejected
+
+async def analyze_ticker_async(ticker: str):
+    # The expensive, parameter-independent part of an analysis. Network stages run on the I/O
+    # pool, rendering and inference on the CPU pool, each under its own timeout. The
+    # price-pattern branch and both news sources start together and join here.
+    with tagged(ticker=ticker):
+        await check_ticker_async(ticker)
+
+        (pap_signal, pap_pattern, df), (sent_score, articles) = await asyncio.gather(
+            get_pap_signal_cached(ticker),
+            get_news_data_cached(ticker),
+        )
+    return pap_signal, pap_pattern, df, sent_score, articles
+
+analysis_flights = SingleFlight()
+async def get_analysis_async(ticker: str):
+    # Concurrent requests for the same ticker within the same bar share one analysis
+    return await analysis_flights.do(
+        (ticker.upper(), current_bar_boundary(smallest_interval)),
+        lambda: analyze_ticker_async(ticker),
+    )
+
+async def get_trade_signal_async(
+    ticker: str,
+    atr_sl_multiplier: float = 1.5,
+    rr_ratio: float = 1.5,
+):
+    # get_trade_signal for the event loop. SL/TP only depend on the multipliers, so they are
+    # applied per request on top of the shared analysis.
+    analysis = await get_analysis_async(ticker)
+    return build_trade_signal(*analysis, atr_sl_multiplier, rr_ratio)
+
+def score_pap_windows_multi(windows_by_ticker: dict, settings) -> dict:
+    # Score the windows of every ticker together and pick each ticker's signal; tickers whose
+    # windows failed to build keep their AppException
+    scored = [ticker for ticker, windows in windows_by_ticker.items() if not isinstance(windows, AppException)]
+    all_windows = [df for ticker in scored for df in windows_by_ticker[ticker]]
+    all_scores = score_pap_windows(all_windows)
+
+    results = dict(windows_by_ticker)
+    for i, ticker in enumerate(scored):
+        ticker_slice = slice(i * len(settings), (i + 1) * len(settings))
+        results[ticker] = select_pap_signal(settings, all_scores[ticker_slice], all_windows[ticker_slice])
+    return results
+
+async def get_pap_signal_multi_async(tickers: list[str], settings=None) -> dict:
+    # Price-pattern results for a watchlist: cached tickers are reused, the rest share one
+    # download and are rendered and scored together
+    settings = unique_settings(settings)
+    results = {}
+    for ticker in tickers:
+        cached = pap_result_cache.get(ticker.upper())
+        if cached is not None:
+            results[ticker] = cached
+    missing = [ticker for ticker in tickers if ticker not in results]
+    if not missing:
+        return results
+
+    windows_by_ticker = await run_io("bars", get_pap_windows_multi, missing, settings)
+    scored = await run_cpu("pap", score_pap_windows_multi, windows_by_ticker, settings)
+
+    expires_at = next_bar_boundary(smallest_interval)
+    for ticker, result in scored.items():
+        if not isinstance(result, AppException):
+            pap_result_cache.set(ticker.upper(), result, expires_at)
+        results[ticker] = result
+    return results
+
+async def get_trade_signal_batch_async(
+    tickers: list[str],
+    atr_sl_multiplier: float = 1.5,
+    rr_ratio: float = 1.5,
+    news_concurrency: int = BATCH_NEWS_CONCURRENCY,
+    candle_format: str = "rows",
+):
+    # Async generator over (ticker, get_trade_signal result or AppException), yielded as each
+    # ticker finishes. Price patterns for the whole list are computed in one batch; news and
+    # sentiment fan out with at most news_concurrency tickers in flight.
+    tickers, rejected = screen_batch_tickers(tickers)
+    for ticker, error in rejected.items():
+        yield ticker, error
+    if not tickers:
+        return
+
+    pap_task = asyncio.ensure_future(get_pap_signal_multi_async(tickers))
+    news_slots = asyncio.Semaphore(news_concurrency)
+
+    async def analyze(ticker):
+        try:
+            pap_result = (await asyncio.shield(pap_task))[ticker]
+            if isinstance(pap_result, AppException):
+                return ticker, pap_result
+            async with news_slots:
+                with tagged(ticker=ticker):
+                    sent_score, articles = await get_news_data_cached(ticker)
+            return ticker, build_trade_signal(*pap_result, sent_score, articles, atr_sl_multiplier, rr_ratio, candle_format)
+        except AppException as e:
+            return ticker, e
+        except Exception as e:
+            return ticker, AppException(f"Analysis failed: {e}", 500)
+
+    for finished in asyncio.as_completed([analyze(ticker) for ticker in tickers]):
+        yield await finished
+
+def get_trade_signal_batch(
+    tickers: list[str],
+    atr_sl_multiplier: float = 1.5,
+    rr_ratio: float = 1.5,
+    news_concurrency: int = BATCH_NEWS_CONCURRENCY,
+    candle_format: str = "rows",
+):
+    # Blocking counterpart of get_trade_signal_batch_async: yields (ticker, result or AppException)
+    tickers, rejected = screen_batch_tickers(tickers)
+    for ticker, error in rejected.items():
+        yield ticker, error
+    if not tickers:
+        return
+    settings = unique_settings()
+    pap_results = score_pap_windows_multi(get_pap_windows_multi(tickers, settings), settings)
+
+    def news_for(ticker):
+        with tagged(ticker=ticker):
+            return get_news_data_today(ticker)
+
+    with ThreadPoolExecutor(max_workers=news_concurrency) as executor:
+        futures = {}
+        for ticker, pap_result in pap_results.items():
+            if isinstance(pap_result, AppException):
+                yield ticker, pap_result
+            else:
+                futures[executor.submit(news_for, ticker)] = (ticker, pap_result)
+        for future in as_completed(futures):
+            ticker, pap_result = futures[future]
+            try:
+                sent_score, articles = future.result()
+                yield ticker, build_trade_signal(*pap_result, sent_score, articles, atr_sl_multiplier, rr_ratio, candle_format)
+            except AppException as e:
+                yield ticker, e
+            except Exception as e:
+                yield ticker, AppException(f"Analysis failed: {e}", 500)
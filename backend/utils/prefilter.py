@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Windows whose plausibility score is below this skip rendering and inference and score as
+# Noise. 0 disables the pre-filter. Pick a value from benchmarks/prefilter_recall.py, which
+# reports the recall lost and the windows skipped at each threshold.
+PAP_PREFILTER_THRESHOLD = float(os.getenv("PAP_PREFILTER_THRESHOLD", "0"))
+
+# More swings than this (after smoothing) reads as chop rather than any of the six patterns
+MAX_SWINGS = 8
+# Double tops/bottoms and head & shoulders need two extremes within this fraction of the range
+PAIR_TOLERANCE = 0.3
+# A least-squares trend this steep (in ranges per window) is a full-strength flag pole
+FLAG_SLOPE = 0.8
+
+
+def _smooth(z: np.ndarray, width: int) -> np.ndarray:
+    # Centered moving average along each row, edges padded with the edge value
+    padded = np.pad(z, ((0, 0), (width // 2, width - 1 - width // 2)), mode="edge")
+    return sliding_window_view(padded, width, axis=1).mean(axis=-1)
+
+
+def _top_two(values: np.ndarray, mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Highest and second-highest masked value per row (-inf where missing)
+    top = np.sort(np.where(mask, values, -np.inf), axis=1)
+    return top[:, -1], top[:, -2]
+
+
+def shape_features(closes: np.ndarray) -> dict[str, np.ndarray]:
+    # Cheap shape features for an (N, lookback) array of close windows, each normalized to its
+    # own 0-1 range the way the chart is: swing count, trend slope and how evenly matched the
+    # two highest peaks and two lowest troughs are
+    closes = np.asarray(closes, dtype=np.float64)
+    n = closes.shape[1]
+    lo, hi = closes.min(axis=1, keepdims=True), closes.max(axis=1, keepdims=True)
+    span = hi - lo
+    z = np.divide(closes - lo, span, out=np.full_like(closes, 0.5), where=span > 0)
+
+    s = _smooth(z, max(3, n // 8))
+    step = np.diff(s, axis=1)
+    direction = np.sign(step)
+    swings = np.count_nonzero((direction[:, 1:] * direction[:, :-1]) < 0, axis=1)
+
+    t = np.linspace(-0.5, 0.5, n)
+    slope = (z - z.mean(axis=1, keepdims=True)) @ t / (t @ t)
+
+    inner = s[:, 1:-1]
+    peaks = (inner > s[:, :-2]) & (inner >= s[:, 2:])
+    troughs = (inner < s[:, :-2]) & (inner <= s[:, 2:])
+    peak_1, peak_2 = _top_two(inner, peaks)
+    trough_1, trough_2 = _top_two(1 - inner, troughs)
+    with np.errstate(invalid="ignore"):
+        peak_symmetry = np.nan_to_num(1 - np.abs(peak_1 - peak_2) / PAIR_TOLERANCE, nan=0.0, neginf=0.0)
+        trough_symmetry = np.nan_to_num(1 - np.abs(trough_1 - trough_2) / PAIR_TOLERANCE, nan=0.0, neginf=0.0)
+
+    return {
+        "swing_rate": swings / n,
+        "swings": swings,
+        "slope": slope,
+        # both extremes must also be near the top (bottom) of the chart to form a pair
+        "peak_symmetry": np.clip(peak_symmetry, 0, 1) * (peak_2 >= 0.5),
+        "trough_symmetry": np.clip(trough_symmetry, 0, 1) * (trough_2 >= 0.5),
+        "flat": (span[:, 0] == 0),
+    }
+
+
+def plausibility_scores(closes: np.ndarray) -> np.ndarray:
+    # 0-1 score of how plausibly each window could be a flag (a steep trend), a double
+    # top/bottom or a head & shoulders (a matched pair of extremes). Choppy windows with many
+    # swings are scaled down; flat windows score 0.
+    f = shape_features(closes)
+    flag = np.clip(np.abs(f["slope"]) / FLAG_SLOPE, 0, 1)
+    reversal = np.maximum(f["peak_symmetry"], f["trough_symmetry"])
+    calm = np.clip(1 - (f["swings"] - MAX_SWINGS) / MAX_SWINGS, 0, 1)
+    return np.where(f["flat"], 0.0, np.maximum(flag, reversal) * calm)
+
+
+def prefilter_mask(windows, threshold: float = PAP_PREFILTER_THRESHOLD) -> np.ndarray:
+    # True for windows worth rendering and scoring. `windows` is a 2D array or a list of 1D
+    # close arrays of any lengths (grouped by length so each group is scored in one pass).
+    # Windows the renderer would reject are kept so they still come back as "N/A".
+    keep = np.ones(len(windows), dtype=bool)
+    if threshold <= 0 or len(windows) == 0:
+        return keep
+
+    if isinstance(windows, np.ndarray) and windows.ndim == 2:
+        groups = {windows.shape[1]: np.arange(len(windows))}
+        arrays = windows
+    else:
+        arrays = [np.asarray(w, dtype=np.float64) for w in windows]
+        groups = {}
+        for i, w in enumerate(arrays):
+            if w.ndim == 1 and len(w) >= 3 and np.isfinite(w).all():
+                groups.setdefault(len(w), []).append(i)
+
+    for rows in groups.values():
+        rows = np.asarray(rows)
+        batch = arrays[rows] if isinstance(arrays, np.ndarray) else np.stack([arrays[i] for i in rows])
+        finite = np.isfinite(batch).all(axis=1)
+        if batch.shape[1] < 3 or not finite.any():
+            continue
+        keep[rows[finite]] = plausibility_scores(batch[finite]) >= threshold
+    return keep
@@ -0,0 +1,95 @@
+import numpy as np
+
+# Geometry of the matplotlib reference plot in utils/image_generation.py:
+# a 1.28in x 1.28in figure at 100 dpi, axes filling the figure, default 5%
+# data margins and a black 2pt line on a white background.
+IMAGE_SIZE = 128
+DPI = 100
+LINE_WIDTH_PT = 2
+AXES_MARGIN = 0.05
+# savefig(bbox_inches='tight', pad_inches=0) trims a fraction of a pixel off
+# each edge, which the saved 128x128 PNG stretches back out. Calibrated
+# against matplotlib 3.10 output.
+TIGHT_BBOX_SCALE = 1.01
+
+_HALF_WIDTH = LINE_WIDTH_PT / 72 * DPI / 2 * TIGHT_BBOX_SCALE
+
+
+def _pixel_centers(size: int) -> tuple[np.ndarray, np.ndarray]:
+    centers = np.arange(size, dtype=np.float32) + 0.5
+    return centers[None, :], centers[:, None]
+
+
+_PX, _PY = _pixel_centers(IMAGE_SIZE)
+
+
+def _to_pixels(closes: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray]:
+    n = len(closes)
+    margin = size / 2 - TIGHT_BBOX_SCALE * size * (0.5 - AXES_MARGIN)
+    span = size - 2 * margin
+    x = margin + span * np.arange(n, dtype=np.float64) / (n - 1)
+
+    lo, hi = closes.min(), closes.max()
+    if hi > lo:
+        y = margin + span * (closes - lo) / (hi - lo)
+    else:
+        # matplotlib centres a flat series vertically
+        y = np.full(n, size / 2, dtype=np.float64)
+    # image rows grow downwards, display y grows upwards
+    return x, size - y
+
+
+def render_close_image(closes, out: np.ndarray | None = None) -> np.ndarray | None:
+    # Draw a close-price polyline into a (128, 128, 3) float32 RGB buffer, pixel values 0-255
+    # like the PNG make_line_plot_image writes. With `out`, the image goes into that buffer
+    # (e.g. a row of a batch), which is left untouched if the window can't be drawn.
+    closes = np.asarray(closes, dtype=np.float64)
+    if closes.ndim != 1 or len(closes) < 2 or not np.isfinite(closes).all():
+        return None
+
+    x, y = _to_pixels(closes, IMAGE_SIZE)
+
+    # distance from pixel centres to the nearest segment (round joins and
+    # caps, which is what Agg output looks like at this size); each
+    # segment only touches the pixels inside its padded bounding box
+    dist_sq = np.full((IMAGE_SIZE, IMAGE_SIZE), np.inf, dtype=np.float32)
+    reach = _HALF_WIDTH + 1
+    for i in range(len(closes) - 1):
+        x0, y0 = x[i], y[i]
+        dx, dy = x[i + 1] - x0, y[i + 1] - y0
+        c0 = max(int(min(x0, x0 + dx) - reach), 0)
+        c1 = min(int(max(x0, x0 + dx) + reach) + 1, IMAGE_SIZE)
+        r0 = max(int(min(y0, y0 + dy) - reach), 0)
+        r1 = min(int(max(y0, y0 + dy) + reach) + 1, IMAGE_SIZE)
+        rel_x = _PX[:, c0:c1] - x0
+        rel_y = _PY[r0:r1, :] - y0
+        seg_len_sq = dx * dx + dy * dy
+        if seg_len_sq > 0:
+            t = np.clip((rel_x * dx + rel_y * dy) / seg_len_sq, 0.0, 1.0)
+        else:
+            t = 0.0
+        d = (rel_x - t * dx) ** 2 + (rel_y - t * dy) ** 2
+        np.minimum(dist_sq[r0:r1, c0:c1], d, out=dist_sq[r0:r1, c0:c1])
+
+    # approximate antialiased coverage with a one-pixel linear ramp at the edge,
+    # computed in place in the float32 distance buffer
+    gray = np.sqrt(dist_sq, out=dist_sq)
+    np.subtract(_HALF_WIDTH + 0.5, gray, out=gray)
+    np.clip(gray, 0.0, 1.0, out=gray)
+    np.subtract(1.0, gray, out=gray)
+    gray *= 255.0
+    if out is None:
+        out = np.empty((IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.float32)
+    out[...] = gray[:, :, None]
+    return out
+
+
+def render_close_images(windows) -> tuple[np.ndarray, np.ndarray]:
+    # Render a 2D array of windows (one per row) or a sequence of 1D windows of any lengths.
+    # Returns an (N, 128, 128, 3) float32 batch and a mask of the windows that produced an
+    # image; rows for the others are left white.
+    images = np.full((len(windows), IMAGE_SIZE, IMAGE_SIZE, 3), 255.0, dtype=np.float32)
+    valid = np.zeros(len(windows), dtype=bool)
+    for i, closes in enumerate(windows):
+        valid[i] = render_close_image(closes, out=images[i]) is not None
+    return images, valid
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import threading
+import time
+
+# Price-pattern results can only change when a new bar closes, so they live until the next
+# boundary of the smallest interval analyzed. News/sentiment changes on its own schedule.
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "300"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+
+
+def next_bar_boundary(interval_minutes: int) -> float:
+    # Epoch seconds at which the next bar of the given interval opens
+    now = time.time()
+    step = interval_minutes * 60
+    return now - now % step + step
+
+
+class ExpiringCache:
+    # Dict of key -> value with a per-entry expiry time and hit/miss counters
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def set(self, key, value, expires_at: float):
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                now = time.time()
+                for stale in [k for k, (exp, _) in self._entries.items() if exp <= now]:
+                    del self._entries[stale]
+                if len(self._entries) >= self.max_size:
+                    # still full: drop the entry closest to expiring
+                    del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+            self._entries[key] = (expires_at, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def analysis_etag(analysis, *params) -> str:
+    # Content-based ETag for an analysis and the request parameters applied to it. Built from
+    # what the response is derived from (pattern, last bar, articles) so it stays the same
+    # across cache refreshes that don't change anything.
+    pap_signal, pap_pattern, df, sent_score, articles = analysis
+    last_bar = (int(df.time[-1]), float(df.close[-1]), len(df)) if df is not None and len(df) else None
+    article_ids = [(a.get("url"), a.get("sentiment_score")) for a in articles]
+    digest = hashlib.sha1(repr((pap_signal, pap_pattern, last_bar, sent_score, article_ids, params)).encode())
+    return f'"{digest.hexdigest()}"'
@@ -1,27 +1,57 @@
-from newsapi import NewsApiClient
-from polygon import RESTClient
 import os
 import json
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone, time
 import pytz
 import re
 
-polygon_client = RESTClient(os.getenv("POLYGON_API_KEY"))
-newsapi_client = NewsApiClient(os.getenv("NEWSAPI_API_KEY"))
+from utils.exceptions import AppException
+from utils.executors import run_io
+from utils.metrics import events, span
+from utils.sentiment_cache import get_sentiment_cache, sentiment_key
+from utils.upstream import call_upstream, newsapi_session, pool_polygon_client
+
+logger = logging.getLogger(__name__)
+
+# Upstream clients (and their packages) are only loaded when first used, so importing this
+# module, and starting the server, costs nothing for them. Both keep pooled keep-alive
+# connections (utils/upstream.py); retries happen in call_upstream, not in the clients.
+_polygon_client = None
+_newsapi_client = None
+_clients_lock = threading.Lock()
+
+def get_polygon_client():
+    global _polygon_client
+    with _clients_lock:
+        if _polygon_client is None:
+            from polygon import RESTClient
+            _polygon_client = pool_polygon_client(RESTClient(os.getenv("POLYGON_API_KEY"), retries=0))
+    return _polygon_client
+
+def get_newsapi_client():
+    global _newsapi_client
+    with _clients_lock:
+        if _newsapi_client is None:
+            from newsapi import NewsApiClient
+            _newsapi_client = NewsApiClient(os.getenv("NEWSAPI_API_KEY"), session=newsapi_session())
+    return _newsapi_client
 
 _model = None
 def get_gemini_model():
     global _model
     if _model is None:
-        print("------- GOOGLE GENAI ---------")
+        logger.info("Loading Gemini model")
         import google.generativeai as genai
-        print("------- LOADING PAP MODEL ---------")
         genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
         _model = genai.GenerativeModel("gemini-1.5-flash")
-        print("------- PAP MODEL LOAD DONE -------")
+        logger.info("Gemini model loaded")
     return _model
 
-def predict_sentiment(text_arr: list[str], ticker: str):
+def request_sentiment_scores(text_arr: list[str], ticker: str):
     prompt = f"""
 You are a financial sentiment analyst.
 
@@ -52,33 +82,57 @@ News snippets:
         prompt += f"{i}. {text}\n"
 
     model = get_gemini_model()
-    response = model.generate_content(
-        prompt, 
-        generation_config={
-            "temperature": 0.0 # ensures no variability
-        }
-    )
+    with span("llm", snippets=len(text_arr)):
+        response = model.generate_content(
+            prompt, 
+            generation_config={
+                "temperature": 0.0 # ensures no variability
+            }
+        )
+    events.inc(len(text_arr), event="llm_snippets")
     raw = response.text.strip()
-    print(raw)
+    logger.debug("Sentiment model response: %s", raw)
     match = re.search(r"\[.*\]", raw, re.DOTALL)
-    print(match)
     if match:
         raw = match.group(0)
     return json.loads(raw)
 
+def predict_sentiment(text_arr: list[str], ticker: str):
+    # Only snippets we haven't scored for this ticker recently go to the model
+    cache = get_sentiment_cache()
+    keys = [sentiment_key(ticker, text) for text in text_arr]
+    scores = cache.get_many(keys)
+
+    misses = {}
+    for key, text in zip(keys, text_arr):
+        if key not in scores and key not in misses:
+            misses[key] = text
+    if misses:
+        new_scores = request_sentiment_scores(list(misses.values()), ticker)
+        if len(new_scores) != len(misses):
+            raise AppException(f"Sentiment model returned {len(new_scores)} scores for {len(misses)} snippets", 502)
+        new_scores = dict(zip(misses.keys(), new_scores))
+        cache.set_many(new_scores)
+        scores.update(new_scores)
+
+    return [scores[key] for key in keys]
+
 def fetch_polygon_articles(ticker, start_date, end_date, max_articles=10):
-    articles = []
-    for n in polygon_client.list_ticker_news(
-        ticker=ticker,
-        published_utc_gte=start_date,
-        published_utc_lt=end_date,
-        limit=max_articles,
-        sort="published_utc",
-        order="desc"
-    ):
-        articles.append(n)
+    # list_ticker_news pages lazily, so the requests happen while the results are listed
+    def list_news():
+        return list(get_polygon_client().list_ticker_news(
+            ticker=ticker,
+            published_utc_gte=start_date,
+            published_utc_lt=end_date,
+            limit=max_articles,
+            sort="published_utc",
+            order="desc"
+        ))
+
+    with span("news_fetch", source="polygon"):
+        articles = call_upstream("polygon", list_news)
     if not articles:
-      print("no articles from " + str(start_date) + " to " + str(end_date))
+      logger.info("no polygon articles for %s from %s to %s", ticker, start_date, end_date)
     articles = [a for a in articles if a.description]
     return articles
 
@@ -90,27 +144,31 @@ def fetch_newsapi_articles(ticker, start_date, end_date, max_articles=7):
     end_date = to_newsapi_datetime(end_date)
 
 
-    print(f"Fetching newsapi for {ticker} from {start_date} to {end_date}")
+    logger.debug("Fetching newsapi for %s from %s to %s", ticker, start_date, end_date)
 
     try:
-        data = newsapi_client.get_everything(
-            q=f"{ticker}",
-            from_param=start_date,
-            to=end_date,
-            language='en',
-            page_size=max_articles,  
-            page=1,
-            sort_by="popularity",
-            exclude_domains="biztoc.com,globenewswire.com,rlsbb.cc"
-        )
-        print(data.get("message"))
+        with span("news_fetch", source="newsapi"):
+            data = call_upstream(
+                "newsapi",
+                get_newsapi_client().get_everything,
+                q=f"{ticker}",
+                from_param=start_date,
+                to=end_date,
+                language='en',
+                page_size=max_articles,  
+                page=1,
+                sort_by="popularity",
+                exclude_domains="biztoc.com,globenewswire.com,rlsbb.cc"
+            )
+        if data.get("message"):
+            logger.info("newsapi: %s", data.get("message"))
     except Exception as e:
-        print("Exception in fetching newsapi: ", e)
+        logger.warning("Exception in fetching newsapi: %s", e)
         return []
-    print(data)
+    logger.debug("newsapi response: %s", data)
     articles = data.get("articles")
     if not articles:
-        print("no articles from " + str(start_date) + " to " + str(end_date))
+        logger.info("no newsapi articles for %s from %s to %s", ticker, start_date, end_date)
     articles = [a for a in articles if a.get("description")]
     return articles
 
@@ -170,9 +228,9 @@ def get_polygon_news_data(ticker, from_date, to_date, max_articles=15):
     
     return [avg_sentiment, processed_articles]
 
-def get_news_data(ticker, polygon_dates, newsapi_dates):
-    polygon_sentiment, polygon_articles = get_polygon_news_data(ticker, polygon_dates[0], polygon_dates[1])
-    newsapi_sentiment, newsapi_articles = get_newsapi_news_data(ticker, newsapi_dates[0], newsapi_dates[1])
+def combine_news_data(polygon_result, newsapi_result):
+    polygon_sentiment, polygon_articles = polygon_result
+    newsapi_sentiment, newsapi_articles = newsapi_result
     
     # Combine articles
     all_articles = polygon_articles + newsapi_articles
@@ -180,7 +238,7 @@ def get_news_data(ticker, polygon_dates, newsapi_dates):
         key=lambda x: datetime.fromisoformat(x['published_utc'].replace('Z', '+00:00')),
         reverse=True
     )
-    print(len(all_articles))
+    logger.debug("%d articles combined", len(all_articles))
     # Calculate weighted average sentiment
     total_articles = len(all_articles)
     if total_articles == 0:
@@ -191,19 +249,32 @@ def get_news_data(ticker, polygon_dates, newsapi_dates):
     
     return weighted_sentiment, all_articles
 
-def get_news_data_today(ticker):
-    print(f"\nGetting news data for {ticker} today")
+def get_news_data(ticker, polygon_dates, newsapi_dates):
+    # The two sources (and their sentiment calls) don't depend on each other, so fetch them side by side
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        polygon_future = executor.submit(contextvars.copy_context().run, get_polygon_news_data, ticker, polygon_dates[0], polygon_dates[1])
+        newsapi_future = executor.submit(contextvars.copy_context().run, get_newsapi_news_data, ticker, newsapi_dates[0], newsapi_dates[1])
+        return combine_news_data(polygon_future.result(), newsapi_future.result())
+
+async def get_news_data_async(ticker, polygon_dates, newsapi_dates):
+    polygon_result, newsapi_result = await asyncio.gather(
+        run_io("news", get_polygon_news_data, ticker, polygon_dates[0], polygon_dates[1]),
+        run_io("news", get_newsapi_news_data, ticker, newsapi_dates[0], newsapi_dates[1]),
+    )
+    return combine_news_data(polygon_result, newsapi_result)
+
+def get_news_dates_today():
     eastern = pytz.timezone("US/Eastern")
     now_et = datetime.now(eastern)
-    print(f"Current ET time: {now_et}")
+    logger.debug("Current ET time: %s", now_et)
 
     # If it's before 4:00 a.m. ET now, use yesterday's premarket
     if now_et.time() < time(4, 0):
         polygon_start_dt = now_et.date() - timedelta(days=1)
-        print("Using yesterday's premarket")
+        logger.debug("Using yesterday's premarket")
     else:
         polygon_start_dt = now_et.date()
-        print("Using today's premarket")
+        logger.debug("Using today's premarket")
     newsapi_start_dt = polygon_start_dt - timedelta(days=1) 
     
     polygon_start_dt  = datetime.combine(polygon_start_dt, time(4, 0))
@@ -220,5 +291,14 @@ def get_news_data_today(ticker):
 
     polygon_dates = [polygon_start_dt, polygon_end_dt]
     newsapi_dates = [newsapi_start_dt, newsapi_end_dt]
+    return polygon_dates, newsapi_dates
+
+def get_news_data_today(ticker):
+    logger.debug("Getting news data for %s today", ticker)
+    polygon_dates, newsapi_dates = get_news_dates_today()
     return get_news_data(ticker, polygon_dates, newsapi_dates)
 
+async def get_news_data_today_async(ticker):
+    logger.debug("Getting news data for %s today", ticker)
+    polygon_dates, newsapi_dates = get_news_dates_today()
+    return await get_news_data_async(ticker, polygon_dates, newsapi_dates)
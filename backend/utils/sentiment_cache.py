@@ -0,0 +1,106 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.shared_cache import SHARED_CACHE_DB, SQLiteCache
+
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "20000"))
+SENTIMENT_CACHE_TTL = float(os.getenv("SENTIMENT_CACHE_TTL", str(24 * 3600)))
+# Optional SQLite file shared across restarts and worker processes (the shared cache file by
+# default); empty disables it
+SENTIMENT_CACHE_DB = os.getenv("SENTIMENT_CACHE_DB", SHARED_CACHE_DB)
+
+
+def sentiment_key(ticker: str, text: str) -> str:
+    # Scores depend on the ticker they are judged against, so it is part of the key.
+    # Whitespace and case changes between feeds don't change the article.
+    normalized = " ".join(text.split()).lower()
+    return hashlib.sha256(f"{ticker.upper()}\0{normalized}".encode()).hexdigest()
+
+
+class LRUCache:
+    # In-process LRU with a per-entry TTL
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys) -> dict:
+        now = time.time()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, items: dict):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SentimentCache:
+    # LRU in front of an optional persistent tier; hits from the persistent tier are promoted
+    def __init__(self, max_size: int = SENTIMENT_CACHE_SIZE, ttl: float = SENTIMENT_CACHE_TTL, db_path: str = SENTIMENT_CACHE_DB):
+        self.memory = LRUCache(max_size, ttl)
+        self.persistent = SQLiteCache(db_path, ttl) if db_path else None
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys) -> dict:
+        keys = list(dict.fromkeys(keys))
+        found = self.memory.get_many(keys)
+        if self.persistent is not None and len(found) < len(keys):
+            from_disk = self.persistent.get_many([k for k in keys if k not in found])
+            if from_disk:
+                self.memory.set_many(from_disk)
+                found.update(from_disk)
+        with self._stats_lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: dict):
+        if not items:
+            return
+        self.memory.set_many(items)
+        if self.persistent is not None:
+            self.persistent.set_many(items)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.memory),
+                "persistent": self.persistent is not None,
+            }
+
+
+_sentiment_cache = None
+_sentiment_cache_lock = threading.Lock()
+def get_sentiment_cache() -> SentimentCache:
+    global _sentiment_cache
+    with _sentiment_cache_lock:
+        if _sentiment_cache is None:
+            _sentiment_cache = SentimentCache()
+    return _sentiment_cache
@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.bars import PRICE_FIELDS, Bars
+
+try:
+    import orjson
+except ImportError:  # fall back to the standard library encoder
+    orjson = None
+
+CANDLE_FORMATS = ("rows", "columnar")
+
+
+def _candle_arrays(bars) -> tuple[np.ndarray, list[np.ndarray]]:
+    # UTC epoch nanoseconds and the OHLCV columns, from Bars or (scripts, tests) a DataFrame
+    if isinstance(bars, pd.DataFrame):
+        bars = Bars.from_frame(bars)
+    return bars.time, [getattr(bars, field) for field in PRICE_FIELDS]
+
+
+def candlestick_rows(bars: Bars | None) -> list[dict] | None:
+    # One dict per bar, identical to the payload the frontend has always received, built column
+    # by column from the underlying arrays instead of iterrows()
+    if bars is None:
+        return None
+    times, columns = _candle_arrays(bars)
+    # bars sit on whole minutes, so second precision reproduces Timestamp.isoformat()
+    timestamps = np.datetime_as_string(times.astype("datetime64[ns]"), unit="s")
+    columns = [column.tolist() for column in columns]
+    return [
+        {"timestamp": ts + "+00:00", "open": o, "high": h, "low": l, "close": c, "volume": v}
+        for ts, o, h, l, c, v in zip(timestamps.tolist(), *columns)
+    ]
+
+
+def candlestick_columns(bars: Bars | None) -> dict | None:
+    # Parallel arrays, one per field; timestamps are epoch milliseconds (UTC bar start)
+    if bars is None:
+        return None
+    times, columns = _candle_arrays(bars)
+    payload = {"timestamp": (times // 1_000_000).tolist()}
+    for field, column in zip(PRICE_FIELDS, columns):
+        payload[field] = column.tolist()
+    return payload
+
+
+def parse_candle_timestamp(value: str) -> int:
+    # Epoch nanoseconds from a candle timestamp as either format sends it: ISO 8601 (rows, naive
+    # taken as UTC) or epoch milliseconds (columnar). Raises ValueError for anything else.
+    # ISO strings are parsed strictly: an unencoded '+' in a query string arrives as a space,
+    # and pd.Timestamp would quietly read "17:59:00 00:00" as midnight.
+    value = value.strip()
+    if value.lstrip("-").isdigit():
+        ns = int(value) * 1_000_000
+        if not -2**63 < ns < 2**63:
+            raise ValueError(f"timestamp out of range: {value}")
+        return ns
+    if value[-1:] in ("Z", "z"):
+        value = value[:-1] + "+00:00"   # fromisoformat only accepts 'Z' from Python 3.11 on
+    ts = pd.Timestamp(datetime.fromisoformat(value))
+    return (ts.tz_localize("UTC") if ts.tzinfo is None else ts).value
+
+
+def serialize_candlesticks(bars: Bars | None, candle_format: str = "rows"):
+    if candle_format == "columnar":
+        return candlestick_columns(bars)
+    return candlestick_rows(bars)
+
+
+def dumps(obj) -> bytes:
+    # Fast JSON encoding that also accepts NumPy scalars (SL/TP come out of np.min/np.max)
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=str).encode()
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite file shared by every worker process on the host (gunicorn.conf.py): sentiment scores
+# and symbol verdicts written by one worker are served to all of them. Empty disables it.
+SHARED_CACHE_DB = os.getenv("SHARED_CACHE_DB", "")
+# How long a writer waits for another process's transaction before giving up
+SHARED_CACHE_BUSY_TIMEOUT = float(os.getenv("SHARED_CACHE_BUSY_TIMEOUT", "30"))
+
+
+class SQLiteCache:
+    # Persistent key -> float store with TTL, one table per cache in a shared file. WAL mode
+    # lets readers in other processes run alongside a writer; writers queue on SQLite's lock.
+    # Connections are opened lazily per process, so a cache created before a fork is reopened
+    # in the child instead of sharing the parent's file handle.
+    def __init__(self, path: str, ttl: float, table: str = "sentiment"):
+        self.path = path
+        self.ttl = ttl
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Called with self._lock held
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=SHARED_CACHE_BUSY_TIMEOUT)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, score REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get_many(self, keys) -> dict:
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT key, score FROM {self.table} WHERE key IN ({placeholders}) AND expires_at > ?",
+                (*keys, time.time()),
+            ).fetchall()
+        return dict(rows)
+
+    def set_many(self, items: dict, ttl: float | None = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, score, expires_at) VALUES (?, ?, ?)",
+                    [(key, float(score), expires_at) for key, score in items.items()],
+                )
+                conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
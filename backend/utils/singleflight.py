@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+
+class SingleFlight:
+    # Coalesces concurrent calls with the same key into one execution; every caller awaits
+    # the same task. The task is shielded, so a caller that disconnects doesn't cancel the
+    # work for everyone else.
+    def __init__(self):
+        self._inflight = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, coro_fn):
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(coro_fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
+
+
+def current_bar_boundary(interval_minutes: int) -> int:
+    # Epoch seconds at which the current bar of the given interval opened
+    now = int(time.time())
+    return now - now % (interval_minutes * 60)
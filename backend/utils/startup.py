@@ -0,0 +1,61 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    # Wall time of each import and init phase, measured from when this module was first
+    # imported (the top of main.py), and whether the service is ready to take traffic
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.ready_after = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases[name] = elapsed
+            logger.info("startup phase %s took %.1f ms", name, elapsed * 1000)
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_after is not None
+
+    def mark_ready(self):
+        self.ready_after = time.perf_counter() - self.started
+        logger.info("ready %.1f ms after startup began", self.ready_after * 1000)
+
+    def mark_failed(self, error: Exception):
+        self.error = f"{type(error).__name__}: {error}"
+        logger.error("startup failed: %s", self.error)
+
+    def report(self) -> dict:
+        with self._lock:
+            phases = {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+        return {
+            "ready": self.ready,
+            "ready_after_ms": round(self.ready_after * 1000, 1) if self.ready else None,
+            "phases_ms": phases,
+            "error": self.error,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {f"{name}_seconds": seconds for name, seconds in self.phases.items()}
+        stats["ready"] = int(self.ready)
+        if self.ready:
+            stats["ready_after_seconds"] = self.ready_after
+        return stats
+
+
+startup_report = StartupReport()
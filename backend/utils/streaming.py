@@ -0,0 +1,310 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from utils.bar_store import to_ns
+from utils.bars import Bars
+from utils.exceptions import AppException
+from utils.executors import run_cpu, run_io
+from utils.market_data import load_bars
+from utils.metrics import tagged
+from utils.pap import (
+    build_pap_windows,
+    build_trade_signal,
+    get_news_data_cached,
+    pap_window_span,
+    score_pap_windows,
+    select_pap_signal,
+    unique_settings,
+)
+from utils.serialization import serialize_candlesticks
+
+# Seconds to wait after a bar closes before asking for it, so the provider has published it
+STREAM_BAR_GRACE_SECONDS = float(os.getenv("STREAM_BAR_GRACE_SECONDS", "5"))
+# Messages buffered per subscriber; a subscriber that falls this far behind is resynced
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+# Replay stored bars from this UTC time instead of following the market (offline testing)
+STREAM_REPLAY_START = os.getenv("STREAM_REPLAY_START")
+STREAM_REPLAY_SPEED = float(os.getenv("STREAM_REPLAY_SPEED", "60"))
+
+ONE_MINUTE = pd.Timedelta(minutes=1)
+
+
+def floor_to_interval(dt: datetime, interval_minutes: int) -> datetime:
+    # Start of the bar of the given interval containing dt (bars are aligned to the epoch)
+    return pd.Timestamp(dt).floor(f"{interval_minutes}min").to_pydatetime()
+
+
+class LiveBarSource:
+    # Follows the wall clock; 1m bars come from the bar store, which only fetches new ones
+    def now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    def load(self, ticker: str, start_dt, end_dt) -> Bars | None:
+        return load_bars(ticker, "1m", start_dt, end_dt)
+
+    async def wait_until(self, dt: datetime):
+        delay = (dt - self.now()).total_seconds()
+        await asyncio.sleep(max(delay, 0) + STREAM_BAR_GRACE_SECONDS)
+
+
+class ReplayBarSource:
+    # Replays recorded 1m bars on a simulated clock, `speed` times faster than real time
+    # (0 = as fast as possible). Bars come from the given frames, or from the bar store when
+    # no frames are given, so a replay needs no network once the store covers the range.
+    def __init__(self, start: datetime, bars: dict[str, pd.DataFrame | Bars] | None = None, speed: float = STREAM_REPLAY_SPEED):
+        start = pd.Timestamp(start)
+        self.clock = (start.tz_localize("UTC") if start.tz is None else start.tz_convert("UTC")).to_pydatetime()
+        self.bars = {
+            ticker.upper(): Bars.from_frame(df) if isinstance(df, pd.DataFrame) else df
+            for ticker, df in (bars or {}).items()
+        }
+        self.speed = speed
+
+    def now(self) -> datetime:
+        return self.clock
+
+    def load(self, ticker: str, start_dt, end_dt) -> Bars | None:
+        bars = self.bars.get(ticker.upper())
+        if bars is None:
+            return None if self.bars else load_bars(ticker, "1m", start_dt, end_dt)
+        bars = bars.between(to_ns(start_dt), to_ns(end_dt))
+        return bars if not bars.empty else None
+
+    async def wait_until(self, dt: datetime):
+        delay = (dt - self.clock).total_seconds()
+        await asyncio.sleep(max(delay, 0) / self.speed if self.speed > 0 else 0)
+        self.clock = max(self.clock, dt)
+
+
+def default_bar_source():
+    if STREAM_REPLAY_START:
+        return ReplayBarSource(datetime.fromisoformat(STREAM_REPLAY_START))
+    return LiveBarSource()
+
+
+class Subscriber:
+    # One client's subscription to a ticker. SL/TP depend on the client's multipliers, so each
+    # subscriber turns the shared analysis into its own payload and remembers what it last sent.
+    def __init__(self, ticker: str, queue: asyncio.Queue, atr_sl_multiplier: float = 1.5,
+                 rr_ratio: float = 1.5, candle_format: str = "rows"):
+        self.ticker = ticker
+        self.queue = queue
+        self.atr_sl_multiplier = atr_sl_multiplier
+        self.rr_ratio = rr_ratio
+        self.candle_format = candle_format
+        self._sent = None           # last payload fields sent
+        self._sent_bars = None      # (setting, timestamp of the last candle sent)
+
+    def resync(self):
+        # The next message will be a full snapshot
+        self._sent = None
+        self._sent_bars = None
+
+    def message(self, analysis, setting, bar_time: datetime) -> dict | None:
+        # SL/TP come from the scored window's own ATR warm-up, as in /api/analysis, so streamed
+        # and REST levels agree for the same bar and setting
+        pap_signal, pap_pattern, df, sent_score, articles = analysis
+        signal, sl, tp, sent_score, articles, pap_pattern, _ = build_trade_signal(
+            pap_signal, pap_pattern, df, sent_score, articles,
+            self.atr_sl_multiplier, self.rr_ratio, candle_format=None,
+        )
+        fields = {
+            "signal": signal,
+            "stop_loss": sl,
+            "take_profit": tp,
+            "sentiment_score": sent_score,
+            "pap_pattern": pap_pattern,
+            "articles": articles,
+        }
+        header = {"ticker": self.ticker, "interval": setting[0], "lookback": setting[1], "bar_time": bar_time.isoformat()}
+        last_bar = int(df.time[-1])
+
+        if self._sent is None or self._sent_bars[0] != setting:
+            # first message, or the chart switched to another window: send everything
+            message = {"type": "snapshot", **header, **fields,
+                       "candlestick_data": serialize_candlesticks(df, self.candle_format)}
+        else:
+            changed = {key: value for key, value in fields.items() if value != self._sent.get(key)}
+            new_bars = df.between(self._sent_bars[1] + 1)
+            if not changed and new_bars.empty:
+                return None
+            message = {"type": "update", **header, **changed}
+            if not new_bars.empty:
+                message["candles"] = serialize_candlesticks(new_bars, self.candle_format)
+
+        self._sent = fields
+        self._sent_bars = (setting, last_bar)
+        return message
+
+    def push(self, message: dict):
+        if self.queue.full():
+            # too far behind: drop what's queued and start over with a snapshot
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.resync()
+            return
+        self.queue.put_nowait(message)
+
+
+class TickerStream:
+    # Rolling 1m bars and per-setting scores for one ticker. Each evaluation fetches only the
+    # bars that closed since the last one and re-scores only the settings whose interval just
+    # closed a bar.
+    def __init__(self, ticker: str, source, settings):
+        self.ticker = ticker
+        self.source = source
+        self.settings = settings
+        self.span = pd.Timedelta(minutes=pap_window_span(settings) + max(i for i, _ in settings))
+        self.subscribers = set()
+        self.bars = None        # closed 1m Bars covering `span`
+        self.scored = {}        # setting -> (bar boundary, score, window)
+        self.analysis = None
+        self.selected = None    # (setting, bar_time) of the last analysis
+        self._lock = asyncio.Lock()
+
+    async def _update_bars(self, boundary: datetime):
+        start = boundary - self.span
+        if self.bars is not None and not self.bars.empty:
+            start = max(start, self.bars.last_time() + ONE_MINUTE)
+        if start >= boundary:
+            return
+        new_bars = await run_io("bars", self.source.load, self.ticker, start, boundary)
+        if new_bars is not None:
+            new_bars = new_bars.between(None, to_ns(boundary))    # closed bars only
+            self.bars = new_bars if self.bars is None else Bars.concat([self.bars, new_bars])
+        if self.bars is not None:
+            self.bars = self.bars.between(to_ns(boundary - self.span))
+
+    def _windows_to_score(self, now: datetime) -> list:
+        # (setting, boundary, window) for every setting whose interval has a newly closed bar
+        pending = []
+        for interval_minutes in dict.fromkeys(i for i, _ in self.settings):
+            boundary = floor_to_interval(now, interval_minutes)
+            settings = [s for s in self.settings if s[0] == interval_minutes
+                        and self.scored.get(s, (None,))[0] != boundary]
+            if not settings:
+                continue
+            closed = self.bars.between(None, to_ns(boundary))
+            if closed.empty:
+                continue
+            try:
+                windows = build_pap_windows(closed, settings, boundary)
+            except AppException:
+                continue
+            pending += [(s, boundary, w) for s, w in zip(settings, windows) if not w.empty]
+        return pending
+
+    async def evaluate(self, now: datetime) -> bool:
+        # Returns True when a new analysis is available
+        async with self._lock:
+            boundary = floor_to_interval(now, 1)
+            (_, (sent_score, articles)) = await asyncio.gather(
+                self._update_bars(boundary),
+                get_news_data_cached(self.ticker),
+            )
+            if self.bars is None or self.bars.empty:
+                raise AppException(f"No 1m price data available for {self.ticker}", 404)
+
+            pending = self._windows_to_score(now)
+            if pending:
+                scores = await run_cpu("pap", score_pap_windows, [w for _, _, w in pending])
+                for (setting, bar_boundary, window), score in zip(pending, scores):
+                    self.scored[setting] = (bar_boundary, score, window)
+
+            settings = [s for s in self.settings if s in self.scored]
+            if not settings:
+                raise AppException(f"Not enough price data to analyze {self.ticker}", 404)
+            pap_signal, pap_pattern, df = select_pap_signal(
+                settings, [self.scored[s][1] for s in settings], [self.scored[s][2] for s in settings]
+            )
+            setting = next(s for s in settings if self.scored[s][2] is df)
+            self.analysis = (pap_signal, pap_pattern, df, sent_score, articles)
+            self.selected = (setting, boundary)
+            return True
+
+    def publish(self, subscribers=None):
+        setting, bar_time = self.selected
+        for subscriber in subscribers or list(self.subscribers):
+            message = subscriber.message(self.analysis, setting, bar_time)
+            if message is not None:
+                subscriber.push(message)
+
+    def publish_error(self, error: AppException):
+        message = {"type": "error", "ticker": self.ticker, "error": error.message, "status_code": error.status_code}
+        for subscriber in list(self.subscribers):
+            subscriber.push(message)
+
+
+class SignalHub:
+    # Shared by every streaming client: one TickerStream per subscribed ticker, all evaluated
+    # together each time a 1m bar closes
+    def __init__(self, source=None, settings=None):
+        self.source = source or default_bar_source()
+        self.settings = unique_settings(settings)
+        self.streams = {}
+        self._task = None
+        self.evaluations = 0
+        self.errors = 0
+
+    async def subscribe(self, ticker: str, queue: asyncio.Queue, **params) -> Subscriber:
+        ticker = ticker.upper()
+        subscriber = Subscriber(ticker, queue, **params)
+        stream = self.streams.get(ticker)
+        if stream is None:
+            stream = self.streams[ticker] = TickerStream(ticker, self.source, self.settings)
+        stream.subscribers.add(subscriber)
+
+        if stream.analysis is None:
+            await self._evaluate(stream, self.source.now())
+        else:
+            stream.publish([subscriber])
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        stream = self.streams.get(subscriber.ticker)
+        if stream is None:
+            return
+        stream.subscribers.discard(subscriber)
+        if not stream.subscribers:
+            del self.streams[subscriber.ticker]
+
+    async def _evaluate(self, stream: TickerStream, now: datetime):
+        try:
+            with tagged(ticker=stream.ticker):
+                await stream.evaluate(now)
+            self.evaluations += 1
+            stream.publish()
+        except AppException as e:
+            self.errors += 1
+            stream.publish_error(e)
+        except Exception as e:
+            self.errors += 1
+            stream.publish_error(AppException(f"Analysis failed: {e}", 500))
+
+    async def _run(self):
+        # Wake up at every 1m bar close while anyone is subscribed
+        while self.streams:
+            next_bar = floor_to_interval(self.source.now(), 1) + ONE_MINUTE
+            await self.source.wait_until(next_bar)
+            await asyncio.gather(*(self._evaluate(stream, next_bar) for stream in list(self.streams.values())))
+
+    def stats(self) -> dict:
+        return {
+            "tickers": len(self.streams),
+            "subscribers": sum(len(stream.subscribers) for stream in self.streams.values()),
+            "evaluations": self.evaluations,
+            "errors": self.errors,
+        }
+
+
+_signal_hub = None
+def get_signal_hub() -> SignalHub:
+    global _signal_hub
+    if _signal_hub is None:
+        _signal_hub = SignalHub()
+    return _signal_hub
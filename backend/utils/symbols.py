@@ -0,0 +1,192 @@
+import argparse
+import logging
+import os
+import re
+import threading
+import time
+import urllib.request
+
+from utils.shared_cache import SHARED_CACHE_DB, SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+# One symbol per line; blank lines and '#' comments are ignored. Symbols confirmed upstream
+# are appended, so the index grows with use and survives restarts. Edit or replace the file
+# at any time: it is re-read when its modification time changes.
+SYMBOLS_FILE = os.getenv("SYMBOLS_FILE", "data/symbols.txt")
+SYMBOLS_REFRESH_SECONDS = float(os.getenv("SYMBOLS_REFRESH_SECONDS", "60"))
+# How long a symbol rejected upstream is answered locally before it is checked again
+SYMBOL_NEGATIVE_TTL = float(os.getenv("SYMBOL_NEGATIVE_TTL", "3600"))
+# Nasdaq Trader's daily lists of every symbol listed on US exchanges, used to seed SYMBOLS_FILE
+LISTING_URLS = (
+    "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt",
+    "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt",
+)
+
+
+# Letters, digits and the separators Yahoo uses (BRK-B, BRK.B, ^GSPC, EURUSD=X). Symbols also
+# name bar store directories, so nothing else is let through, and names made only of dots
+# ('.', '..') are refused.
+SYMBOL_PATTERN = re.compile(r"(?!\.+$)[A-Z0-9.\-^=]{1,15}")
+
+
+def normalize_symbol(symbol: str) -> str:
+    return symbol.strip().upper()
+
+
+def is_valid_symbol(symbol: str) -> bool:
+    return SYMBOL_PATTERN.fullmatch(normalize_symbol(symbol)) is not None
+
+
+class SymbolIndex:
+    def __init__(self, path: str = SYMBOLS_FILE, refresh_seconds: float = SYMBOLS_REFRESH_SECONDS, negative_ttl: float = SYMBOL_NEGATIVE_TTL,
+                 shared_db: str = SHARED_CACHE_DB):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.negative_ttl = negative_ttl
+        # Verdicts from other worker processes: confirmed symbols reach them through the file
+        # only at the next refresh, rejected ones never do
+        self.shared = SQLiteCache(shared_db, negative_ttl, table="symbols") if shared_db else None
+        self._lock = threading.Lock()
+        self._symbols = frozenset()
+        self._learned = set()
+        self._rejected = {}
+        self._mtime = None
+        self._next_refresh = 0.0
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False):
+        # Reload the file if it changed since the last load
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if not force and mtime == self._mtime:
+            return
+        symbols = set()
+        if mtime is not None:
+            with open(self.path) as f:
+                for line in f:
+                    line = line.split('#', 1)[0]
+                    if line.strip():
+                        symbols.add(normalize_symbol(line))
+        with self._lock:
+            self._symbols = frozenset(symbols)
+            self._learned -= symbols
+            self._mtime = mtime
+
+    def lookup(self, symbol: str) -> bool | None:
+        # True/False when the answer is known locally, None when only upstream can tell
+        now = time.monotonic()
+        if now >= self._next_refresh:
+            self._next_refresh = now + self.refresh_seconds
+            self.refresh()
+
+        symbol = normalize_symbol(symbol)
+        if not is_valid_symbol(symbol):
+            return False    # malformed: never worth asking upstream
+        if symbol in self._symbols or symbol in self._learned:
+            return True
+        expires_at = self._rejected.get(symbol)
+        if expires_at is not None:
+            if expires_at > now:
+                return False
+            self._rejected.pop(symbol, None)
+        if self.shared is not None:
+            verdict = self.shared.get_many([symbol]).get(symbol)
+            if verdict is not None:
+                with self._lock:
+                    if verdict:
+                        self._learned.add(symbol)
+                    else:
+                        # held locally for one refresh period, then the shared entry is asked again
+                        self._rejected[symbol] = now + min(self.refresh_seconds, self.negative_ttl)
+                return bool(verdict)
+        return None
+
+    def remember(self, symbol: str, exists: bool):
+        symbol = normalize_symbol(symbol)
+        if self.shared is not None:
+            self.shared.set_many({symbol: 1.0 if exists else 0.0})
+        with self._lock:
+            if not exists:
+                self._rejected[symbol] = time.monotonic() + self.negative_ttl
+                return
+            self._rejected.pop(symbol, None)
+            if symbol in self._symbols or symbol in self._learned:
+                return
+            self._learned.add(symbol)
+        self._persist(symbol)
+
+    def _persist(self, symbol: str):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(symbol + "\n")
+        except OSError as e:
+            logger.warning("Could not record symbol %s in %s: %s", symbol, self.path, e)
+
+    def stats(self) -> dict:
+        return {
+            "symbols": len(self._symbols) + len(self._learned),
+            "rejected": len(self._rejected),
+        }
+
+
+_symbol_index = None
+_symbol_index_lock = threading.Lock()
+def get_symbol_index() -> SymbolIndex:
+    global _symbol_index
+    with _symbol_index_lock:
+        if _symbol_index is None:
+            _symbol_index = SymbolIndex()
+    return _symbol_index
+
+
+def parse_listing(text: str) -> set[str]:
+    # Symbols from a Nasdaq Trader listing: '|'-separated with a header row and a trailing
+    # "File Creation Time" row. Test issues are skipped; class shares are written the Yahoo
+    # way (BRK.B -> BRK-B), and symbols Yahoo spells differently (preferreds, warrants) are
+    # left for upstream checks to confirm.
+    lines = text.strip().splitlines()
+    header = lines[0].split('|')
+    symbol_col = header.index('Symbol') if 'Symbol' in header else header.index('ACT Symbol')
+    test_col = header.index('Test Issue')
+    symbols = set()
+    for line in lines[1:]:
+        fields = line.split('|')
+        if len(fields) != len(header) or fields[test_col] == 'Y':
+            continue
+        symbol = normalize_symbol(fields[symbol_col]).replace('.', '-')
+        if is_valid_symbol(symbol):
+            symbols.add(symbol)
+    return symbols
+
+
+def build_symbols_file(path: str = SYMBOLS_FILE, urls=LISTING_URLS) -> int:
+    # Write the listed symbols, plus whatever the file already holds, to `path`; replaced in
+    # one step so a running index never reads it half-written. Returns the symbol count.
+    symbols = set()
+    for url in urls:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            symbols |= parse_listing(response.read().decode('utf-8', errors='replace'))
+    if os.path.exists(path):
+        symbols |= SymbolIndex(path, shared_db="")._symbols
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        f.write("# US-listed symbols from Nasdaq Trader (python -m utils.symbols), plus confirmed ones\n")
+        f.writelines(symbol + "\n" for symbol in sorted(symbols))
+    os.replace(path + '.tmp', path)
+    return len(symbols)
+
+
+if __name__ == "__main__":
+    # Run from the backend directory: python -m utils.symbols
+    parser = argparse.ArgumentParser(description="Build the symbol index file from Nasdaq Trader's symbol directory")
+    parser.add_argument("--output", default=SYMBOLS_FILE, help="file to write (default: SYMBOLS_FILE)")
+    args = parser.parse_args()
+    print(f"{build_symbols_file(args.output)} symbols written to {args.output}")
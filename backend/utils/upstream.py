@@ -0,0 +1,231 @@
+import logging
+import os
+import random
+import threading
+import time
+
+from utils.exceptions import AppException
+from utils.metrics import events
+
+logger = logging.getLogger(__name__)
+
+# Every call to a third-party HTTP API goes through call_upstream(host, fn, ...), which applies
+# that host's limits: at most CONCURRENCY calls in flight, RATE calls per second on average
+# (bursts of up to BURST; 0 disables), and jittered exponential backoff between attempts that
+# failed in a way worth retrying, all within a latency BUDGET per call. Each is configurable
+# per host as UPSTREAM_<HOST>_<SETTING>. Rate limits depend on the API plan, so they are off
+# until set, e.g. UPSTREAM_POLYGON_RATE=0.083 UPSTREAM_POLYGON_BURST=5 for Polygon's free tier.
+# Budgets stay below the stage timeouts in executors.py so a call gives up before its stage does.
+UPSTREAM_DEFAULTS = {
+    #           concurrency, rate/s, burst, budget s
+    "yahoo":   (8, 0.0, 10, 8.0),
+    "polygon": (8, 0.0, 10, 20.0),
+    "newsapi": (8, 0.0, 10, 20.0),
+}
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "3"))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.25"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "4"))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Raised by client libraries for throttling or a dropped connection, matched by name so the
+# libraries are not imported here
+RETRY_ERRORS = frozenset({"YFRateLimitError", "MaxRetryError", "ProtocolError", "NewConnectionError",
+                          "ReadTimeoutError", "ConnectTimeoutError"})
+# NewsAPI error codes (NewsAPIException) for throttling and its own failures
+RETRY_NEWSAPI_CODES = frozenset({"rateLimited", "unexpectedError"})
+
+
+def _status_code(e: Exception) -> int | None:
+    for status in (getattr(e, "status_code", None), getattr(e, "status", None),
+                   getattr(getattr(e, "response", None), "status_code", None)):
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_retryable(e: Exception) -> bool:
+    # Transport failures, throttling and server errors may go away on another attempt; anything
+    # else (bad key, bad parameters, malformed response) would fail the same way again
+    if isinstance(e, AppException):
+        return False
+    if isinstance(e, OSError):  # sockets, timeouts, requests and curl_cffi errors
+        return True
+    if type(e).__name__ in RETRY_ERRORS:
+        return True
+    details = getattr(e, "exception", None)
+    if isinstance(details, dict):
+        return details.get("code") in RETRY_NEWSAPI_CODES
+    status = _status_code(e)
+    return status is not None and status in RETRY_STATUSES
+
+
+class TokenBucket:
+    # `rate` tokens per second, holding at most `burst`; a rate of 0 never waits
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        # Take a token and return how long to wait before using it. The balance goes negative
+        # while callers are waiting, so they are served in order instead of racing for refills.
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class Upstream:
+    def __init__(self, name: str, concurrency: int, rate: float, burst: int, budget: float,
+                 retries: int = UPSTREAM_RETRIES, backoff: float = UPSTREAM_BACKOFF, backoff_max: float = UPSTREAM_BACKOFF_MAX):
+        self.name = name
+        self.concurrency = concurrency
+        self.budget = budget
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate, burst)
+        self._slots = threading.BoundedSemaphore(concurrency)
+
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._calls = 0
+        self._retries = 0
+        self._failures = 0
+        self._rejected = 0
+        self._throttled_seconds = 0.0
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                setattr(self, f"_{key}", getattr(self, f"_{key}") + delta)
+
+    def _acquire(self, deadline: float):
+        # A rate-limit token, then a concurrency slot, both within the call's budget
+        wait = self.bucket.reserve()
+        if time.monotonic() + wait > deadline:
+            self.bucket.refund()
+            self._count(rejected=1)
+            raise AppException(f"Too many requests to {self.name}, please try again", 503)
+        if wait:
+            self._count(throttled_seconds=wait)
+            time.sleep(wait)
+        if not self._slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            self._count(rejected=1)
+            raise AppException(f"Too many requests to {self.name}, please try again", 503)
+
+    def backoff_delay(self, attempt: int) -> float:
+        # "Full jitter": uniform over the exponential window, so retries from many callers spread out
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    def call(self, fn, *args, **kwargs):
+        deadline = time.monotonic() + self.budget
+        attempt = 0
+        while True:
+            self._acquire(deadline)
+            self._count(in_flight=1, calls=1)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                delay = self.backoff_delay(attempt)
+                if attempt >= self.retries or not is_retryable(e) or time.monotonic() + delay >= deadline:
+                    self._count(failures=1)
+                    raise
+                attempt += 1
+                self._count(retries=1)
+                events.inc(event="upstream_retries", source=self.name)
+                logger.info("%s call failed (%s), retry %d in %.2f s", self.name, e, attempt, delay)
+            finally:
+                self._count(in_flight=-1)
+                self._slots.release()
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "in_flight": self._in_flight,
+                "calls": self._calls,
+                "retries": self._retries,
+                "failures": self._failures,
+                "rejected": self._rejected,
+                "throttled_seconds": self._throttled_seconds,
+            }
+
+
+def _host_setting(host: str, setting: str, default):
+    return type(default)(os.getenv(f"UPSTREAM_{host.upper()}_{setting}", str(default)))
+
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+def get_upstream(host: str) -> Upstream:
+    with _upstreams_lock:
+        if host not in _upstreams:
+            concurrency, rate, burst, budget = UPSTREAM_DEFAULTS[host]
+            _upstreams[host] = Upstream(
+                host,
+                concurrency=_host_setting(host, "CONCURRENCY", concurrency),
+                rate=_host_setting(host, "RATE", rate),
+                burst=_host_setting(host, "BURST", burst),
+                budget=_host_setting(host, "BUDGET", budget),
+            )
+        return _upstreams[host]
+
+
+def call_upstream(host: str, fn, *args, **kwargs):
+    return get_upstream(host).call(fn, *args, **kwargs)
+
+
+def upstream_stats() -> dict:
+    # Flat {host_key: value}, so every value becomes a /metrics gauge
+    with _upstreams_lock:
+        upstreams = list(_upstreams.values())
+    return {f"{u.name}_{key}": value for u in upstreams for key, value in u.stats().items()}
+
+
+# Keep-alive connection pools sized to each host's concurrency limit. yfinance keeps its own
+# process-wide curl_cffi session (one keep-alive handle per thread), so it needs nothing here.
+
+def newsapi_session():
+    # NewsApiClient opens a fresh connection (and TLS handshake) per call unless given a session
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=get_upstream("newsapi").concurrency, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def pool_polygon_client(client):
+    # RESTClient keeps one idle connection per host and retries on its own, sleeping outside
+    # any budget. Swap in a pool sized to the concurrency limit whose 429/5xx responses raise,
+    # so call_upstream decides about retries, and apply the client's timeouts, which its own
+    # pool leaves unset.
+    import certifi
+    import urllib3
+    from urllib3.util.retry import Retry
+
+    client.client = urllib3.PoolManager(
+        num_pools=10,
+        maxsize=get_upstream("polygon").concurrency,
+        headers=client.headers,
+        ca_certs=certifi.where(),
+        cert_reqs="CERT_REQUIRED",
+        retries=Retry(total=0, status_forcelist=sorted(RETRY_STATUSES), raise_on_status=True),
+        timeout=client.timeout,
+    )
+    return client